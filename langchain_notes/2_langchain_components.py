@@ -28,6 +28,8 @@ In Langchain, "models" are the core interfaces through which you interact with A
 # --------------------------
 # Code for language model
 # --------------------------
+# each section below imports its provider and builds its model eagerly; for lazy imports and a warm
+# model pool see performance/model_registry.py
 from langchain_openai import OpenAI
 
 llm = OpenAI(model="gpt-3.5-turbo-instruct")
@@ -90,6 +92,7 @@ llm = HuggingFacePipeline.from_model_id(
 model = ChatHuggingFace(llm=llm)
 result = model.invoke("What is the capital of India")
 print(result.content)
+# to serve this model to many concurrent users see performance/local_serving.py
 
 # --------------------------
 # Code for Embeddings Models (OpenAI)
@@ -109,6 +112,7 @@ documents = [
 # For generating embedding of list of query use embed_documents method
 result = embedding.embed_documents(documents)
 print(str(result))
+# small `dimensions` trade recall for memory; to get both see performance/matryoshka_search.py
 
 # --------------------------
 # Code for Embeddings Models (Using Huggingface on Local System)
@@ -125,6 +129,7 @@ documents = [
 ]
 vector = embedding.embed_documents(documents)
 print(str(vector))
+# for embedding 100k+ chunks on CPU see performance/embedding_engine.py
 
 # Prompts
 """
@@ -186,6 +191,7 @@ Ensure the summary is clear, accurate, and aligned with the provided style and l
 )
 
 template.save("template.json")
+# for rendering this template 100k times (and keeping a provider-cacheable prefix) see performance/prompt_cache.py
 
 
 # Example of Different types of messages
@@ -235,6 +241,7 @@ chat_history = []
 # load chat history
 with open("chat_history.txt") as f:
     chat_history.extend(f.readlines())
+# reading the whole file does not scale to many users; see performance/chat_server.py (HistoryLog)
 
 print(chat_history)
 
@@ -9,6 +9,7 @@ load_dotenv()
 model = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite")
 
 chat_history = [SystemMessage(content="You are a helpful AI assistant")]
+# chat_history grows every turn; for a token-budgeted memory see performance/conversation_memory.py
 
 while True:
     user_input = input("You: ")
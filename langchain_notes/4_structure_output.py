@@ -256,6 +256,7 @@ parser = StrOutputParser()
 chain = template1 | model | parser | template2 | model | parser
 result = chain.invoke({"topic": "black hole"})
 print(result)
+# to remove the per-invoke framework overhead of this chain see performance/chain_compiler.py
 
 # -------------------------------------------
 # StructuredOutputParse
@@ -307,6 +308,7 @@ template = PromptTemplate(
 chain = template | hf_model | parser
 final_result = chain.invoke({"place": "sri lankan"})
 print(final_result)
+# to repair almost-valid outputs without re-running the chain see performance/output_repair.py
 
 # -------------------------------------------
 # JsonOutputParse
@@ -324,6 +326,7 @@ template = PromptTemplate(
 chain = template | model | parser
 result = chain.invoke({"topic": "black hole"})
 print(result)
+# to act on fields while the JSON is still being generated see performance/streaming_parser.py
 
 
 # from huggingface_hub import InferenceClient
@@ -0,0 +1,263 @@
+"""
+* Why a Pipelined Batch Executor ?
+    > chain.batch(inputs) pushes a whole chunk through the whole chain: every input of the chunk must
+      finish step 1 before any of them starts step 2, and the next chunk only starts once the slowest
+      input of the current chunk is done.
+    > For offline jobs (tens of thousands of topics through prompt1 | model | parser | prompt2 | model | parser)
+      the model calls dominate, and the 2nd model call sits idle while the 1st one is working.
+
+* Idea: Treat every LLM call as a stage of an assembly line
+    > Stages: The RunnableSequence is cut after every model, so the cheap steps (prompt, parser) ride along
+      with the model call they feed. (prompt1 → model) | (parser → prompt2 → model → parser)
+    > Micro-batches: Inputs are grouped into small batches. A stage works on micro-batch N while the next
+      stage already consumes micro-batch N-1.
+    > Bounded Queues (Backpressure): Each stage hands its output to the next stage through a queue.Queue
+      with a maxsize. If a later stage is slow, the earlier stages block instead of filling RAM.
+    > Concurrency per Stage: Every stage has its own number of worker threads (e.g. more workers for the
+      slow "explain" call and fewer for the fast "joke" call).
+    > Ordered Output: Micro-batches can finish out of order, so results are re-assembled by input index.
+    > Error Isolation: A failing input becomes an ItemError and simply skips the remaining stages; the other
+      inputs of the same micro-batch are not affected.
+
+? Usage
+    executor = PipelinedBatchExecutor.from_chain(chain, micro_batch_size=16, concurrency=[2, 4])
+    results = executor.run([{"topic": t} for t in topics])
+"""
+
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable, RunnableSequence
+
+_DONE = object()
+
+
+@dataclass
+class ItemError:
+    # returned in place of a result when an input fails at some stage
+    index: int
+    stage: int
+    error: BaseException
+
+
+def split_into_stages(chain):
+    # cut the sequence after every model, trailing steps join the last stage
+    steps = chain.steps if isinstance(chain, RunnableSequence) else [chain]
+    stages, current = [], []
+    for step in steps:
+        current.append(step)
+        if isinstance(step, BaseLanguageModel):
+            stages.append(current)
+            current = []
+    if current:
+        if stages:
+            stages[-1].extend(current)
+        else:
+            stages.append(current)
+    return [RunnableSequence(*s) if len(s) > 1 else s[0] for s in stages]
+
+
+class PipelinedBatchExecutor:
+
+    def __init__(
+        self,
+        stages: list[Runnable],
+        micro_batch_size: int = 16,
+        max_queue_size: int = 4,
+        concurrency: int | list[int] = 2,
+    ):
+        if isinstance(concurrency, int):
+            concurrency = [concurrency] * len(stages)
+        if len(concurrency) != len(stages):
+            raise ValueError("concurrency must have one entry per stage")
+        self.stages = stages
+        self.micro_batch_size = micro_batch_size
+        self.max_queue_size = max_queue_size
+        self.concurrency = concurrency
+
+    @classmethod
+    def from_chain(cls, chain, **kwargs):
+        return cls(split_into_stages(chain), **kwargs)
+
+    def run(self, inputs):
+        return list(self.iter_results(inputs))
+
+    def iter_results(self, inputs):
+        # queues[i] feeds stage i, queues[-1] feeds the collector
+        queues = [
+            queue.Queue(maxsize=self.max_queue_size)
+            for _ in range(len(self.stages) + 1)
+        ]
+        feed_errors = []
+        threads = [
+            threading.Thread(
+                target=self._feed,
+                args=(inputs, queues[0], feed_errors),
+                daemon=True,
+            )
+        ]
+        for position, stage in enumerate(self.stages):
+            remaining = [self.concurrency[position]]
+            lock = threading.Lock()
+            for _ in range(self.concurrency[position]):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(position, stage, queues, remaining, lock),
+                        daemon=True,
+                    )
+                )
+        for thread in threads:
+            thread.start()
+
+        # re-assemble micro-batches in input order
+        pending, next_index = {}, 0
+        while True:
+            batch = queues[-1].get()
+            if batch is _DONE:
+                break
+            pending.update(batch)
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+        for thread in threads:
+            thread.join()
+        if feed_errors:
+            raise feed_errors[0]
+
+    def _feed(self, inputs, out_queue, feed_errors):
+        batch = []
+        try:
+            for index, value in enumerate(inputs):
+                batch.append((index, value))
+                if len(batch) == self.micro_batch_size:
+                    out_queue.put(batch)  # blocks when stage 0 is behind
+                    batch = []
+            if batch:
+                out_queue.put(batch)
+        except Exception as e:
+            feed_errors.append(e)
+        for _ in range(self.concurrency[0]):
+            out_queue.put(_DONE)
+
+    def _work(self, position, stage, queues, remaining, lock):
+        in_queue, out_queue = queues[position], queues[position + 1]
+        while True:
+            batch = in_queue.get()
+            if batch is _DONE:
+                break
+            out_queue.put(self._process(position, stage, batch))
+        # the last worker of a stage closes the next stage
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                is_last = position == len(self.stages) - 1
+                closers = 1 if is_last else self.concurrency[position + 1]
+                for _ in range(closers):
+                    out_queue.put(_DONE)
+
+    def _process(self, position, stage, batch):
+        live = [(i, v) for i, v in batch if not isinstance(v, ItemError)]
+        result = [(i, v) for i, v in batch if isinstance(v, ItemError)]
+        if not live:
+            return result
+        try:
+            outputs = stage.batch(
+                [v for _, v in live],
+                config={"max_concurrency": self.micro_batch_size},
+                return_exceptions=True,
+            )
+        except Exception as e:
+            outputs = [e] * len(live)
+        for (index, _), output in zip(live, outputs):
+            if isinstance(output, Exception):
+                output = ItemError(index, position, output)
+            result.append((index, output))
+        return result
+
+
+if __name__ == "__main__":
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.runnables import RunnableLambda
+
+    # stand-in for gemini with a jittery network latency
+    class JitterChatModel(SimpleChatModel):
+        latency: tuple[float, float] = (0.005, 0.04)
+
+        @property
+        def _llm_type(self):
+            return "jitter-chat-model"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(random.uniform(*self.latency))
+            return f"response to: {messages[-1].content[:30]}"
+
+    def fail_on_topic_13(value):
+        if value["topic"] == "topic-13":
+            raise ValueError("bad topic")
+        return value
+
+    model = JitterChatModel()
+    prompt1 = PromptTemplate(
+        template="Write a joke about {topic}", input_variables=["topic"]
+    )
+    prompt2 = PromptTemplate(
+        template="Explain the following joke - {text}",
+        input_variables=["text"],
+    )
+    parser = StrOutputParser()
+    chain = RunnableSequence(
+        RunnableLambda(fail_on_topic_13),
+        prompt1,
+        model,
+        parser,
+        prompt2,
+        model,
+        parser,
+    )
+
+    inputs = [{"topic": f"topic-{i}"} for i in range(2000)]
+    batch_size = 16
+
+    # --------------------------------------
+    # Baseline: plain .batch() loop
+    # --------------------------------------
+    start = time.perf_counter()
+    baseline = []
+    for i in range(0, len(inputs), batch_size):
+        baseline.extend(
+            chain.batch(
+                inputs[i : i + batch_size],
+                config={"max_concurrency": batch_size},
+                return_exceptions=True,
+            )
+        )
+    baseline_time = time.perf_counter() - start
+
+    # --------------------------------------
+    # Pipelined executor
+    # --------------------------------------
+    executor = PipelinedBatchExecutor.from_chain(
+        chain, micro_batch_size=batch_size, max_queue_size=4, concurrency=2
+    )
+    start = time.perf_counter()
+    pipelined = executor.run(inputs)
+    pipelined_time = time.perf_counter() - start
+
+    print(f"stages: {[s.get_name() for s in executor.stages]}")
+    print(f"input 13 -> {pipelined[13]}")
+    assert pipelined[14] == baseline[14]
+    print(
+        f".batch() loop: {len(inputs) / baseline_time:8.1f} items/s "
+        f"({baseline_time:.2f}s)"
+    )
+    print(
+        f"pipelined    : {len(inputs) / pipelined_time:8.1f} items/s "
+        f"({pipelined_time:.2f}s)"
+    )
@@ -0,0 +1,430 @@
+"""
+* Benchmark Suite for the chain patterns of the notes
+    > Every pattern is rebuilt exactly like in the notes, only the model / embeddings are the offline
+      stand-ins of fake_models.py → reproducible numbers, no keys, no cost:
+        - sequence     runnables.py        prompt1 | model | parser | prompt2 | model | parser
+        - parallel     runnables.py        RunnableParallel(tweet=..., linkedin=...)
+        - branch       runnables.py        report | RunnableBranch(len > 300 → summarize, passthrough)
+        - stream       runnables.py        sequence chain .astream() read to the end, latency = time to first chunk
+        - chatbot      3_chatbot.py        6 turns, the whole chat_history is sent every turn
+        - structured   4_structure_output  model.with_structured_output(ReviewPydantic)
+        - parser       4_structure_output  template | model | PydanticOutputParser(Person)
+        - rag_index    rag.ipynb           embed + add 10 chunks per request, retry on 429 (quota 40 req/s)
+        - rag          rag.ipynb           {context: retriever | format_docs, question} | prompt | model | parser
+    > Each pattern runs `n` inputs, `concurrency` at a time (asyncio), and records:
+        throughput (inputs/s), p50 / p99 latency per input, peak Python heap (tracemalloc, own pass).
+      Only inputs that succeeded count for throughput and latency (a failing chain is not a fast chain),
+      the failed ones are counted in `errors`; no success at all → no latency ("-").
+    > Best of --repeat runs (default 3): the fake latencies are fixed, the rest is noise of the machine.
+    > Baseline: --save stores the results in benchmark_baseline.json. Every later run is compared against
+      it; throughput -10% / p99 +20% / memory +25% or worse, or more errors than before, is a regression
+      → exit code 1 (CI-friendly). Only runs with the baseline's -n and --concurrency are compared.
+
+? Usage
+    python benchmark_suite.py                      # run all, compare with the stored baseline
+    python benchmark_suite.py --only rag,chatbot   # some patterns
+    python benchmark_suite.py --save               # accept the current numbers as the new baseline
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Optional
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import (
+    Runnable,
+    RunnableBranch,
+    RunnableLambda,
+    RunnableParallel,
+    RunnablePassthrough,
+)
+from langchain_core.vectorstores import InMemoryVectorStore
+from pydantic import BaseModel, Field
+
+from bulk_extraction import RateLimitError
+from fake_models import FakeChatModel, FakeEmbeddings, fake_text, seeded_random
+
+BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+TOLERANCE = {"throughput": -0.10, "p99_ms": 0.20, "peak_mb": 0.25}
+
+
+class ReviewPydantic(BaseModel):
+    # 4_structure_output.py
+    key_themes: list[str] = Field(description="key themes of the review")
+    summary: str = Field(description="A brief summary of the review")
+    sentiment: Literal["pos", "neg"] = Field(description="sentiment")
+    pros: Optional[list[str]] = Field(default=None, description="pros")
+    cons: Optional[list[str]] = Field(default=None, description="cons")
+    name: Optional[str] = Field(default=None, description="reviewer")
+
+
+class Person(BaseModel):
+    name: str = Field(description="Name of the person")
+    age: int = Field(gt=18, description="Age of the person")
+    city: str = Field(description="Name of the city the person belongs to")
+
+
+@dataclass
+class Pattern:
+    name: str
+    build: Callable[[], Runnable]
+    make_input: Callable[[int], Any]
+    stream: bool = False
+    checks: tuple = tuple(TOLERANCE)
+
+
+def split_text(text: str, chunk_size=1000, chunk_overlap=200) -> list[str]:
+    # RecursiveCharacterTextSplitter(1000, 200) of rag.ipynb, on word bounds
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        if end < len(text):
+            end = text.rfind(" ", start, end) + 1 or end
+        chunks.append(text[start:end].strip())
+        if end == len(text):
+            break
+        start = max(start + 1, end - chunk_overlap)
+    return chunks
+
+
+# --------------------------------------
+# the patterns
+# --------------------------------------
+def sequence_chain(model):
+    parser = StrOutputParser()
+    prompt1 = PromptTemplate.from_template("Write a joke about {topic}")
+    prompt2 = PromptTemplate.from_template(
+        "Explain the following joke - {text}"
+    )
+    return prompt1 | model | parser | prompt2 | model | parser
+
+
+def parallel_chain(model):
+    parser = StrOutputParser()
+    tweet = PromptTemplate.from_template("Generate a tweet about {topic}")
+    linkedin = PromptTemplate.from_template(
+        "Generate a Linkedin post about {topic}"
+    )
+    return RunnableParallel(
+        tweet=tweet | model | parser, linkedin=linkedin | model | parser
+    )
+
+
+def branch_chain(model):
+    parser = StrOutputParser()
+    report = PromptTemplate.from_template("Write a detailed report on {topic}")
+    summarize = PromptTemplate.from_template(
+        "Summarize the following text \n {text}"
+    )
+    return (
+        report
+        | model
+        | parser
+        | RunnableBranch(
+            (lambda x: len(x.split()) > 300, summarize | model | parser),
+            RunnablePassthrough(),
+        )
+    )
+
+
+def person_chain(model):
+    parser = PydanticOutputParser(pydantic_object=Person)
+    template = PromptTemplate(
+        template="Generate the name, age and city of a fictional {place} "
+        "person \n {format_instruction}",
+        input_variables=["place"],
+        partial_variables={
+            "format_instruction": parser.get_format_instructions()
+        },
+    )
+    return template | model | parser
+
+
+def chatbot(model, turns=6):
+    async def conversation(user):
+        chat_history = [
+            SystemMessage(content="You are a helpful AI assistant")
+        ]
+        for turn in range(turns):
+            chat_history.append(
+                HumanMessage(content=f"{user}: question number {turn}")
+            )
+            result = await model.ainvoke(chat_history)
+            chat_history.append(AIMessage(content=result.content))
+        return chat_history
+
+    return RunnableLambda(conversation)
+
+
+def rag_index(store):
+    # rag.ipynb slept 60 s on a 429; here: exponential back-off from 50 ms
+    async def add(chunks):
+        return await store.aadd_texts(chunks)
+
+    return RunnableLambda(add).with_retry(
+        retry_if_exception_type=(RateLimitError,),
+        exponential_jitter_params={"initial": 0.05, "max": 1.0},
+        stop_after_attempt=8,
+    )
+
+
+def rag_chain(model, store):
+    prompt = PromptTemplate(
+        template="""
+      You are a helpful assistant.
+      Answer ONLY from the provided transcript context.
+      If the context is insufficient, just say you don't know.
+
+      {context}
+      Question: {question}
+    """,
+        input_variables=["context", "question"],
+    )
+    retriever = store.as_retriever(
+        search_type="similarity", search_kwargs={"k": 4}
+    )
+
+    def format_docs(retrieved_docs):
+        return "\n\n".join(doc.page_content for doc in retrieved_docs)
+
+    parallel = RunnableParallel(
+        context=retriever | RunnableLambda(format_docs),
+        question=RunnablePassthrough(),
+    )
+    return parallel | prompt | model | StrOutputParser()
+
+
+def patterns() -> dict[str, Pattern]:
+    # provider-like defaults: 20 ms p50 / 80 ms p99 to the first token
+    model = FakeChatModel()
+    long_reports = FakeChatModel(reply_words=(150, 450))
+    embeddings = FakeEmbeddings(max_batch=100)
+    transcript = fake_text(seeded_random(0, "transcript"), 20_000)
+    chunks = split_text(transcript)
+    store = InMemoryVectorStore(embeddings)
+    store.add_documents([Document(page_content=c) for c in chunks])
+    quota = FakeEmbeddings(requests_per_second=40, burst=10)
+    topic = lambda i: {"topic": f"topic {i}"}  # noqa: E731
+    return {
+        pattern.name: pattern
+        for pattern in [
+            Pattern("sequence", lambda: sequence_chain(model), topic),
+            Pattern("parallel", lambda: parallel_chain(model), topic),
+            Pattern("branch", lambda: branch_chain(long_reports), topic),
+            Pattern(
+                "stream", lambda: sequence_chain(model), topic, stream=True
+            ),
+            Pattern("chatbot", lambda: chatbot(model), lambda i: f"user-{i}"),
+            Pattern(
+                "structured",
+                lambda: model.with_structured_output(ReviewPydantic),
+                lambda i: f"Review {i}: {fake_text(seeded_random(i, 'review'), 60)}",
+            ),
+            Pattern(
+                "parser",
+                lambda: person_chain(model),
+                lambda i: {"place": f"place {i}"},
+            ),
+            Pattern(
+                "rag_index",
+                lambda: rag_index(InMemoryVectorStore(quota)),
+                lambda i: chunks[(i * 10) % len(chunks) :][:10],
+                # the tail is retry back-off with jitter, not the chain
+                checks=("throughput", "peak_mb"),
+            ),
+            Pattern(
+                "rag",
+                lambda: rag_chain(model, store),
+                lambda i: f"what is said about {fake_text(seeded_random(i, 'q'), 3)}",
+            ),
+        ]
+    }
+
+
+# --------------------------------------
+# runner
+# --------------------------------------
+async def _drive(pattern: Pattern, n: int, concurrency: int):
+    chain = pattern.build()
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                if pattern.stream:
+                    # latency: first chunk, but the stream is read to the end
+                    # (throughput = finished streams) and always closed
+                    first = None
+                    stream = chain.astream(pattern.make_input(i))
+                    async with contextlib.aclosing(stream):
+                        async for _ in stream:
+                            if first is None:
+                                first = time.perf_counter() - start
+                    latencies.append(first)
+                else:
+                    await chain.ainvoke(pattern.make_input(i))
+                    latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def run_pattern(
+    pattern: Pattern, n: int, concurrency: int, repeat: int = 3
+) -> dict:
+    elapsed, latencies, errors = max(
+        (asyncio.run(_drive(pattern, n, concurrency)) for _ in range(repeat)),
+        key=lambda run: len(run[1]) / run[0],
+    )
+    # memory in a pass of its own: tracemalloc slows Python code down
+    tracemalloc.start()
+    asyncio.run(_drive(pattern, n, concurrency))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    p50 = p99 = None
+    if latencies:
+        p50 = round(statistics.median(latencies) * 1e3, 2)
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        p99 = round(p99 * 1e3, 2)
+    return {
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "peak_mb": round(peak / 2**20, 2),
+        "errors": errors,
+    }
+
+
+def _change(before: dict, current: dict, metric: str) -> float | None:
+    if not before.get(metric) or current[metric] is None:
+        return None  # nothing to compare with
+    return current[metric] / before[metric] - 1
+
+
+def compare(results: dict, baseline: dict, selected: dict) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current["errors"] > before["errors"]:
+            regressions.append(
+                f"{name}.errors: {before['errors']} → {current['errors']}"
+            )
+        for metric in selected[name].checks:
+            tolerance = TOLERANCE[metric]
+            change = _change(before, current, metric)
+            if change is None:
+                continue
+            worse = change < tolerance if tolerance < 0 else change > tolerance
+            if worse:
+                regressions.append(
+                    f"{name}.{metric}: {before[metric]} → {current[metric]} "
+                    f"({change:+.0%})"
+                )
+    return regressions
+
+
+def _format(value, spec: str) -> str:
+    if value is None:
+        return f"{'-':>{spec.lstrip('+').split('.')[0]}s}"
+    return format(value, spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--only", help="comma separated pattern names")
+    parser.add_argument("-n", type=int, default=200, help="inputs per pattern")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args(argv)
+
+    selected = patterns()
+    if args.only:
+        selected = {name: selected[name] for name in args.only.split(",")}
+    baseline, setup = {}, None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        setup = (stored["n"], stored["concurrency"])
+        if setup == (args.n, args.concurrency) or args.save:
+            baseline = stored["results"]
+        if setup != (args.n, args.concurrency):
+            # other load, other numbers: nothing to compare with
+            print(
+                f"baseline was recorded with -n {setup[0]} --concurrency "
+                f"{setup[1]}, not compared"
+            )
+    same_setup = setup in (None, (args.n, args.concurrency))
+
+    print(
+        f"{args.n} inputs per pattern, {args.concurrency} at a time\n"
+        f"{'pattern':11s} {'inputs/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} "
+        f"{'peak MB':>8s} {'errors':>6s}   vs baseline (throughput / p99)"
+    )
+    results = {}
+    for name, pattern in selected.items():
+        result = results[name] = run_pattern(
+            pattern, args.n, args.concurrency, args.repeat
+        )
+        before = baseline.get(name)
+        versus = (
+            " / ".join(
+                _format(_change(before, result, metric), "+6.1%")
+                for metric in ("throughput", "p99_ms")
+            )
+            if before and same_setup
+            else "(new)" if same_setup else "-"
+        )
+        print(
+            f"{name:11s} {result['throughput']:9.1f} "
+            f"{_format(result['p50_ms'], '8.1f')} "
+            f"{_format(result['p99_ms'], '8.1f')} {result['peak_mb']:8.2f} "
+            f"{result['errors']:6d}   {versus}"
+        )
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "n": args.n,
+                    "concurrency": args.concurrency,
+                    # another setup replaces the baseline, no mixed numbers
+                    "results": (
+                        {**baseline, **results} if same_setup else results
+                    ),
+                },
+                f,
+                indent=2,
+            )
+        print(f"baseline saved to {os.path.basename(args.baseline)}")
+        return 0
+    regressions = compare(results, baseline, selected)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
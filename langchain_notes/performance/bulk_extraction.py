@@ -0,0 +1,350 @@
+"""
+* Bulk Extraction with Structured Output
+    > model.with_structured_output(ReviewPydantic) in 4_structure_output.py extracts ONE review per call.
+      Every call pays the fixed part again: instructions + JSON schema of ReviewPydantic (hundreds of tokens)
+      + one network round trip. For millions of short reviews this fixed part dominates cost and time.
+
+* Pack → Extract → Split → Retry
+    > Pack: Short documents are packed into one request (max_docs per request and a max_chars budget),
+      each wrapped as <doc id="17">...</doc>.
+    > Array Schema: The item schema is the original schema + a doc_id field; the request schema is a lenient
+      envelope {"items": [object, ...]} that only DESCRIBES the item schema. Both are generated with
+      pydantic.create_model, so ReviewPydantic stays untouched. A strict list[Item] would make the provider's
+      parser reject the whole answer for one bad item.
+    > Split: Items are matched back to documents by doc_id and validated one by one against the schema
+      (split_batch). A missing / invalid / duplicated item only fails its own document.
+    > Retry Queue: Failed documents are retried ONE AT A TIME with the plain single-document schema, so a single
+      bad review can never fail a whole batch twice.
+    > Adaptive Concurrency (AIMD, like TCP): Every round of successes raises the requests in flight by 1,
+      a rate-limit error halves it and the request is retried after a backoff → throughput follows whatever
+      the provider currently allows.
+
+? Usage
+    extractor = BulkExtractor(model, ReviewPydantic, max_docs=8)
+    results = extractor.run(reviews)     # one ReviewPydantic (or Exception) per review, in order
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel, Field, create_model
+
+INSTRUCTIONS = (
+    "Extract the requested fields from EVERY document below. "
+    "Return exactly one item per document and copy its doc_id.\n\n"
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def is_rate_limit(error: Exception) -> bool:
+    # openai / anthropic: RateLimitError + status_code, google: ResourceExhausted
+    name = type(error).__name__.lower()
+    if "ratelimit" in name or "resourceexhausted" in name:
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+class AdaptiveLimiter:
+    # additive increase / multiplicative decrease of requests in flight
+
+    def __init__(self, initial=4, minimum=1, maximum=64):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1 / max(self.limit, 1))
+            self._cond.notify_all()
+
+    def throttled(self):
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+def batch_schema(schema: type[BaseModel]):
+    item = create_model(
+        f"{schema.__name__}Item",
+        __base__=schema,
+        doc_id=(int, Field(description="doc_id of the document")),
+    )
+    # the items are checked one by one (split_batch), not by the provider
+    batch = create_model(
+        f"{schema.__name__}Batch",
+        items=(
+            list[dict],
+            Field(
+                description="one object per document, each matching: "
+                + json.dumps(item.model_json_schema())
+            ),
+        ),
+    )
+    return item, batch
+
+
+def split_batch(batch, schema: type[BaseModel]) -> dict:
+    # doc_id -> validated schema instance; bad or duplicated items are left
+    # out, so only their own documents fail
+    items, duplicated = {}, set()
+    for raw in getattr(batch, "items", None) or []:
+        if not isinstance(raw, dict):
+            continue
+        raw = dict(raw)
+        try:
+            doc_id = int(raw.pop("doc_id"))
+            value = schema.model_validate(raw)
+        except (KeyError, TypeError, ValueError):
+            continue  # ValidationError is a ValueError
+        if doc_id in items or doc_id in duplicated:
+            items.pop(doc_id, None)
+            duplicated.add(doc_id)
+            continue
+        items[doc_id] = value
+    return items
+
+
+def pack(documents, max_docs=8, max_chars=6000):
+    # yields lists of (doc_id, text); long documents travel alone
+    group, size = [], 0
+    for doc_id, text in documents:
+        if group and (len(group) == max_docs or size + len(text) > max_chars):
+            yield group
+            group, size = [], 0
+        group.append((doc_id, text))
+        size += len(text)
+    if group:
+        yield group
+
+
+class BulkExtractor:
+
+    def __init__(
+        self,
+        model,
+        schema: type[BaseModel],
+        max_docs: int = 8,
+        max_chars: int = 6000,
+        limiter: AdaptiveLimiter | None = None,
+        max_workers: int = 64,
+        max_rate_limit_retries: int = 8,
+    ):
+        self.schema = schema
+        self.item_schema, batch = batch_schema(schema)
+        self.batch_model = model.with_structured_output(batch)
+        self.single_model = model.with_structured_output(schema)
+        self.max_docs = max_docs
+        self.max_chars = max_chars
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_workers = max_workers
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.stats = {"requests": 0, "retried_docs": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+
+    def run(self, texts: list[str]) -> list:
+        results = [None] * len(texts)
+        retry = []
+        lock = threading.Lock()
+
+        def extract_group(group):
+            prompt = INSTRUCTIONS + "\n".join(
+                f'<doc id="{doc_id}">\n{text}\n</doc>'
+                for doc_id, text in group
+            )
+            try:
+                items = split_batch(
+                    self._call(self.batch_model, prompt), self.schema
+                )
+            except Exception:
+                items = {}
+            failed = []
+            for doc_id, text in group:
+                item = items.get(doc_id)
+                if item is None:
+                    failed.append((doc_id, text))
+                else:
+                    results[doc_id] = item
+            with lock:
+                retry.extend(failed)
+
+        def extract_single(doc_id, text):
+            try:
+                results[doc_id] = self._call(self.single_model, text)
+            except Exception as e:
+                results[doc_id] = e
+
+        documents = list(enumerate(texts))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            groups = pack(documents, self.max_docs, self.max_chars)
+            list(executor.map(extract_group, groups))
+            self._count("retried_docs", len(retry))
+            list(executor.map(lambda d: extract_single(*d), retry))
+        return results
+
+    def _call(self, runnable, prompt):
+        for attempt in range(self.max_rate_limit_retries + 1):
+            with self.limiter:
+                try:
+                    self._count("requests")
+                    result = runnable.invoke(prompt)
+                except Exception as e:
+                    last = attempt == self.max_rate_limit_retries
+                    if not is_rate_limit(e) or last:
+                        raise
+                    self._count("rate_limited")
+                    self.limiter.throttled()
+                else:
+                    self.limiter.success()
+                    return result
+            time.sleep(min(2.0, 0.05 * 2**attempt))
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+
+if __name__ == "__main__":
+    import random
+    import re
+    from typing import Literal, Optional
+
+    from langchain_core.runnables import RunnableLambda
+
+    class ReviewPydantic(BaseModel):
+        key_themes: list[str] = Field(description="key themes of the review")
+        summary: str = Field(description="A brief summary of the review")
+        sentiment: Literal["pos", "neg"] = Field(description="sentiment")
+        name: Optional[str] = Field(default=None, description="reviewer")
+
+    # local fake provider: latency and price depend on tokens, max 8 concurrent
+    # requests (else RateLimitError), ~1% of batch items come back broken
+    class FakeStructuredModel:
+        schema_tokens = 350  # instructions + JSON schema sent with every call
+        concurrency_limit = 8
+
+        def __init__(self):
+            self.in_flight = 0
+            self.lock = threading.Lock()
+            self.input_tokens = 0
+            self.output_tokens = 0
+
+        def with_structured_output(self, schema):
+            return RunnableLambda(lambda prompt: self._respond(schema, prompt))
+
+        def _respond(self, schema, prompt):
+            with self.lock:
+                if self.in_flight >= self.concurrency_limit:
+                    raise RateLimitError("429 too many requests")
+                self.in_flight += 1
+            try:
+                docs = re.findall(
+                    r'<doc id="(\d+)">\n(.*?)\n</doc>', prompt, re.S
+                )
+                docs = docs or [(None, prompt)]
+                out_tokens = 40 * len(docs)
+                in_tokens = self.schema_tokens + len(prompt) // 4
+                time.sleep(0.03 + in_tokens * 2e-5 + out_tokens * 1e-4)
+                with self.lock:
+                    self.input_tokens += in_tokens
+                    self.output_tokens += out_tokens
+                items = [
+                    {
+                        "doc_id": int(doc_id) if doc_id else 0,
+                        "key_themes": ["camera", "battery"],
+                        "summary": text[:40],
+                        "sentiment": (
+                            "pos" if random.random() > 0.01 else "meh"
+                        ),
+                        "name": None,
+                    }
+                    for doc_id, text in docs
+                ]
+                if "items" in schema.model_fields:
+                    return schema.model_validate({"items": items})
+                return schema.model_validate({**items[0], "sentiment": "pos"})
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        def cost(self):
+            # $ per 1M tokens, in the range of a small hosted model
+            return self.input_tokens * 0.15e-6 + self.output_tokens * 0.6e-6
+
+    random.seed(0)
+    reviews = [
+        f"Review {i}: The phone is fast, the camera is great, battery lasts "
+        f"all day but it is heavy. " * random.randint(1, 3)
+        for i in range(1200)
+    ]
+
+    def one_call_per_review(extractor, texts):
+        # what 4_structure_output.py does: with_structured_output per review
+        def extract(text):
+            try:
+                return extractor._call(extractor.single_model, text)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            return list(executor.map(extract, texts))
+
+    for name in ["one call per review", "packed x8"]:
+        model = FakeStructuredModel()
+        extractor = BulkExtractor(
+            model, ReviewPydantic, max_docs=8, limiter=AdaptiveLimiter(4)
+        )
+        start = time.perf_counter()
+        if name == "packed x8":
+            results = extractor.run(reviews)
+        else:
+            results = one_call_per_review(extractor, reviews)
+        elapsed = time.perf_counter() - start
+        ok = sum(isinstance(r, ReviewPydantic) for r in results)
+        print(
+            f"{name:20s} | {len(reviews) / elapsed:7.1f} docs/s | "
+            f"${model.cost() / len(reviews) * 1e6:6.1f} per 1M docs | "
+            f"{ok}/{len(reviews)} ok | {extractor.stats} | "
+            f"final concurrency {extractor.limiter.limit:.1f}"
+        )
+
+    # one broken / duplicated item only fails its own document
+    _, batch = batch_schema(ReviewPydantic)
+    good = {"key_themes": ["x"], "summary": "s", "sentiment": "pos"}
+    items = split_batch(
+        batch.model_validate(
+            {
+                "items": [
+                    {**good, "doc_id": 0},
+                    {**good, "doc_id": 1, "sentiment": "meh"},
+                    {**good, "doc_id": 2},
+                    {**good, "doc_id": 2},
+                ]
+            }
+        ),
+        ReviewPydantic,
+    )
+    assert list(items) == [0], items
+    assert is_rate_limit(RateLimitError()) and not is_rate_limit(
+        ValueError("order #429 not found")
+    )
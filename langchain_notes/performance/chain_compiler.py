@@ -0,0 +1,401 @@
+"""
+* Why compile a chain ?
+    > Every invoke() of template1 | model | parser | template2 | model | parser walks the Runnable objects
+      again: a config + callback manager is created per step, the prompt re-checks its input variables and
+      re-formats the template, the parser is wrapped in its own run.
+    > The structure of the chain never changes between calls, so this work can be done once.
+
+* What the compiler does
+    > Flatten: RunnableSequence / RunnableParallel / RunnableLambda / RunnableBranch / RunnablePassthrough
+      are turned into a flat list of plan steps (plain Python callables).
+    > Pre-bind Prompts: An f-string PromptTemplate is parsed once into literal/field segments and its
+      placeholders are checked against input_variables + partial_variables at compile time. At run time it is
+      just a "".join() over the segments.
+    > Fuse: Adjacent pure-Python steps (prompt rendering, StrOutputParser, lambdas, passthrough) are fused into
+      one plan step, so only the model calls remain as separate steps.
+    > Opaque Steps: Everything the compiler does not understand (models, retrievers, ChatPromptTemplate ...)
+      is kept as a single step that calls runnable.invoke().
+    > Prompt Values: A prebound prompt hands a plain str to the next step only if every reader of its output is
+      a BaseLanguageModel (a model treats both the same); anything else gets a StringPromptValue, like in LCEL.
+
+! Trade-off
+    > A compiled chain skips LangChain callbacks, so LangSmith tracing only sees the model calls.
+      Compile the hot path, keep the normal chain for debugging.
+    > A chain with an impure RunnableParallel owns a thread pool: close() it (or use it in a with block).
+
+? Usage
+    compiled = compile_chain(template1 | model | parser | template2 | model | parser)
+    print(compiled.describe())
+    result = compiled.invoke({"topic": "black hole"})
+"""
+
+import inspect
+import string
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import (
+    Runnable,
+    RunnableBranch,
+    RunnableLambda,
+    RunnableParallel,
+    RunnablePassthrough,
+    RunnableSequence,
+)
+
+
+@dataclass
+class PlanStep:
+    name: str
+    fn: Callable[[Any], Any]
+    pure: bool  # pure python steps can be fused with their neighbours
+    calls_model: bool = False  # its input is only read by language models
+    close: Callable[[], None] | None = None
+
+
+class CompiledChain:
+
+    def __init__(self, steps: list[PlanStep]):
+        self.steps = steps
+        self._fns = tuple(step.fn for step in steps)
+
+    def invoke(self, value):
+        for fn in self._fns:
+            value = fn(value)
+        return value
+
+    def batch(self, inputs, max_workers=8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.invoke, inputs))
+
+    def as_runnable(self):
+        return RunnableLambda(self.invoke, name="CompiledChain")
+
+    def close(self):
+        for step in self.steps:
+            if step.close is not None:
+                step.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def describe(self):
+        return "\n".join(
+            f"{i}: {step.name}" for i, step in enumerate(self.steps)
+        )
+
+
+class ChainCompileError(ValueError):
+    pass
+
+
+def compile_chain(runnable: Runnable) -> CompiledChain:
+    return CompiledChain(_fuse(_prompts_to_text(_compile(runnable))))
+
+
+def _compile(runnable) -> list[PlanStep]:
+    if isinstance(runnable, RunnableSequence):
+        steps = []
+        for step in runnable.steps:
+            steps.extend(_compile(step))
+        return steps
+    if isinstance(runnable, RunnablePassthrough) and runnable.func is None:
+        return [PlanStep("passthrough", _identity, pure=True)]
+    if isinstance(runnable, RunnableParallel):
+        return [_compile_parallel(runnable)]
+    if isinstance(runnable, RunnableBranch):
+        return [_compile_branch(runnable)]
+    if isinstance(runnable, RunnableLambda) and _takes_one_arg(runnable.func):
+        return [PlanStep(runnable.get_name(), runnable.func, pure=True)]
+    if isinstance(runnable, PromptTemplate) and (
+        runnable.template_format == "f-string"
+    ):
+        return [_compile_prompt(runnable)]
+    if type(runnable) is StrOutputParser:
+        return [PlanStep("StrOutputParser", _message_text, pure=True)]
+    return [
+        PlanStep(
+            runnable.get_name(),
+            runnable.invoke,
+            pure=False,
+            calls_model=isinstance(runnable, BaseLanguageModel),
+        )
+    ]
+
+
+def compile_segments(template: str, partials: dict | None = None):
+    # "Hi {name}!" -> (("Hi ", "name"), ("!", None)), static partials are
+    # inlined, callable partials (e.g. the date) stay variables
+    partials = partials or {}
+    segments = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if (
+            spec
+            or conversion
+            or (field is not None and not field.isidentifier())
+        ):
+            raise ChainCompileError(
+                f"unsupported placeholder {{{field}}} in prompt template"
+            )
+        if field in partials and not callable(partials[field]):
+            literal, field = literal + str(partials[field]), None
+        if segments and segments[-1][1] is None:
+            literal = segments.pop()[0] + literal
+        segments.append((literal, field))
+    return tuple(segments)
+
+
+def render_segments(segments, values):
+    return "".join(
+        literal if field is None else literal + str(values[field])
+        for literal, field in segments
+    )
+
+
+def _compile_prompt(prompt: PromptTemplate) -> PlanStep:
+    parts = compile_segments(prompt.template, prompt.partial_variables)
+    fields = {field for _, field in parts if field is not None}
+    known = set(prompt.input_variables) | set(prompt.partial_variables)
+    if fields - known:
+        raise ChainCompileError(
+            f"prompt uses undeclared variables {sorted(fields - known)}"
+        )
+    dynamic = {
+        k: v for k, v in prompt.partial_variables.items() if callable(v)
+    }
+    single_var = (
+        prompt.input_variables[0] if len(prompt.input_variables) == 1 else None
+    )
+
+    def render(value):
+        if not isinstance(value, dict):
+            if single_var is None:
+                raise TypeError(
+                    f"expected a dict with keys {prompt.input_variables}"
+                )
+            value = {single_var: value}
+        if dynamic:
+            value = {**{k: f() for k, f in dynamic.items()}, **value}
+        return render_segments(parts, value)
+
+    return PlanStep("PromptTemplate(prebound)", render, pure=True)
+
+
+def _prompts_to_text(steps):
+    # a prompt value is only needed when something other than a model reads it
+    out = []
+    for i, step in enumerate(steps):
+        next_step = steps[i + 1] if i + 1 < len(steps) else None
+        if step.name == "PromptTemplate(prebound)" and not (
+            next_step and next_step.calls_model
+        ):
+            step = PlanStep(step.name, _then_prompt_value(step.fn), pure=True)
+        out.append(step)
+    return out
+
+
+def _compile_parallel(parallel: RunnableParallel) -> PlanStep:
+    branches = {
+        key: compile_chain(step) for key, step in parallel.steps__.items()
+    }
+    pure = all(s.pure for branch in branches.values() for s in branch.steps)
+    if pure:
+
+        def run(value):
+            return {key: b.invoke(value) for key, b in branches.items()}
+
+        return PlanStep(f"Parallel<{','.join(branches)}>", run, pure=True)
+
+    executor = ThreadPoolExecutor(max_workers=len(branches))
+
+    def close():
+        executor.shutdown()
+        for b in branches.values():
+            b.close()
+
+    def run_concurrently(value):
+        futures = {
+            key: executor.submit(b.invoke, value)
+            for key, b in branches.items()
+        }
+        return {key: f.result() for key, f in futures.items()}
+
+    return PlanStep(
+        f"Parallel<{','.join(branches)}>",
+        run_concurrently,
+        pure=False,
+        calls_model=all(
+            b.steps and b.steps[0].calls_model for b in branches.values()
+        ),
+        close=close,
+    )
+
+
+def _compile_branch(branch: RunnableBranch) -> PlanStep:
+    compiled = [
+        (compile_chain(condition), compile_chain(runnable))
+        for condition, runnable in branch.branches
+    ]
+    default = compile_chain(branch.default)
+    plans = [plan for pair in compiled for plan in pair] + [default]
+    pure = all(s.pure for plan in plans for s in plan.steps)
+    routes = tuple((c.invoke, r.invoke) for c, r in compiled)
+    default = default.invoke
+
+    def close():
+        for plan in plans:
+            plan.close()
+
+    def route(value):
+        for condition, runnable in routes:
+            if condition(value):
+                return runnable(value)
+        return default(value)
+
+    # the conditions read the input too, so it always stays a prompt value
+    return PlanStep("Branch", route, pure=pure, close=None if pure else close)
+
+
+def _fuse(steps: list[PlanStep]) -> list[PlanStep]:
+    fused, group = [], []
+
+    def flush():
+        group_fns = tuple(s.fn for s in group if s.fn is not _identity)
+        if len(group_fns) == 1:
+            fused.append(PlanStep(group[0].name, group_fns[0], pure=True))
+        elif group:
+
+            def run(value, fns=group_fns):
+                for fn in fns:
+                    value = fn(value)
+                return value
+
+            names = " + ".join(s.name for s in group)
+            fused.append(PlanStep(f"fused[{names}]", run, pure=True))
+        group.clear()
+
+    for step in steps:
+        if step.pure:
+            group.append(step)
+        else:
+            flush()
+            fused.append(step)
+    flush()
+    return fused
+
+
+def _identity(value):
+    return value
+
+
+def _message_text(value):
+    return value.text if isinstance(value, BaseMessage) else value
+
+
+def _then_prompt_value(fn):
+    def render(value):
+        return StringPromptValue(text=fn(value))
+
+    return render
+
+
+def _takes_one_arg(func):
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    required = [
+        p
+        for p in params
+        if p.default is p.empty
+        and p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+    ]
+    return len(required) == 1 and len(params) == 1
+
+
+if __name__ == "__main__":
+    import time
+
+    from langchain_core.language_models.fake_chat_models import (
+        FakeListChatModel,
+    )
+
+    # no-op model: returns instantly, so only framework overhead is measured
+    model = FakeListChatModel(responses=["a short answer"])
+    parser = StrOutputParser()
+    template1 = PromptTemplate(
+        template="Write a detailed report on {topic}",
+        input_variables=["topic"],
+    )
+    template2 = PromptTemplate(
+        template="Write a 5 line summary on the following text. /n {text}",
+        input_variables=["text"],
+    )
+
+    chains = {
+        "sequence": template1 | model | parser | template2 | model | parser,
+        "parallel+lambda": template1
+        | model
+        | parser
+        | RunnableParallel(
+            {
+                "joke": RunnablePassthrough(),
+                "word_count": RunnableLambda(lambda x: len(x.split())),
+            }
+        ),
+        "branch": template1
+        | model
+        | parser
+        | RunnableBranch(
+            (lambda x: len(x.split()) > 300, template2 | model | parser),
+            RunnablePassthrough(),
+        ),
+    }
+
+    # a prompt read by anything but a model stays a StringPromptValue
+    for chain in [
+        template1
+        | RunnableParallel(raw=RunnablePassthrough(), answer=model | parser),
+        template1 | RunnableLambda(lambda x: type(x).__name__),
+    ]:
+        with compile_chain(chain) as compiled:
+            assert compiled.invoke({"topic": "AI"}) == chain.invoke(
+                {"topic": "AI"}
+            )
+    with compile_chain(template1 | RunnableParallel(a=model, b=model)) as c:
+        assert (
+            c.steps[0].fn({"topic": "AI"}) == "Write a detailed report on AI"
+        )
+
+    calls = 2000
+    for name, chain in chains.items():
+        compiled = compile_chain(chain)
+        assert compiled.invoke({"topic": "AI"}) == chain.invoke(
+            {"topic": "AI"}
+        )
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            chain.invoke({"topic": "AI"})
+        lcel = (time.perf_counter() - start) / calls
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            compiled.invoke({"topic": "AI"})
+        fast = (time.perf_counter() - start) / calls
+
+        print(f"--- {name}: plan ---\n{compiled.describe()}")
+        print(
+            f"LCEL invoke: {lcel * 1e6:8.1f} us/call | compiled: "
+            f"{fast * 1e6:8.1f} us/call | {lcel / fast:.1f}x"
+        )
@@ -0,0 +1,255 @@
+"""
+* From one input() loop to a chat service
+    > 3_chatbot.py serves one user, blocks on input() and keeps the history in RAM (gone on restart).
+    > 2_langchain_components.py reloads the history for MessagesPlaceholder by reading chat_history.txt line
+      by line: to get the last messages of ONE conversation the whole file has to be read.
+
+* Design
+    > asyncio Server: One event loop serves thousands of sessions. While a session waits for the LLM
+      (await model.ainvoke(...)) the loop serves other sessions. Messages of one session are handled in order
+      (one asyncio.Lock per session, dropped when no message of the session is waiting).
+      The history file IO runs in a worker thread (asyncio.to_thread): a slow disk never stalls the loop.
+    > Append-only History Log: Every message is appended as one JSON line:
+        [session_id, role, content, prev_offset, prev_length]
+      prev_* points to the previous message of the SAME session, so every session is a linked list inside
+      one shared file. Appending never rewrites anything.
+    > Session Index: session_id -> (offset, length) of the newest message. It is rebuilt with one scan when the
+      service starts; after that loading the last N messages is N positioned reads (os.pread) walking the
+      linked list backwards → O(N), independent of the file size and the number of sessions.
+    > Protocol: newline-delimited JSON over TCP: {"session": "...", "message": "..."} → {"reply": "..."}
+
+? Run the load test
+    python langchain_notes/performance/chat_server.py
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import Counter
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+_MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage}
+
+
+class HistoryLog:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._heads: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._writer = open(path, "ab")
+        self._reader = os.open(path, os.O_RDONLY)
+        self._end = self._rebuild_index()
+
+    def _rebuild_index(self):
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write at the end of the file
+                session = json.loads(line)[0]
+                self._heads[session] = (offset, len(line))
+                offset += len(line)
+        self._writer.truncate(offset)
+        return offset
+
+    def append(self, session: str, role: str, content: str):
+        with self._lock:
+            prev_offset, prev_length = self._heads.get(session, (-1, 0))
+            record = json.dumps(
+                [session, role, content, prev_offset, prev_length]
+            ).encode()
+            record += b"\n"
+            self._writer.write(record)
+            self._writer.flush()
+            self._heads[session] = (self._end, len(record))
+            self._end += len(record)
+
+    def load_last(self, session: str, n: int) -> list[tuple[str, str]]:
+        # walk the per-session linked list backwards: n reads, no scan
+        offset, length = self._heads.get(session, (-1, 0))
+        messages = []
+        while offset >= 0 and len(messages) < n:
+            _, role, content, offset, length = json.loads(
+                os.pread(self._reader, length, offset)
+            )
+            messages.append((role, content))
+        messages.reverse()
+        return messages
+
+    def sync(self):
+        with self._lock:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+
+    def close(self):
+        self._writer.close()
+        os.close(self._reader)
+
+    @property
+    def sessions(self):
+        return len(self._heads)
+
+
+class ChatService:
+
+    def __init__(
+        self,
+        model,
+        log: HistoryLog,
+        system_prompt: str = "You are a helpful AI assistant",
+        history_window: int = 20,
+    ):
+        self.model = model
+        self.log = log
+        self.system_prompt = SystemMessage(content=system_prompt)
+        self.history_window = history_window
+        self._session_locks: dict[str, asyncio.Lock] = {}
+        self._lock_users = Counter()
+
+    async def chat(self, session: str, text: str) -> str:
+        lock = self._session_locks.get(session)
+        if lock is None:
+            lock = self._session_locks[session] = asyncio.Lock()
+        self._lock_users[session] += 1
+        try:
+            async with lock:
+                return await self._chat(session, text)
+        finally:
+            self._lock_users[session] -= 1
+            if not self._lock_users[session]:
+                del self._lock_users[session], self._session_locks[session]
+
+    async def _chat(self, session: str, text: str) -> str:
+        history = await asyncio.to_thread(
+            self.log.load_last, session, self.history_window
+        )
+        messages = [self.system_prompt]
+        messages += [_MESSAGE_TYPES[r](content=c) for r, c in history]
+        messages.append(HumanMessage(content=text))
+        result = await self.model.ainvoke(messages)
+
+        def save():
+            self.log.append(session, "human", text)
+            self.log.append(session, "ai", result.content)
+
+        await asyncio.to_thread(save)
+        return result.content
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    reply = {
+                        "reply": await self.chat(
+                            request["session"], request["message"]
+                        )
+                    }
+                except Exception as e:
+                    reply = {"error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(
+            self.handle_connection, host, port, limit=2**20
+        )
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    # local fake LLM: non-blocking 20-80 ms latency, deterministic reply
+    class AsyncFakeChatModel(BaseChatModel):
+        @property
+        def _llm_type(self):
+            return "async-fake-chat-model"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kw):
+            raise NotImplementedError("use ainvoke")
+
+        async def _agenerate(
+            self, messages, stop=None, run_manager=None, **kw
+        ):
+            await asyncio.sleep(random.uniform(0.02, 0.08))
+            reply = f"answer #{len(messages)} to: {messages[-1].content[:30]}"
+            message = AIMessage(content=reply)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def client(port, session, turns, latencies):
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", port, limit=2**20
+        )
+        for turn in range(turns):
+            request = {"session": session, "message": f"question {turn}"}
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            assert "reply" in reply, reply
+        # a broken line gets an error, the connection stays usable
+        writer.write(b"not json\n")
+        await writer.drain()
+        assert "error" in json.loads(await reader.readline())
+        writer.close()
+
+    async def load_test(sessions, turns):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = HistoryLog(os.path.join(tmp, "history.log"))
+            service = ChatService(AsyncFakeChatModel(), log)
+            server = await service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            latencies = []
+            start = time.perf_counter()
+            # open the clients in waves to stay below the fd limit
+            for wave in range(0, sessions, 500):
+                await asyncio.gather(
+                    *(
+                        client(port, f"user-{i}", turns, latencies)
+                        for i in range(wave, min(wave + 500, sessions))
+                    )
+                )
+            elapsed = time.perf_counter() - start
+            assert not service._session_locks  # idle sessions hold no lock
+            server.close()
+            await server.wait_closed()
+
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(
+                f"{sessions} sessions x {turns} turns: "
+                f"{sessions / elapsed:7.1f} sessions/s, "
+                f"{len(latencies) / elapsed:7.1f} msgs/s, "
+                f"p50 {p50 * 1e3:6.1f} ms, p99 {p99 * 1e3:6.1f} ms"
+            )
+
+            # loading the tail of one session does not depend on file size
+            size = os.path.getsize(log.path)
+            start = time.perf_counter()
+            for _ in range(1000):
+                log.load_last("user-7", 20)
+            indexed = (time.perf_counter() - start) / 1000
+            start = time.perf_counter()
+            with open(log.path) as f:
+                [line for line in f if line.startswith('["user-7"')]
+            scan = time.perf_counter() - start
+            print(
+                f"log {size / 1e6:.1f} MB, {log.sessions} sessions | last 20"
+                f" msgs: indexed {indexed * 1e6:.0f} us vs full scan "
+                f"{scan * 1e3:.1f} ms"
+            )
+            log.close()
+
+    asyncio.run(load_test(sessions=2000, turns=5))
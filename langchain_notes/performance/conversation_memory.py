@@ -0,0 +1,253 @@
+"""
+* Problem with the chatbot loop in 3_chatbot.py
+    > chat_history grows by 2 messages every turn and the WHOLE list is sent with model.invoke(chat_history).
+    > Prompt tokens (cost) and latency grow linearly with the number of turns, and after enough turns the
+      context window of the model overflows.
+
+* Token-budgeted Window + Incremental Summary (Summarizer-Based Memory from 2_langchain_components.py)
+    > Window: Only the most recent turns that fit into a token budget are sent as-is.
+    > Summary: Turns that fall out of the window are folded into a running summary
+      (new_summary = summarize(old_summary, evicted_turns)), which is sent inside the system message.
+    > Off the request path: Summarization runs on a background thread. The evicted turns stay in the window
+      until their summary has landed, so nothing is lost and the user never waits for the summarizer
+      (the window may exceed the budget for a moment).
+    > Compact storage: Every turn is a Turn record with __slots__ (no per-object __dict__) and the role
+      strings are interned. A record costs ~56 bytes + its text; messages are only built when sent.
+
+? Usage (instead of chat_history = [...])
+    memory = ConversationMemory("You are a helpful AI assistant", token_budget=1000,
+                                summarizer=llm_summarizer(model))
+    memory.add("human", user_input)
+    result = model.invoke(memory.messages())
+    memory.add("ai", result.content)
+"""
+
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+HUMAN = sys.intern("human")
+AI = sys.intern("ai")
+_MESSAGE_TYPES = {HUMAN: HumanMessage, AI: AIMessage}
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token for english text, good enough for budgeting
+    return len(text) // 4 + 1
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: int):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = tokens
+
+    def to_message(self):
+        return _MESSAGE_TYPES[self.role](content=self.content)
+
+
+SUMMARY_TEMPLATE = PromptTemplate(
+    template="""Progressively summarize the conversation, adding onto the previous summary.
+Keep names, facts and decisions. Return only the new summary.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+""",
+    input_variables=["summary", "new_lines"],
+)
+
+
+def llm_summarizer(model):
+    chain = SUMMARY_TEMPLATE | model | StrOutputParser()
+
+    def summarize(summary, turns):
+        new_lines = "\n".join(f"{t.role}: {t.content}" for t in turns)
+        return chain.invoke({"summary": summary, "new_lines": new_lines})
+
+    return summarize
+
+
+class ConversationMemory:
+
+    def __init__(
+        self,
+        system_prompt: str,
+        token_budget: int = 1000,
+        summarizer=None,
+        count_tokens=approx_tokens,
+        evict_fraction: float = 0.5,
+    ):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.evict_fraction = evict_fraction
+        self.summary = ""
+        self._window: deque[Turn] = deque()
+        self._window_tokens = 0
+        self._in_flight = 0  # oldest turns currently being summarized
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def add(self, role: str, content: str):
+        turn = Turn(role, content, self.count_tokens(content))
+        with self._lock:
+            self._window.append(turn)
+            self._window_tokens += turn.tokens
+            if self._window_tokens > self.token_budget and not self._in_flight:
+                self._start_summary()
+
+    def messages(self) -> list:
+        with self._lock:
+            system = self.system_prompt
+            if self.summary:
+                system += (
+                    f"\n\nSummary of the earlier conversation:\n{self.summary}"
+                )
+            return [SystemMessage(content=system)] + [
+                turn.to_message() for turn in self._window
+            ]
+
+    def prompt_tokens(self) -> int:
+        with self._lock:
+            return (
+                self.count_tokens(self.system_prompt)
+                + self.count_tokens(self.summary)
+                + self._window_tokens
+            )
+
+    def wait(self):
+        # block until the background summary is done (tests / shutdown)
+        pending = self._pending
+        if pending is not None:
+            pending.result()
+
+    def _start_summary(self):
+        # evict the oldest turns until the window is back to evict_fraction
+        target = self.token_budget * self.evict_fraction
+        tokens, count = self._window_tokens, 0
+        for turn in self._window:
+            if tokens <= target or count == len(self._window) - 1:
+                break
+            tokens -= turn.tokens
+            count += 1
+        if count == 0:
+            return
+        if self.summarizer is None:
+            # plain window memory: just drop the oldest turns
+            for _ in range(count):
+                self._window_tokens -= self._window.popleft().tokens
+            return
+        self._in_flight = count
+        evicted = [self._window[i] for i in range(count)]
+        self._pending = self._executor.submit(
+            self._summarize, self.summary, evicted
+        )
+
+    def _summarize(self, summary, evicted):
+        try:
+            new_summary = self.summarizer(summary, evicted)
+        except Exception:
+            # keep the turns in the window and retry on the next add()
+            with self._lock:
+                self._in_flight = 0
+            raise
+        with self._lock:
+            self.summary = new_summary
+            for _ in range(self._in_flight):
+                self._window_tokens -= self._window.popleft().tokens
+            self._in_flight = 0
+
+
+if __name__ == "__main__":
+    import statistics
+    import time
+
+    from langchain_core.language_models import SimpleChatModel
+
+    # stand-in model: latency = 5ms + 2us per prompt token
+    class TokenLatencyModel(SimpleChatModel):
+        reply: str = "This is a reasonably detailed answer of the model. " * 4
+
+        @property
+        def _llm_type(self):
+            return "token-latency-model"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            tokens = sum(approx_tokens(str(m.content)) for m in messages)
+            time.sleep(0.005 + tokens * 2e-6)
+            return self.reply
+
+    class SummaryModel(TokenLatencyModel):
+        reply: str = "The user asked many questions about cricket. " * 6
+
+    model = TokenLatencyModel()
+    turns = 500
+    questions = [
+        f"Question {i}: tell me something about cricket rules"
+        for i in range(turns)
+    ]
+
+    def run(session):
+        latencies, tokens = [], []
+        for question in questions:
+            start = time.perf_counter()
+            prompt = session(question)
+            tokens.append(sum(approx_tokens(str(m.content)) for m in prompt))
+            latencies.append(time.perf_counter() - start)
+        return latencies, tokens
+
+    # --------------------------------------
+    # Full history replay (3_chatbot.py)
+    # --------------------------------------
+    chat_history = [SystemMessage(content="You are a helpful AI assistant")]
+
+    def full_history(question):
+        chat_history.append(HumanMessage(content=question))
+        prompt = list(chat_history)
+        result = model.invoke(prompt)
+        chat_history.append(AIMessage(content=result.content))
+        return prompt
+
+    # --------------------------------------
+    # Token-budgeted memory
+    # --------------------------------------
+    memory = ConversationMemory(
+        "You are a helpful AI assistant",
+        token_budget=1000,
+        summarizer=llm_summarizer(SummaryModel()),
+    )
+
+    def budgeted(question):
+        memory.add("human", question)
+        prompt = memory.messages()
+        result = model.invoke(prompt)
+        memory.add("ai", result.content)
+        return prompt
+
+    for name, session in [
+        ("full history", full_history),
+        ("memory", budgeted),
+    ]:
+        latencies, tokens = run(session)
+        print(
+            f"{name:12s} | turn 10: {latencies[9] * 1e3:6.1f} ms "
+            f"{tokens[9]:6d} tok | turn 500: {latencies[-1] * 1e3:6.1f} ms "
+            f"{tokens[-1]:6d} tok | mean {statistics.mean(latencies) * 1e3:6.1f} ms "
+            f"| total prompt tokens {sum(tokens)}"
+        )
+    memory.wait()
+    print(
+        f"turn records kept: {len(memory._window)} x {sys.getsizeof(Turn('ai', '', 0))} bytes"
+    )
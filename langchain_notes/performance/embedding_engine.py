@@ -0,0 +1,251 @@
+"""
+* Problem: Embedding on CPU
+    > HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2") in 2_langchain_components.py
+      runs every batch of 32 in fp32 on ONE call chain and hands back list[list[float]]: for 100k chunks that
+      is 38M Python floats that the vector store turns back into an array right away.
+    > A transformer's cost grows with batch_size × padded_length. Mixed short/long chunks in one batch pay
+      for padding (a 10 word chunk next to a 250 word chunk costs like a 250 word chunk).
+
+* Embedding Engine
+    > Length Buckets: Inputs are sorted by length and cut into batches by a TOKEN budget (max_batch_tokens),
+      not a fixed count → short chunks go in large batches, long chunks in small ones, almost no padding.
+    > Thread Pool: Batches run on a pool sized to the cores. torch / numpy release the GIL inside the
+      kernels; with the torch backend every worker gets cores // workers intra-op threads so the pool does not
+      oversubscribe the CPU (TorchBackend(workers=...) must match the engine's max_workers, default: cores).
+      A HF fast tokenizer is not thread-safe ("Already borrowed"), so every worker thread loads its own.
+    > Dynamic int8 (opt-in, quantize=True): torch.ao.quantization.quantize_dynamic turns every nn.Linear into
+      an int8 matmul (weights quantized once, activations per batch) → faster on x86, but the vectors change:
+      compare the cosine to the fp32 vectors on your own chunks before switching an existing index.
+    > One Contiguous Array: Results are written in place into a preallocated float32 (n, dim) array in the
+      original input order. embed_array() returns it as is; embed_documents() keeps the LangChain contract.
+
+? Usage
+    engine = EmbeddingEngine(TorchBackend("sentence-transformers/all-MiniLM-L6-v2", quantize=True))
+    vectors = engine.embed_array(chunks)       # np.ndarray (len(chunks), 384), float32, C-contiguous
+    vector_store = FAISS.from_embeddings(zip(chunks, vectors), engine)
+"""
+
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class TorchBackend:
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        max_length: int = 256,
+        threads: int | None = None,
+        workers: int | None = None,
+    ):
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "TorchBackend needs torch and transformers installed"
+            ) from e
+        self.torch = torch
+        if threads is None:
+            cores = os.cpu_count() or 1
+            threads = max(1, cores // (workers or cores))
+        torch.set_num_threads(threads)
+        self._load_tokenizer = functools.partial(
+            AutoTokenizer.from_pretrained, model_name
+        )
+        self._local = threading.local()
+        model = AutoModel.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        self.model = model
+        self.max_length = max_length
+        self.dim = model.config.hidden_size
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        torch = self.torch
+        batch = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            hidden = self.model(**batch).last_hidden_state
+            # mean pooling over real tokens, like sentence-transformers
+            mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        return pooled.numpy()
+
+    @property
+    def tokenizer(self):
+        # one tokenizer per thread: a fast tokenizer is not thread-safe
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = self._local.tokenizer = self._load_tokenizer()
+        return tokenizer
+
+
+def length_buckets(lengths, max_batch_tokens=8192, max_batch_size=256):
+    # yields index arrays of similar-length inputs within a token budget
+    order = np.argsort(lengths, kind="stable")
+    start = 0
+    for end, index in enumerate(order):
+        size = end - start  # sorted → lengths[index] is the longest so far
+        if size and (
+            size >= max_batch_size
+            or (size + 1) * lengths[index] > max_batch_tokens
+        ):
+            yield order[start:end]
+            start = end
+    if start < len(order):
+        yield order[start:]
+
+
+class EmbeddingEngine(Embeddings):
+
+    def __init__(
+        self,
+        backend,
+        max_batch_tokens: int = 8192,
+        max_batch_size: int = 256,
+        max_workers: int | None = None,
+        normalize: bool = True,
+    ):
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.normalize = normalize
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or os.cpu_count() or 1
+        )
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.backend.dim), dtype=np.float32)
+        if not texts:
+            return out
+        # ~4 characters per token is enough to sort and budget
+        lengths = np.fromiter(
+            (len(t) // 4 + 2 for t in texts), dtype=np.int64, count=len(texts)
+        )
+
+        def run(indices):
+            out[indices] = self.backend.encode([texts[i] for i in indices])
+
+        buckets = length_buckets(
+            lengths, self.max_batch_tokens, self.max_batch_size
+        )
+        list(self._executor.map(run, buckets))
+        if self.normalize:
+            out /= np.maximum(
+                np.linalg.norm(out, axis=1, keepdims=True), 1e-12
+            )
+        return out
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def close(self):
+        self._executor.shutdown()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    import zlib
+
+    # numpy stand-in for MiniLM (torch is optional): hashed token ids,
+    # embedding table + one dense layer per token, masked mean pooling →
+    # cost grows with batch_size × padded_length like the real encoder
+    class NumpyEncoder:
+        dim = 384
+
+        def __init__(self, vocab=8192, max_length=256):
+            rng = np.random.default_rng(0)
+            self.table = rng.standard_normal((vocab, self.dim), np.float32)
+            self.weight = rng.standard_normal((self.dim, self.dim), np.float32)
+            self.weight /= np.sqrt(self.dim)
+            self.vocab = vocab
+            self.max_length = max_length
+
+        def encode(self, texts):
+            ids = [
+                [zlib.crc32(w.encode()) % self.vocab for w in t.split()][
+                    : self.max_length
+                ]
+                or [0]
+                for t in texts
+            ]
+            padded = max(map(len, ids))
+            batch = np.zeros((len(ids), padded), dtype=np.int64)
+            mask = np.zeros((len(ids), padded, 1), dtype=np.float32)
+            for row, tokens in enumerate(ids):
+                batch[row, : len(tokens)] = tokens
+                mask[row, : len(tokens)] = 1.0
+            hidden = np.tanh(self.table[batch] @ self.weight)
+            return (hidden * mask).sum(1) / mask.sum(1)
+
+    random.seed(0)
+    words = "delhi is the capital of india kolkata west bengal paris".split()
+    chunks = [
+        " ".join(random.choices(words, k=random.choice([8, 15, 30, 60, 200])))
+        for _ in range(100_000)
+    ]
+    encoder = NumpyEncoder()
+
+    def current_path(texts, sort):
+        # HuggingFaceEmbeddings: batches of 32, list[list[float]] result
+        order = (
+            sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+            if sort
+            else range(len(texts))
+        )
+        order = list(order)
+        vectors = [None] * len(texts)
+        for i in range(0, len(order), 32):
+            batch = order[i : i + 32]
+            encoded = encoder.encode([texts[j] for j in batch])
+            encoded /= np.linalg.norm(encoded, axis=1, keepdims=True)
+            for j, vector in zip(batch, encoded.tolist()):
+                vectors[j] = vector
+        return vectors
+
+    def engine_path(texts):
+        return EmbeddingEngine(encoder).embed_array(texts)
+
+    results = {}
+    for name, run in [
+        ("batch 32, input order", lambda t: current_path(t, sort=False)),
+        ("batch 32, length sorted", lambda t: current_path(t, sort=True)),
+        ("engine (buckets+pool)", engine_path),
+    ]:
+        start = time.perf_counter()
+        results[name] = run(chunks)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:24s} | {len(chunks) / elapsed:8,.0f} sentences/s | "
+            f"{type(results[name]).__name__}"
+        )
+    reference = np.asarray(results["batch 32, input order"], np.float32)
+    engine = results["engine (buckets+pool)"]
+    assert np.allclose(reference, engine, atol=1e-4)
+    print(
+        f"same vectors, engine array {engine.dtype} {engine.shape} "
+        f"C-contiguous={engine.flags['C_CONTIGUOUS']} | {os.cpu_count()} "
+        f"CPU core(s) for the pool"
+    )
+    try:
+        TorchBackend("sentence-transformers/all-MiniLM-L6-v2", quantize=True)
+    except ImportError as e:
+        print(f"int8 torch backend skipped: {e}")
@@ -0,0 +1,428 @@
+"""
+* Problem: Nothing can be measured without keys
+    > runnables.py, 3_chatbot.py, 4_structure_output.py and rag/rag.ipynb all call Gemini / OpenAI /
+      Anthropic / HF models. Every run needs keys and network, costs money, and the numbers change with the
+      provider's load of the day → a 10% speed-up of a chain can not be told apart from noise.
+    > FakeListChatModel (used in some __main__ demos) answers in 0 ms and can not stream slowly, run out of
+      quota or return JSON for a schema, so it hides exactly the behaviour that dominates real chains.
+
+* Offline Stand-ins
+    > FakeChatModel(BaseChatModel): drop-in for ChatGoogleGenerativeAI & co (invoke / batch / stream / async).
+        - Latency: time to first token from a distribution (constant, uniform or lognormal given by p50 and
+          p99) + per_token for every generated word. invoke sleeps the sum, stream sleeps per chunk.
+        - Deterministic: reply text, reply length and latency are derived from blake2b(seed, prompt), not
+          from a shared random generator → the same prompt gets the same answer and the same latency, no
+          matter how many threads run or in which order the calls arrive.
+        - Structured output: with_structured_output(Pydantic / TypedDict / JSON schema) and the format
+          instructions of PydanticOutputParser / JsonOutputParser are answered with a JSON instance of the
+          schema (respecting enums, required fields and minimum / maximum).
+        - usage_metadata (input / output tokens) is set, so tracing.py can count tokens.
+    > FakeEmbeddings(Embeddings): hashed bag of words (similar texts → similar vectors, so retrieval is
+      meaningful), L2-normalized, with per request latency and max_batch texts per request. binary=True
+      counts every word once (set of words: repeated boilerplate does not drown the keywords).
+    > Rate Limits: both take requests_per_second + burst (token bucket). Over the limit a request fails right
+      away with RateLimitError("429 ...") (bulk_extraction.is_rate_limit recognizes it), like the free tier
+      of Gemini in rag.ipynb.
+
+? Usage
+    model = FakeChatModel(latency=Latency("lognormal", 0.4, 1.5), per_token=0.01, requests_per_second=5)
+    chain = prompt1 | model | parser          # same chain as runnables.py, no keys
+    embeddings = FakeEmbeddings(dim=384, max_batch=100)
+    (benchmark_suite.py runs every chain pattern of the notes on top of these)
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, AsyncIterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_json_schema
+from pydantic import BaseModel, PrivateAttr
+
+from bulk_extraction import RateLimitError
+
+WORDS = (
+    "agent model chain prompt token vector memory tool graph answer context "
+    "question retrieval summary review python cloud latency batch stream "
+    "cache index document schema parser output input user system data"
+).split()
+
+SCHEMA_IN_PROMPT = re.compile(r"```\n(\{.*\})\n```", re.DOTALL)
+Z99 = 2.3263  # standard normal 99th percentile
+
+
+def seeded_random(seed: int, text: str) -> random.Random:
+    digest = hashlib.blake2b(f"{seed}\x00{text}".encode(), digest_size=8)
+    return random.Random(int.from_bytes(digest.digest(), "little"))
+
+
+def fake_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+@dataclass(frozen=True)
+class Latency:
+    # seconds; "constant": a, "uniform": a..b, "lognormal": p50=a, p99=b
+    kind: str = "constant"
+    a: float = 0.0
+    b: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            sigma = math.log(self.b / self.a) / Z99
+            return rng.lognormvariate(math.log(self.a), sigma)
+        raise ValueError(f"unknown latency distribution {self.kind!r}")
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def take(self):
+        if self.rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            if self._tokens < 1:
+                self.rejected += 1
+                raise RateLimitError("429 too many requests (fake quota)")
+            self._tokens -= 1
+
+
+def fake_json(schema: dict, rng: random.Random, defs: dict | None = None):
+    # a deterministic instance of a JSON schema
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if "$ref" in schema:
+        return fake_json(defs[schema["$ref"].split("/")[-1]], rng, defs)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return fake_json(options[0] if options else {}, rng, defs)
+    # PydanticOutputParser drops the top-level "type" from its instructions
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {
+            key: fake_json(value, rng, defs)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        item = schema.get("items", {})
+        return [fake_json(item, rng, defs) for _ in range(rng.randint(1, 3))]
+    if kind in ("integer", "number"):
+        low = schema.get("minimum", schema.get("exclusiveMinimum", -1) + 1)
+        high = schema.get("maximum", schema.get("exclusiveMaximum", 101) - 1)
+        if kind == "integer":
+            return rng.randint(math.ceil(low), math.floor(high))
+        return round(rng.uniform(low, high), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    return fake_text(rng, rng.randint(1, 6))
+
+
+class FakeChatModel(BaseChatModel):
+    latency: Latency = Latency("lognormal", 0.02, 0.08)
+    per_token: float = 0.0005
+    reply_words: tuple[int, int] = (20, 60)
+    seed: int = 0
+    requests_per_second: float | None = None
+    burst: int = 10
+    _bucket: TokenBucket = PrivateAttr()
+
+    def model_post_init(self, context: Any):
+        super().model_post_init(context)
+        self._bucket = TokenBucket(self.requests_per_second, self.burst)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    @property
+    def rate_limited(self) -> int:
+        return self._bucket.rejected
+
+    def _plan(self, messages, schema):
+        # → (reply, first token seconds, usage)
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = seeded_random(self.seed, prompt)
+        first = self.latency.sample(rng)
+        found = schema is None and SCHEMA_IN_PROMPT.search(prompt)
+        if found:
+            schema = json.loads(found.group(1))
+        if schema is not None:
+            reply = json.dumps(fake_json(schema, rng))
+        elif "JSON" in prompt:
+            reply = json.dumps({"result": fake_text(rng, 8).split()})
+        else:
+            reply = fake_text(rng, rng.randint(*self.reply_words))
+        words = reply.split(" ")
+        usage = {
+            "input_tokens": len(prompt.split()),
+            "output_tokens": len(words),
+            "total_tokens": len(prompt.split()) + len(words),
+        }
+        return words, first, usage
+
+    def _result(self, words, usage):
+        message = AIMessage(content=" ".join(words), usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self, messages, stop=None, run_manager=None, schema=None, **kw
+    ):
+        self._bucket.take()
+        words, first, usage = self._plan(messages, schema)
+        time.sleep(first + self.per_token * len(words))
+        return self._result(words, usage)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, schema=None, **kw
+    ):
+        self._bucket.take()
+        words, first, usage = self._plan(messages, schema)
+        await asyncio.sleep(first + self.per_token * len(words))
+        return self._result(words, usage)
+
+    def _chunks(self, words, usage):
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=word if i == 0 else " " + word,
+                    usage_metadata=usage if last else None,
+                )
+            )
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, schema=None, **kw
+    ) -> Iterator[ChatGenerationChunk]:
+        self._bucket.take()
+        words, first, usage = self._plan(messages, schema)
+        time.sleep(first)
+        for chunk in self._chunks(words, usage):
+            time.sleep(self.per_token)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, schema=None, **kw
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._bucket.take()
+        words, first, usage = self._plan(messages, schema)
+        await asyncio.sleep(first)
+        for chunk in self._chunks(words, usage):
+            await asyncio.sleep(self.per_token)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, *, include_raw=False, **kw):
+        json_schema = (
+            schema.model_json_schema()
+            if isinstance(schema, type) and issubclass(schema, BaseModel)
+            else convert_to_json_schema(schema)
+        )
+
+        def parse(message):
+            value = json.loads(message.content)
+            if isinstance(schema, type) and issubclass(schema, BaseModel):
+                value = schema.model_validate(value)
+            if include_raw:
+                return {"raw": message, "parsed": value, "parsing_error": None}
+            return value
+
+        return self.bind(schema=json_schema) | RunnableLambda(parse)
+
+
+class FakeEmbeddings(Embeddings):
+
+    def __init__(
+        self,
+        dim: int = 384,
+        latency: Latency = Latency("lognormal", 0.01, 0.04),
+        per_text: float = 0.0002,
+        max_batch: int = 100,
+        requests_per_second: float | None = None,
+        burst: int = 10,
+        seed: int = 0,
+        binary: bool = False,
+    ):
+        self.dim = dim
+        self.binary = binary
+        self.latency = latency
+        self.per_text = per_text
+        self.max_batch = max_batch
+        self.seed = seed
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.requests = 0
+
+    def _vectors(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for word in set(words) if self.binary else words:
+                digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+                vectors[row, int.from_bytes(digest, "little") % self.dim] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-9)).tolist()
+
+    def _requests(self, texts):
+        # one provider request per max_batch texts → (texts, seconds)
+        for i in range(0, len(texts), self.max_batch):
+            batch = texts[i : i + self.max_batch]
+            self.bucket.take()
+            self.requests += 1
+            rng = seeded_random(self.seed, batch[0] if batch else "")
+            yield batch, self.latency.sample(rng) + self.per_text * len(batch)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for batch, seconds in self._requests(texts):
+            time.sleep(seconds)
+            vectors += self._vectors(batch)
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for batch, seconds in self._requests(texts):
+            await asyncio.sleep(seconds)
+            vectors += self._vectors(batch)
+        return vectors
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+if __name__ == "__main__":
+    import statistics
+
+    from langchain_core.output_parsers import (
+        PydanticOutputParser,
+        StrOutputParser,
+    )
+    from langchain_core.prompts import PromptTemplate
+    from pydantic import Field
+
+    model = FakeChatModel(latency=Latency("lognormal", 0.02, 0.1))
+    joke = PromptTemplate.from_template("Write a joke about {topic}")
+    chain = joke | model | StrOutputParser()
+
+    # deterministic: same prompt → same text and same latency
+    first, second = chain.invoke({"topic": "AI"}), chain.invoke(
+        {"topic": "AI"}
+    )
+    print(f"same prompt, same answer: {first == second} → {first[:50]}...")
+
+    # latency distribution over 50 prompts (p50 20 ms, p99 100 ms + tokens)
+    async def timed(topic):
+        start = time.perf_counter()
+        await chain.ainvoke({"topic": topic})
+        return time.perf_counter() - start
+
+    async def sample():
+        return await asyncio.gather(*(timed(f"topic {i}") for i in range(50)))
+
+    seconds = sorted(asyncio.run(sample()))
+    print(
+        f"50 concurrent calls: p50 {statistics.median(seconds) * 1e3:.0f} "
+        f"ms, p99 {seconds[49] * 1e3:.0f} ms"
+    )
+
+    # streaming: first token after the first token latency
+    start, chunks = time.perf_counter(), []
+    for chunk in chain.stream({"topic": "streams"}):
+        chunks.append(time.perf_counter() - start)
+    print(
+        f"stream: {len(chunks)} chunks, first after {chunks[0] * 1e3:.0f} "
+        f"ms, last after {chunks[-1] * 1e3:.0f} ms"
+    )
+
+    # structured output, as in 4_structure_output.py
+    class Person(BaseModel):
+        name: str = Field(description="Name of the person")
+        age: int = Field(gt=18, description="Age of the person")
+        city: str = Field(description="Name of the city")
+
+    parser = PydanticOutputParser(pydantic_object=Person)
+    template = PromptTemplate(
+        template="Generate a fictional {place} person \n {format_instruction}",
+        input_variables=["place"],
+        partial_variables={
+            "format_instruction": parser.get_format_instructions()
+        },
+    )
+    print(
+        "parser chain:",
+        (template | model | parser).invoke({"place": "sri lankan"}),
+    )
+    print(
+        "with_structured_output:",
+        model.with_structured_output(Person).invoke("Describe a person"),
+    )
+
+    # rate limit: 20 requests/s with a burst of 5
+    limited = FakeChatModel(
+        latency=Latency("constant", 0.0), requests_per_second=20, burst=5
+    )
+    outcomes = []
+    for i in range(40):
+        try:
+            limited.invoke(f"request {i}")
+            outcomes.append("ok")
+        except RateLimitError:
+            outcomes.append("429")
+        time.sleep(0.01)
+    print(
+        f"rate limit 20/s, burst 5, 100 req/s offered: "
+        f"{outcomes.count('ok')} ok, {outcomes.count('429')} × 429"
+    )
+
+    embeddings = FakeEmbeddings(dim=64, max_batch=16)
+    vectors = np.array(
+        embeddings.embed_documents(
+            ["vector index search", "search the vector index", "cricket match"]
+        )
+    )
+    print(
+        f"embeddings: {embeddings.requests} request(s), cosine "
+        f"similar {vectors[0] @ vectors[1]:.2f}, unrelated "
+        f"{vectors[0] @ vectors[2]:.2f}"
+    )
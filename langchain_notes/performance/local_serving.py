@@ -0,0 +1,431 @@
+"""
+* Problem: HuggingFacePipeline serves one prompt at a time
+    > HuggingFacePipeline.from_model_id("TinyLlama/TinyLlama-1.1B-Chat-v1.0", ...) in 2_langchain_components.py
+      runs one forward pass per new token for ONE prompt. On CPU a decode step is bound by reading the
+      weights from memory, so a step for 16 prompts costs little more than a step for 1 prompt.
+    > With many users every invoke waits for all the others → latency grows linearly with the number of clients.
+
+* Local Inference Server
+    > Queue: Concurrent requests (from threads or asyncio) are put into one pending list, a single worker
+      thread owns the model AND the tokenizer (prompt lengths are counted there too: one HF fast tokenizer
+      used from several threads fails with "Already borrowed").
+    > Dynamic Batching: The worker takes the OLDEST request and waits at most max_wait_ms for more requests
+      to fill the batch (max_batch_size). Under low load a request waits only the window, under high load
+      batches fill up immediately.
+    > Length Buckets (opt-in for high load, e.g. bucket_width=64): Prompts are grouped by token length, a
+      batch only takes requests from the bucket of the oldest one → little left-padding, a 20 token prompt
+      is not padded to 900 tokens. With few clients they split small batches, so the default
+      (bucket_width=10**6) puts every prompt in one bucket.
+    > Streaming: The backend yields one token per row per decode step, the worker pushes it into the queue of
+      the request right away (stream / astream), so the first token arrives after the first step.
+    > A request leaves the batch at its own EOS / max_new_tokens, or when its consumer stops reading (the
+      stream is closed / the task cancelled); the batch ends when all rows are done.
+
+* Backends
+    > HFBackend: transformers model + tokenizer with a manual decode loop (KV cache, left padding). Needs
+      torch + transformers (imported when the backend is created).
+    > Anything with count_tokens(prompt) and generate(prompts, max_new_tokens) works (see the benchmark).
+
+? Usage
+    server = LocalInferenceServer(HFBackend("TinyLlama/TinyLlama-1.1B-Chat-v1.0"), max_batch_size=16)
+    chain = template | ServedLLM(server=server) | StrOutputParser()
+    for token in server.stream("What is the capital of India"):
+        print(token, end="")
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Iterator
+
+from langchain_core.language_models import LLM
+from langchain_core.outputs import GenerationChunk
+
+_END = object()
+
+
+class HFBackend:
+
+    def __init__(
+        self,
+        model_id: str,
+        temperature: float = 0.5,
+        torch_threads: int | None = None,
+    ):
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "HFBackend needs torch and transformers installed"
+            ) from e
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        self.torch = torch
+        self.temperature = temperature
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(model_id).eval()
+
+    def count_tokens(self, prompt: str) -> int:
+        return len(self.tokenizer(prompt).input_ids)
+
+    def generate(self, prompts: list[str], max_new_tokens: int):
+        # yields one list per decode step: new text per row, None = finished
+        torch, tokenizer = self.torch, self.tokenizer
+        encoded = tokenizer(prompts, return_tensors="pt", padding=True)
+        input_ids, mask = encoded.input_ids, encoded.attention_mask
+        positions = (mask.cumsum(-1) - 1).clamp(min=0)
+        finished = torch.zeros(len(prompts), dtype=torch.bool)
+        generated = [[] for _ in prompts]
+        emitted = [0] * len(prompts)
+        past = None
+        with torch.inference_mode():
+            for _ in range(max_new_tokens):
+                out = self.model(
+                    input_ids=input_ids,
+                    attention_mask=mask,
+                    position_ids=positions,
+                    past_key_values=past,
+                    use_cache=True,
+                )
+                past = out.past_key_values
+                logits = out.logits[:, -1, :]
+                if self.temperature > 0:
+                    probs = torch.softmax(logits / self.temperature, dim=-1)
+                    next_ids = torch.multinomial(probs, 1).squeeze(1)
+                else:
+                    next_ids = logits.argmax(-1)
+                next_ids[finished] = tokenizer.pad_token_id
+                step = []
+                for row, token_id in enumerate(next_ids.tolist()):
+                    if finished[row] or token_id == tokenizer.eos_token_id:
+                        finished[row] = True
+                        step.append(None)
+                        continue
+                    # decode the whole row so sentencepiece spaces survive
+                    generated[row].append(token_id)
+                    text = tokenizer.decode(
+                        generated[row], skip_special_tokens=True
+                    )
+                    step.append(text[emitted[row] :])
+                    emitted[row] = len(text)
+                yield step
+                if bool(finished.all()):
+                    return
+                input_ids = next_ids.unsqueeze(1)
+                mask = torch.cat([mask, torch.ones_like(input_ids)], dim=1)
+                positions = positions[:, -1:] + 1
+
+
+class _Request:
+    __slots__ = (
+        "prompt",
+        "max_new_tokens",
+        "bucket",
+        "arrived",
+        "put",
+        "cancelled",
+    )
+
+    def __init__(self, prompt, max_new_tokens, bucket, put):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.bucket = bucket
+        self.arrived = time.monotonic()
+        self.put = put  # called with a token, _END or an exception
+        self.cancelled = False  # nobody reads the tokens anymore
+
+
+class LocalInferenceServer:
+
+    def __init__(
+        self,
+        backend,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        bucket_width: int = 10**6,
+        max_new_tokens: int = 100,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.bucket_width = bucket_width
+        self.max_new_tokens = max_new_tokens
+        self.stats = {"batches": 0, "requests": 0, "tokens": 0}
+        self._pending: list[_Request] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def submit(
+        self, prompt: str, put, max_new_tokens: int | None = None
+    ) -> _Request:
+        # the bucket is set by the worker thread (it owns the tokenizer)
+        request = _Request(
+            prompt, max_new_tokens or self.max_new_tokens, None, put
+        )
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("server is closed")
+            self._pending.append(request)
+            self._cond.notify()
+        return request
+
+    def stream(self, prompt: str, max_new_tokens: int | None = None):
+        tokens = queue.SimpleQueue()
+        request = self.submit(prompt, tokens.put, max_new_tokens)
+        try:
+            while (token := tokens.get()) is not _END:
+                if isinstance(token, BaseException):
+                    raise token
+                yield token
+        finally:
+            request.cancelled = True  # the worker drops the row
+
+    async def astream(self, prompt: str, max_new_tokens: int | None = None):
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        request = self.submit(
+            prompt,
+            lambda t: loop.call_soon_threadsafe(tokens.put_nowait, t),
+            max_new_tokens,
+        )
+        try:
+            while (token := await tokens.get()) is not _END:
+                if isinstance(token, BaseException):
+                    raise token
+                yield token
+        finally:
+            request.cancelled = True
+
+    def invoke(self, prompt: str, max_new_tokens: int | None = None) -> str:
+        return "".join(self.stream(prompt, max_new_tokens))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                self._pending = [r for r in self._pending if not r.cancelled]
+                if self._pending or self._closed:
+                    break
+                self._cond.wait()
+            if not self._pending:
+                return None
+            self._set_buckets()
+            self._pending = [r for r in self._pending if not r.cancelled]
+            if not self._pending:
+                return []
+            oldest = self._pending[0]
+            deadline = oldest.arrived + self.max_wait
+            while True:
+                bucket = [
+                    r for r in self._pending if r.bucket == oldest.bucket
+                ]
+                remaining = deadline - time.monotonic()
+                full = len(bucket) >= self.max_batch_size
+                if full or remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+                self._set_buckets()
+            batch = bucket[: self.max_batch_size]
+            taken = set(map(id, batch))
+            self._pending = [r for r in self._pending if id(r) not in taken]
+        return batch
+
+    def _set_buckets(self):
+        for request in self._pending:
+            if request.bucket is None:
+                try:
+                    length = self.backend.count_tokens(request.prompt)
+                except Exception as e:
+                    request.put(e)
+                    request.cancelled = True
+                    length = 0
+                request.bucket = length // self.bucket_width
+
+    def _loop(self):
+        while (batch := self._next_batch()) is not None:
+            self._run(batch)
+
+    def _run(self, batch: list[_Request]):
+        # cancelled while waiting for the batch to fill up: no compute
+        batch = [r for r in batch if not r.cancelled]
+        if not batch:
+            return
+        open_rows = set(range(len(batch)))
+        produced = [0] * len(batch)
+        steps = max(r.max_new_tokens for r in batch)
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(batch)
+        try:
+            generation = self.backend.generate(
+                [r.prompt for r in batch], steps
+            )
+            for step in generation:
+                for row, token in enumerate(step):
+                    if row not in open_rows:
+                        continue
+                    request = batch[row]
+                    if request.cancelled:
+                        open_rows.discard(row)
+                        continue
+                    if (
+                        token is None
+                        or produced[row] >= request.max_new_tokens
+                    ):
+                        open_rows.discard(row)
+                        request.put(_END)
+                        continue
+                    produced[row] += 1
+                    request.put(token)
+                if not open_rows:
+                    generation.close()
+                    break
+        except Exception as e:
+            for row in open_rows:
+                batch[row].put(e)
+            open_rows.clear()
+        for row in open_rows:
+            batch[row].put(_END)
+        self.stats["tokens"] += sum(produced)
+
+
+class ServedLLM(LLM):
+    # LangChain LLM on top of the server: works in `template | llm | parser`
+    server: Any
+    max_new_tokens: int | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-inference-server"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+        return self.server.invoke(prompt, self.max_new_tokens)
+
+    def _stream(
+        self, prompt, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[GenerationChunk]:
+        for token in self.server.stream(prompt, self.max_new_tokens):
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield GenerationChunk(text=token)
+
+
+if __name__ == "__main__":
+    import random
+    import statistics
+
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    # CPU cost model of a 1B decoder: prefill is compute bound (every padded
+    # token costs), a decode step is bound by reading the weights (fixed
+    # part) + a small part per row and per cached position
+    class SimulatedBackend:
+        def count_tokens(self, prompt):
+            return len(prompt.split())
+
+        def generate(self, prompts, max_new_tokens):
+            rows = len(prompts)
+            padded = max(self.count_tokens(p) for p in prompts)
+            time.sleep(0.002 + 2e-5 * rows * padded)  # prefill
+            for step in range(max_new_tokens):
+                time.sleep(0.004 + 2e-4 * rows + 1e-6 * rows * (padded + step))
+                yield [f" tok{step}" for _ in prompts]
+
+    random.seed(0)
+    words = "what is the capital of india and why".split()
+    prompts = [
+        " ".join(random.choices(words, k=random.choice([8, 30, 200, 600])))
+        for _ in range(512)
+    ]
+
+    server = LocalInferenceServer(SimulatedBackend(), max_new_tokens=8)
+    chain = (
+        PromptTemplate.from_template("Answer briefly: {question}")
+        | ServedLLM(server=server)
+        | StrOutputParser()
+    )
+    print("chain:", chain.invoke({"question": "capital of India?"}))
+    # a stream nobody reads anymore stops generating
+    tokens = server.stream("what is the capital of india", max_new_tokens=500)
+    next(tokens), next(tokens)
+    tokens.close()
+    server.close()
+    assert server.stats["tokens"] < 8 + 20, server.stats
+
+    # the tokenizer is only used by the worker thread, and a request that is
+    # cancelled while its batch fills up is never computed
+    class TrackedBackend(SimulatedBackend):
+        threads = set()
+
+        def count_tokens(self, prompt):
+            self.threads.add(threading.current_thread())
+            return super().count_tokens(prompt)
+
+    server = LocalInferenceServer(TrackedBackend(), max_wait_ms=200)
+    gone = server.submit("what is the capital", lambda token: None)
+    gone.cancelled = True
+    print("kept:", server.invoke("capital of india", max_new_tokens=2))
+    server.close()
+    assert TrackedBackend.threads == {server._worker}, TrackedBackend.threads
+    assert server.stats["requests"] == 1, server.stats
+
+    def load_test(server, clients, requests_per_client=2):
+        latencies, first_tokens, tokens = [], [], [0]
+        lock = threading.Lock()
+
+        def client(i):
+            for j in range(requests_per_client):
+                prompt = prompts[(i * requests_per_client + j) % len(prompts)]
+                start = time.perf_counter()
+                first, count = None, 0
+                for _ in server.stream(prompt):
+                    first = first or time.perf_counter() - start
+                    count += 1
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    first_tokens.append(first)
+                    tokens[0] += count
+
+        threads = [
+            threading.Thread(target=client, args=(i,)) for i in range(clients)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        return tokens[0] / elapsed, p95, first_tokens
+
+    configs = {
+        "one prompt per invoke": dict(max_batch_size=1),
+        "batching, no buckets": dict(max_batch_size=32, bucket_width=10**6),
+        "batching + buckets": dict(max_batch_size=32, bucket_width=64),
+    }
+    for clients in [1, 4, 16, 64]:
+        for name, options in configs.items():
+            server = LocalInferenceServer(
+                SimulatedBackend(), max_new_tokens=32, **options
+            )
+            throughput, p95, first = load_test(server, clients)
+            server.close()
+            print(
+                f"{clients:2d} clients | {name:22s} | {throughput:7.0f} tok/s"
+                f" | p95 {p95 * 1e3:6.0f} ms | first token "
+                f"{statistics.median(first) * 1e3:5.0f} ms | "
+                f"{server.stats['requests'] / server.stats['batches']:4.1f} "
+                f"req/batch"
+            )
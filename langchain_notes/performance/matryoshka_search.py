@@ -0,0 +1,145 @@
+"""
+* Matryoshka Embeddings
+    > OpenAIEmbeddings(model="text-embedding-3-large", dimensions=32) in 2_langchain_components.py works because
+      text-embedding-3 is trained Matryoshka style: the FIRST dimensions carry most of the meaning, a prefix of
+      the vector (re-normalized) is itself a usable embedding.
+    > Storing only 32 dims is small and fast but loses recall; storing all 3072 dims keeps recall but a flat
+      index of 1M docs is 12 GB of float32 and every query reads all of it.
+
+* Two-stage Search
+    > First Pass (RAM): only the first `first_dim` dimensions of every vector, re-normalized, in a float32
+      matrix → one small matrix-vector product + np.argpartition gives `candidates` (e.g. 100) ids.
+    > Rescoring (mmap): the full vectors live in a float32 file opened with np.memmap. Only the candidate rows
+      are read (the OS page cache keeps the hot ones), scored with the full query, and the top-k returned.
+    > Memory = n × first_dim × 4 bytes instead of n × full_dim × 4, recall stays close to the full search as
+      long as the true neighbours survive the first pass (more candidates → higher recall, lower QPS).
+
+? Usage
+    embedding = OpenAIEmbeddings(model="text-embedding-3-large")          # full 3072 dims
+    index = TwoStageIndex.build("docs.npy", embedding.embed_documents(docs), first_dim=128)
+    ids, scores = index.search(embedding.embed_query("capital of India"), k=10)
+    index = TwoStageIndex.open("docs.npy", first_dim=128)                 # later / other process
+"""
+
+import numpy as np
+
+
+def _normalize(vectors):
+    norm = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norm, 1e-12)
+
+
+class TwoStageIndex:
+
+    def __init__(self, full, first_dim: int = 128, candidates: int = 100):
+        # full: (n, full_dim) float32 array or memmap of normalized vectors
+        self.full = full
+        self.first_dim = min(first_dim, full.shape[1])
+        self.candidates = candidates
+        self.first = np.empty((len(full), self.first_dim), dtype=np.float32)
+        for start in range(0, len(full), 65_536):  # chunked: mmap friendly
+            prefix = full[start : start + 65_536, : self.first_dim]
+            self.first[start : start + len(prefix)] = _normalize(prefix)
+
+    @classmethod
+    def build(cls, path, vectors, first_dim=128, candidates=100):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        full = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=vectors.shape
+        )
+        full[:] = _normalize(vectors)
+        full.flush()
+        return cls.open(path, first_dim, candidates)
+
+    @classmethod
+    def open(cls, path, first_dim=128, candidates=100):
+        return cls(np.load(path, mmap_mode="r"), first_dim, candidates)
+
+    @property
+    def memory_bytes(self):
+        return self.first.nbytes
+
+    def search(self, query, k: int = 10):
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.first @ _normalize(query[: self.first_dim])
+        if self.first_dim == self.full.shape[1]:
+            return _top_k(scores, k)
+        m = min(max(self.candidates, k), len(scores))
+        candidates = np.sort(np.argpartition(-scores, m - 1)[:m])
+        # sorted ids → the mmap reads go forward through the file
+        rescored = self.full[candidates] @ _normalize(query)
+        ids, top = _top_k(rescored, k)
+        return candidates[ids], top
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    ids = np.argpartition(-scores, k - 1)[:k]
+    ids = ids[np.argsort(-scores[ids])]
+    return ids, scores[ids]
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    # synthetic Matryoshka-like corpus: 500 topics, the variance decays over
+    # the dimensions so the prefix carries most of the signal
+    n, full_dim, topics = 50_000, 3072, 500
+    rng = np.random.default_rng(0)
+    scale = (1.0 / (1 + np.arange(full_dim) / 16)).astype(np.float32)
+    centers = rng.standard_normal((topics, full_dim), np.float32) * scale
+    path = os.path.join(tempfile.mkdtemp(), "docs.npy")
+    full = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.float32, shape=(n, full_dim)
+    )
+    for start in range(0, n, 5_000):
+        noise = rng.standard_normal((5_000, full_dim), np.float32) * scale
+        topic = rng.integers(0, topics, 5_000)
+        full[start : start + 5_000] = _normalize(centers[topic] + 0.7 * noise)
+    full.flush()
+    del full
+
+    queries = 200
+    picked = rng.integers(0, n, queries)
+    docs = np.load(path, mmap_mode="r")
+    noise = rng.standard_normal((queries, full_dim), np.float32) * scale
+    query_vectors = _normalize(docs[np.sort(picked)] + 0.5 * noise)
+
+    # exact top-10 with all 3072 dims (ground truth), chunked over the file
+    exact = np.empty((queries, 0), dtype=np.float32)
+    for start in range(0, n, 10_000):
+        exact = np.hstack(
+            [exact, query_vectors @ docs[start : start + 10_000].T]
+        )
+    truth = np.argpartition(-exact, 9, axis=1)[:, :10]
+
+    print(f"{n} docs x {full_dim} dims, full vectors on disk (mmap)")
+    for first_dim in [32, 128, 512, 3072]:
+        index = TwoStageIndex.open(path, first_dim=first_dim, candidates=100)
+        for name, searcher in [
+            ("first pass only", index.first),
+            ("two-stage", None),
+        ]:
+            if first_dim == full_dim and searcher is not None:
+                continue
+            start = time.perf_counter()
+            found = []
+            for q in query_vectors:
+                if searcher is None:
+                    ids, _ = index.search(q, k=10)
+                else:
+                    ids, _ = _top_k(searcher @ _normalize(q[:first_dim]), 10)
+                found.append(ids)
+            qps = queries / (time.perf_counter() - start)
+            if first_dim == full_dim:
+                name = "exact, all dims"
+            recall = np.mean(
+                [len(set(f) & set(t)) / 10 for f, t in zip(found, truth)]
+            )
+            print(
+                f"first pass {first_dim:4d} dims | {name:15s} | RAM "
+                f"{index.memory_bytes / 2**20:6.1f} MB | {qps:7.0f} QPS | "
+                f"recall@10 {recall:.3f}"
+            )
@@ -0,0 +1,290 @@
+"""
+* Problem: Slow start, cold models
+    > 2_langchain_components.py imports langchain_openai, langchain_anthropic, langchain_google_genai and
+      langchain_huggingface at the top. Every script pays the import time of ALL provider SDKs (httpx, grpc,
+      protobuf, transformers, torch ...) even if it only talks to one of them.
+    > Models are constructed eagerly, and HuggingFacePipeline.from_model_id(...) reloads the TinyLlama weights
+      from HF_HOME every time a script (or a request handler) builds it.
+
+* Model Registry
+    > Lazy Providers: A provider is only a string "module:Class" (or a factory function). The module is
+      imported the first time a model of that provider is actually needed.
+    > Lazy Handles: registry.lazy("openai", model="gpt-4o-mini") returns a Runnable right away; the provider is
+      imported and the model built on the first invoke(). Scripts can still declare all models at the top.
+    > Warm Pool: Built models are kept process-wide, keyed by provider + config (kwargs, nested dicts
+      included). The same config returns the same loaded object → a local model is loaded once per process.
+    > Single Flight: If many threads ask for the same cold model at once, one thread loads it, the others wait
+      for that result (no double loading of a 4 GB model).
+    > Preload: registry.preload(...) warms a model on a background thread while the program continues
+      starting up, so the first request does not pay the load time.
+
+? Usage
+    registry = ModelRegistry()
+    model = registry.lazy("google", model="gemini-2.5-flash-lite")
+    local = registry.lazy("huggingface-local", model_id="TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+                          hf_home="D:/huggingface_cache", pipeline_kwargs={"max_new_tokens": 100})
+    registry.preload("huggingface-local", ...)      # optional: warm it in the background
+    chain = template | model | parser              # nothing is imported until chain.invoke(...)
+"""
+
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
+
+
+def _huggingface_endpoint(**kwargs):
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    return ChatHuggingFace(llm=HuggingFaceEndpoint(**kwargs))
+
+
+def _huggingface_local(hf_home: str | None = None, **kwargs):
+    if hf_home:
+        # per model: HF_HOME in os.environ would hold for every later model
+        model_kwargs = dict(kwargs.get("model_kwargs") or {})
+        model_kwargs.setdefault("cache_dir", os.path.join(hf_home, "hub"))
+        kwargs["model_kwargs"] = model_kwargs
+    from langchain_huggingface import ChatHuggingFace, HuggingFacePipeline
+
+    kwargs.setdefault("task", "text-generation")
+    return ChatHuggingFace(llm=HuggingFacePipeline.from_model_id(**kwargs))
+
+
+PROVIDERS: dict[str, str | Callable[..., Any]] = {
+    "openai": "langchain_openai:ChatOpenAI",
+    "openai-llm": "langchain_openai:OpenAI",
+    "anthropic": "langchain_anthropic:ChatAnthropic",
+    "google": "langchain_google_genai:ChatGoogleGenerativeAI",
+    "huggingface": _huggingface_endpoint,
+    "huggingface-local": _huggingface_local,
+    "openai-embeddings": "langchain_openai:OpenAIEmbeddings",
+    "huggingface-embeddings": "langchain_huggingface:HuggingFaceEmbeddings",
+}
+
+
+class ModelRegistry:
+
+    def __init__(self, providers: dict | None = None):
+        self._providers = dict(PROVIDERS if providers is None else providers)
+        self._pool: dict[tuple, Any] = {}
+        self._loading: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_times: dict[tuple, float] = {}
+
+    def register(self, provider: str, factory: str | Callable[..., Any]):
+        self._providers[provider] = factory
+
+    def get(self, provider: str, **config):
+        key = (provider, _freeze(config))
+        model = self._pool.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            with loading:  # single flight: one thread loads, the others wait
+                model = self._pool.get(key)
+                if model is None:
+                    start = time.perf_counter()
+                    model = self._resolve(provider)(**config)
+                    self.load_times[key] = time.perf_counter() - start
+                    self._pool[key] = model
+        finally:
+            with self._lock:
+                if self._loading.get(key) is loading:
+                    del self._loading[key]
+        return model
+
+    def lazy(self, provider: str, **config) -> "LazyModel":
+        if provider not in self._providers:
+            raise KeyError(f"unknown provider {provider!r}")
+        return LazyModel(self, provider, config)
+
+    def preload(self, provider: str, **config) -> Future:
+        future = Future()
+
+        def load():
+            try:
+                future.set_result(self.get(provider, **config))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=load, daemon=True).start()
+        return future
+
+    def evict(self, provider: str, **config):
+        self._pool.pop((provider, _freeze(config)), None)
+
+    def __len__(self):
+        return len(self._pool)
+
+    def _resolve(self, provider):
+        factory = self._providers[provider]
+        if isinstance(factory, str):
+            module, name = factory.split(":")
+            factory = getattr(importlib.import_module(module), name)
+            self._providers[provider] = factory
+        return factory
+
+
+class LazyModel(Runnable):
+
+    def __init__(self, registry: ModelRegistry, provider: str, config: dict):
+        self.registry = registry
+        self.provider = provider
+        self.config = config
+
+    @property
+    def model(self):
+        return self.registry.get(self.provider, **self.config)
+
+    def invoke(
+        self, input: Any, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> Any:
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: Any, config: RunnableConfig | None = None, **kwargs: Any
+    ) -> Any:
+        return await self.model.ainvoke(input, config, **kwargs)
+
+    def batch(self, inputs, config=None, **kwargs):
+        return self.model.batch(inputs, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.model.stream(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        async for chunk in self.model.astream(input, config, **kwargs):
+            yield chunk
+
+    def __getattr__(self, name):
+        # with_structured_output, bind_tools, embed_query ... of the real model
+        if name.startswith("_") or name in ("registry", "provider", "config"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self):
+        return f"LazyModel({self.provider!r}, {self.config!r})"
+
+
+def _freeze(value):
+    # hashable pool key for nested kwargs (pipeline_kwargs=dict(...))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+default_registry = ModelRegistry()
+
+
+if __name__ == "__main__":
+    import subprocess
+    import sys
+
+    from langchain_core.language_models.fake_chat_models import (
+        FakeListChatModel,
+    )
+
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def import_time(code):
+        # fresh interpreter, so nothing is cached in sys.modules
+        script = (
+            f"import sys, time; sys.path.insert(0, {here!r}); "
+            f"s = time.perf_counter(); {code}; "
+            f"print(time.perf_counter() - s)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True
+        )
+        if result.returncode:
+            return None
+        return float(result.stdout.strip().splitlines()[-1])
+
+    # --------------------------------------
+    # startup: eager provider imports vs lazy handles
+    # --------------------------------------
+    modules = sorted(
+        {f.split(":")[0] for f in PROVIDERS.values() if isinstance(f, str)}
+        | {"langchain_huggingface"}
+    )
+    eager = 0.0
+    for module in modules:
+        seconds = import_time(f"import {module}")
+        if seconds is None:
+            print(f"import {module:24s} | not installed here")
+        else:
+            eager += seconds
+            print(f"import {module:24s} | {seconds * 1e3:7.0f} ms")
+    lazy = import_time(
+        "from model_registry import default_registry as r; "
+        "[r.lazy(p, model='m') for p in ('openai', 'anthropic', 'google')]"
+    )
+    print(
+        f"startup | eager imports {eager * 1e3:.0f} ms (installed ones) | "
+        f"registry + 3 lazy handles {lazy * 1e3:.0f} ms"
+    )
+
+    # --------------------------------------
+    # first-request latency of a local model (load ~0.8 s from HF_HOME)
+    # --------------------------------------
+    def fake_local(model_id, pipeline_kwargs=None):
+        time.sleep(0.8)  # stand-in for reading the weights
+        return FakeListChatModel(responses=["New Delhi"])
+
+    config = dict(
+        model_id="TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+        pipeline_kwargs={"temperature": 0.5, "max_new_tokens": 100},
+    )
+
+    start = time.perf_counter()
+    for _ in range(3):  # three scripts / handlers, each builds the model
+        fake_local(**config).invoke("What is the capital of India")
+    rebuilt = (time.perf_counter() - start) / 3
+
+    registry = ModelRegistry({"huggingface-local": fake_local})
+    model = registry.lazy("huggingface-local", **config)
+    start = time.perf_counter()
+    model.invoke("What is the capital of India")
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    registry.lazy("huggingface-local", **config).invoke("again")
+    warm = time.perf_counter() - start
+
+    registry = ModelRegistry({"huggingface-local": fake_local})
+    registry.preload("huggingface-local", **config)
+    time.sleep(1.0)  # rest of the program starting up
+    start = time.perf_counter()
+    registry.lazy("huggingface-local", **config).invoke("What is the capital")
+    preloaded = time.perf_counter() - start
+
+    # 16 threads hit the same cold model: it is loaded once
+    registry = ModelRegistry({"huggingface-local": fake_local})
+    threads = [
+        threading.Thread(
+            target=registry.lazy("huggingface-local", **config).invoke,
+            args=("hi",),
+        )
+        for _ in range(16)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(registry.load_times) == 1 and not registry._loading
+
+    print(
+        f"first request | rebuilt per use {rebuilt * 1e3:.0f} ms | pool cold "
+        f"{cold * 1e3:.0f} ms, warm {warm * 1e3:.2f} ms | preloaded "
+        f"{preloaded * 1e3:.2f} ms | 16 concurrent cold requests -> "
+        f"{len(registry.load_times)} load"
+    )
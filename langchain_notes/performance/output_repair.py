@@ -0,0 +1,234 @@
+"""
+* Problem: one bad character = one more full LLM call
+    > chain = template | hf_model | parser with PydanticOutputParser(pydantic_object=Person) raises as soon as
+      the output is not perfect JSON or a constraint fails (age must be > 18). The usual fix is to run the whole
+      chain again (or OutputFixingParser / RetryOutputParser), i.e. pay for the full generation again.
+    > Most broken outputs are broken in a boring way: wrapped in ```json fences, a trailing comma, python style
+      {'name': 'x', 'ok': True}, cut off by max_new_tokens, "35" instead of 35.
+
+* Repair Ladder (cheapest first)
+    1) Local syntax repair (no LLM):
+        > cut the JSON out of fences / chatter ("Here is the JSON: {...}")
+        > remove trailing commas, turn True/False/None into true/false/null (outside of strings)
+        > python dict literals through ast.literal_eval
+        > truncated output: close open strings / brackets (parse_partial_json from langchain_core)
+    2) Local type coercion: validation runs in pydantic lax mode ("35" → 35) through the compiled schema of
+       schema_registry.py.
+    3) Field fix (small LLM call): only the fields that still fail are sent back:
+       "age = 17 failed: Input should be greater than 18. Return {"age": ...}". The answer is a few tokens,
+       it is merged into the object and validated again.
+    4) Full regeneration: only if nothing above worked (e.g. the output is not JSON at all).
+
+? Usage
+    repair = RepairingParser(Person, model=model, regenerate=lambda: chain.invoke(inputs))
+    person = repair.parse(llm_output)
+    print(repair.stats)
+"""
+
+import ast
+import json
+import re
+
+from langchain_core.utils.json import parse_partial_json
+from pydantic import ValidationError
+
+from schema_registry import default_registry
+
+_LITERALS = re.compile(r"\b(True|False|None)\b")
+_LITERAL_MAP = {"True": "true", "False": "false", "None": "null"}
+
+FIELD_FIX_PROMPT = """The JSON object below is almost correct, but some fields are invalid.
+Object: {obj}
+Problems:
+{problems}
+Return ONLY a JSON object with corrected values for these fields: {fields}"""
+
+
+class RepairFailed(ValueError):
+    pass
+
+
+def extract_json_text(text: str) -> str:
+    # drop fences / chatter around the first {...} (or [...]) block
+    start = min(
+        (i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1
+    )
+    if start < 0:
+        raise RepairFailed("no JSON object found in the output")
+    closer = "}" if text[start] == "{" else "]"
+    end = text.rfind(closer)
+    return text[start : end + 1] if end > start else text[start:]
+
+
+def _fix_syntax(text: str) -> str:
+    # trailing commas + python literals, strings are copied untouched
+    out, i, n = [], 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i : j + 1])
+            i = j + 1
+            continue
+        j = i
+        while j < n and text[j] != '"':
+            j += 1
+        chunk = _LITERALS.sub(lambda m: _LITERAL_MAP[m.group()], text[i:j])
+        out.append(re.sub(r",(\s*[}\]])", r"\1", chunk))
+        i = j
+    return "".join(out)
+
+
+def local_parse(text: str):
+    # returns (python object, name of the repair that worked)
+    candidate = extract_json_text(text)
+    try:
+        return json.loads(candidate), "none"
+    except json.JSONDecodeError:
+        pass
+    fixed = _fix_syntax(candidate)
+    try:
+        return json.loads(fixed), "syntax"
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = ast.literal_eval(candidate)
+        if isinstance(value, (dict, list)):
+            return value, "python-literal"
+    except (ValueError, SyntaxError):
+        pass
+    value = parse_partial_json(fixed)
+    if value is not None:
+        return value, "truncated"
+    raise RepairFailed("output could not be repaired locally")
+
+
+class RepairingParser:
+
+    def __init__(self, schema, model=None, regenerate=None, registry=None):
+        self.compiled = (registry or default_registry).get(schema)
+        self.model = model
+        self.regenerate = regenerate
+        self.stats = {
+            "valid": 0,
+            "local_repair": 0,
+            "field_fix_calls": 0,
+            "regenerations": 0,
+            "failed": 0,
+        }
+
+    def parse(self, text: str):
+        try:
+            data, repair = local_parse(text)
+        except RepairFailed:
+            return self._regenerate()
+        try:
+            result = self.compiled.validate_python(data)
+        except ValidationError as e:
+            result = self._fix_fields(data, e)
+            if result is None:
+                return self._regenerate()
+            return result
+        self.stats["valid" if repair == "none" else "local_repair"] += 1
+        return result
+
+    def _fix_fields(self, data, error: ValidationError):
+        if self.model is None or not isinstance(data, dict):
+            return None
+        problems, fields = [], []
+        for item in error.errors():
+            field = str(item["loc"][0]) if item["loc"] else None
+            if field is None:
+                return None
+            fields.append(field)
+            problems.append(
+                f"- {field} = {json.dumps(data.get(field))}: {item['msg']}"
+            )
+        prompt = FIELD_FIX_PROMPT.format(
+            obj=json.dumps(data, default=str),
+            problems="\n".join(problems),
+            fields=", ".join(dict.fromkeys(fields)),
+        )
+        self.stats["field_fix_calls"] += 1
+        reply = self.model.invoke(prompt)
+        reply = getattr(reply, "content", reply)
+        try:
+            patch, _ = local_parse(reply)
+            return self.compiled.validate_python({**data, **patch})
+        except (RepairFailed, ValidationError, TypeError):
+            return None
+
+    def _regenerate(self):
+        if self.regenerate is None:
+            self.stats["failed"] += 1
+            raise RepairFailed("output is not repairable and no regenerate")
+        self.stats["regenerations"] += 1
+        return self.compiled.validate_json(self.regenerate())
+
+
+if __name__ == "__main__":
+    import random
+
+    from langchain_core.language_models.fake_chat_models import (
+        FakeListChatModel,
+    )
+    from langchain_core.exceptions import OutputParserException
+    from langchain_core.output_parsers import PydanticOutputParser
+    from pydantic import BaseModel, Field
+
+    class Person(BaseModel):
+        name: str = Field(description="Name of the person")
+        age: int = Field(gt=18, description="Age of the person")
+        city: str = Field(description="Name of the city the person belongs to")
+
+    good = '{"name": "Kasun Perera", "age": 34, "city": "Colombo"}'
+    malformed = {
+        "valid": good,
+        "fenced": f"Here is the person:\n```json\n{good}\n```",
+        "trailing comma": '{"name": "Kasun", "age": 34, "city": "Colombo",}',
+        "python dict": "{'name': 'Kasun', 'age': 34, 'city': 'Colombo'}",
+        "truncated": '{"name": "Kasun Perera", "age": 34, "city": "Colom',
+        "age as string": '{"name": "Kasun", "age": "34", "city": "Colombo"}',
+        "age too low": '{"name": "Kasun", "age": 17, "city": "Colombo"}',
+        "missing city": '{"name": "Kasun", "age": 34}',
+        "not json": "I am sorry, I cannot generate a person.",
+    }
+    random.seed(0)
+    kinds = random.choices(
+        list(malformed), weights=[50, 15, 8, 5, 8, 5, 4, 3, 2], k=1000
+    )
+
+    # field fix model answers with a tiny patch, regeneration returns `good`
+    model = FakeListChatModel(responses=['{"age": 25, "city": "Kandy"}'])
+    parser = RepairingParser(Person, model=model, regenerate=lambda: good)
+    for kind in kinds:
+        parser.parse(malformed[kind])
+
+    # assumed latencies: full chain run vs a few-token field fix
+    full_call, fix_call = 1.5, 0.3
+    # baseline: PydanticOutputParser, re-run the whole chain when it raises
+    baseline = PydanticOutputParser(pydantic_object=Person)
+    naive_calls = 0
+    for kind in kinds:
+        try:
+            baseline.parse(malformed[kind])
+        except OutputParserException:
+            naive_calls += 1
+    repaired_calls = (
+        parser.stats["field_fix_calls"] + parser.stats["regenerations"]
+    )
+    naive_latency = naive_calls * full_call
+    repaired_latency = (
+        parser.stats["field_fix_calls"] * fix_call
+        + parser.stats["regenerations"] * full_call
+    )
+    print(f"corpus: {len(kinds)} outputs, {naive_calls} rejected by parser")
+    print(f"stats: {parser.stats}")
+    print(
+        f"extra LLM calls: re-run chain {naive_calls} vs repair "
+        f"{repaired_calls} | extra latency: {naive_latency:.0f} s vs "
+        f"{repaired_latency:.0f} s (assuming {full_call}s full call, "
+        f"{fix_call}s field fix)"
+    )
@@ -0,0 +1,299 @@
+"""
+* Why a Schema Registry ?
+    > Every chain in 4_structure_output.py calls parser.get_format_instructions() again, which rebuilds the
+      JSON schema of the Pydantic model and json.dumps() it.
+    > PydanticOutputParser.parse() goes the generic way for every output: strip markdown → json.loads() into
+      Python dicts → model_validate(). That is two passes over the data and a lot of temporary objects.
+
+* Compile once, validate fast
+    > CompiledSchema is built ONCE per schema (ReviewTD, ReviewPydantic, ReviewJS, Person) and cached in the
+      registry. It holds:
+        > format_instructions: the final prompt string (identical to PydanticOutputParser's for Pydantic models)
+        > json_schema: the schema dict (e.g. for with_structured_output / tool definitions)
+        > adapter: a pydantic TypeAdapter → a pydantic-core (Rust) validator + coercer ("35" → 35)
+    > One schema type for all three styles:
+        > Pydantic model: used as-is.
+        > TypedDict: validated through TypeAdapter, the Annotated[..., "description"] strings become
+          descriptions in the JSON schema.
+        > JSON Schema dict: converted once into a Pydantic model (string/number/integer/boolean/array/enum/null).
+    > validate_json(text): raw JSON text → validated object in ONE pass (no json.loads + model_validate).
+    > validate_many(texts): a whole batch is joined into one JSON array and validated by one
+      TypeAdapter(list[schema]) call; only if that fails the batch falls back to item-by-item, so a bad item
+      costs time only for its own batch.
+
+? Usage
+    registry = SchemaRegistry()
+    review = registry.get(ReviewPydantic)
+    template = PromptTemplate(..., partial_variables={"format_instruction": review.format_instructions})
+    objects = review.validate_many(llm_outputs)
+"""
+
+import json
+import re
+import sys
+import threading
+from typing import Any, Literal, Optional, get_type_hints
+
+import typing_extensions
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers.format_instructions import (
+    JSON_FORMAT_INSTRUCTIONS,
+)
+from pydantic import (
+    BaseModel,
+    Field,
+    TypeAdapter,
+    ValidationError,
+    create_model,
+)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+_JSON_TYPES = {"string": str, "number": float, "integer": int, "boolean": bool}
+
+
+def strip_fences(text: str) -> str:
+    # ```json ... ``` → ...
+    return _FENCE.sub("", text) if "```" in text else text
+
+
+class CompiledSchema:
+
+    def __init__(self, schema):
+        self.source = schema
+        if isinstance(schema, dict):
+            schema = model_from_json_schema(schema)
+        elif _is_typeddict(schema) and sys.version_info < (3, 12):
+            # pydantic needs typing_extensions.TypedDict before python 3.12
+            schema = typing_extensions.TypedDict(
+                schema.__name__,
+                get_type_hints(schema, include_extras=True),
+                total=schema.__total__,
+            )
+        self.schema = schema
+        self.adapter = TypeAdapter(schema)
+        self._list_adapter = TypeAdapter(list[schema])
+        self.json_schema = self.adapter.json_schema()
+        if _is_typeddict(schema):
+            _add_annotated_descriptions(schema, self.json_schema)
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            parser = PydanticOutputParser(pydantic_object=schema)
+            self.format_instructions = parser.get_format_instructions()
+        else:
+            reduced = {
+                k: v
+                for k, v in self.json_schema.items()
+                if k not in ("title", "type")
+            }
+            self.format_instructions = JSON_FORMAT_INSTRUCTIONS.format(
+                schema=json.dumps(reduced, ensure_ascii=False)
+            )
+
+    def validate_json(self, text: str):
+        return self.adapter.validate_json(strip_fences(text))
+
+    def validate_python(self, data):
+        return self.adapter.validate_python(data)
+
+    def validate_many(self, texts: list[str]) -> list:
+        # one pydantic-core call for the whole batch, item fallback on error
+        cleaned = [strip_fences(t) for t in texts]
+        try:
+            results = self._list_adapter.validate_json(
+                "[" + ",".join(cleaned) + "]"
+            )
+        except ValueError:
+            return self._one_by_one(cleaned)
+        if len(results) != len(cleaned):
+            # a text like '{...}, {...}' spans several items of the batch
+            return self._one_by_one(cleaned)
+        return results
+
+    def _one_by_one(self, cleaned: list[str]) -> list:
+        results = []
+        for text in cleaned:
+            try:
+                results.append(self.adapter.validate_json(text))
+            except ValidationError as e:
+                results.append(e)
+        return results
+
+
+class SchemaRegistry:
+
+    def __init__(self):
+        self._compiled: dict[Any, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def get(self, schema) -> CompiledSchema:
+        key = _key(schema)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self._compiled[key] = CompiledSchema(schema)
+        return compiled
+
+    def __len__(self):
+        return len(self._compiled)
+
+
+default_registry = SchemaRegistry()
+
+
+def model_from_json_schema(schema: dict) -> type[BaseModel]:
+    required = set(schema.get("required", []))
+    fields = {}
+    for name, spec in schema.get("properties", {}).items():
+        annotation = _annotation(spec)
+        description = spec.get("description")
+        if name in required:
+            fields[name] = (annotation, Field(description=description))
+        else:
+            fields[name] = (
+                Optional[annotation],
+                Field(default=None, description=description),
+            )
+    return create_model(schema.get("title", "JsonSchemaModel"), **fields)
+
+
+def _annotation(spec: dict):
+    if "enum" in spec:
+        return Literal[tuple(spec["enum"])]
+    types = spec.get("type", "string")
+    types = types if isinstance(types, list) else [types]
+    nullable = "null" in types
+    types = [t for t in types if t != "null"]
+    if len(types) != 1:
+        raise ValueError(f"unsupported JSON schema type {spec.get('type')}")
+    if types[0] == "array":
+        annotation = list[_annotation(spec.get("items", {}))]
+    elif types[0] == "object":
+        annotation = dict[str, Any]
+    else:
+        annotation = _JSON_TYPES[types[0]]
+    return Optional[annotation] if nullable else annotation
+
+
+def _key(schema):
+    # dict schemas are not hashable, key them by their canonical JSON
+    if isinstance(schema, dict):
+        return json.dumps(schema, sort_keys=True)
+    return schema
+
+
+def _is_typeddict(schema):
+    return isinstance(schema, type) and hasattr(schema, "__total__")
+
+
+def _add_annotated_descriptions(schema, json_schema):
+    hints = get_type_hints(schema, include_extras=True)
+    properties = json_schema.get("properties", {})
+    for name, hint in hints.items():
+        metadata = getattr(hint, "__metadata__", ())
+        texts = [m for m in metadata if isinstance(m, str)]
+        if texts and name in properties:
+            properties[name]["description"] = texts[0]
+
+
+if __name__ == "__main__":
+    import time
+    from typing import Annotated, TypedDict
+
+    class ReviewTD(TypedDict):
+        key_themes: Annotated[list[str], "key themes of the review"]
+        summary: Annotated[str, "A brief summary of the review"]
+        sentiment: Annotated[Literal["pos", "neg"], "sentiment"]
+        reviewer_name: Annotated[Optional[str], "name of the reviewer"]
+
+    class ReviewPydantic(BaseModel):
+        key_themes: list[str] = Field(description="key themes of the review")
+        summary: str = Field(description="A brief summary of the review")
+        sentiment: Literal["pos", "neg"] = Field(description="sentiment")
+        name: Optional[str] = Field(default=None, description="reviewer")
+
+    class Person(BaseModel):
+        name: str = Field(description="Name of the person")
+        age: int = Field(gt=18, description="Age of the person")
+        city: str = Field(description="Name of the city")
+
+    ReviewJS = {
+        "title": "Review",
+        "type": "object",
+        "properties": {
+            "key_themes": {"type": "array", "items": {"type": "string"}},
+            "summary": {"type": "string"},
+            "sentiment": {"type": "string", "enum": ["pos", "neg"]},
+            "name": {"type": ["string", "null"]},
+        },
+        "required": ["key_themes", "summary", "sentiment"],
+    }
+
+    registry = SchemaRegistry()
+    for schema in (ReviewTD, ReviewPydantic, ReviewJS, Person):
+        compiled = registry.get(schema)
+        print(f"{compiled.schema.__name__:15s} schema compiled")
+    assert registry.get(Person) is registry.get(Person)
+
+    # --------------------------------------
+    # format instructions: rebuilt per chain vs cached
+    # --------------------------------------
+    calls = 10_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        PydanticOutputParser(pydantic_object=Person).get_format_instructions()
+    rebuilt = (time.perf_counter() - start) / calls
+    start = time.perf_counter()
+    for _ in range(calls):
+        registry.get(Person).format_instructions
+    cached = (time.perf_counter() - start) / calls
+    print(
+        f"format instructions: rebuilt {rebuilt * 1e6:.1f} us, "
+        f"cached {cached * 1e6:.2f} us"
+    )
+
+    # --------------------------------------
+    # parse + validate throughput on 1M outputs
+    # --------------------------------------
+    outputs = [
+        json.dumps(
+            {
+                "key_themes": ["camera", "battery", "price"],
+                "summary": f"Review {i}: fast phone with a great camera.",
+                "sentiment": "pos" if i % 3 else "neg",
+                "name": f"Reviewer {i}",
+            }
+        )
+        for i in range(1_000_000)
+    ]
+    outputs[12345] = '```json\n{"summary": "missing fields"}\n```'
+
+    review = registry.get(ReviewPydantic)
+    # one text holding two objects must not shift the other results
+    shifted = review.validate_many(
+        [outputs[0], outputs[1] + "," + outputs[2], outputs[3]]
+    )
+    assert len(shifted) == 3 and isinstance(shifted[1], ValidationError)
+    assert shifted[2].summary.startswith("Review 3:")
+    start = time.perf_counter()
+    parsed = []
+    for i in range(0, len(outputs), 10_000):
+        parsed.extend(review.validate_many(outputs[i : i + 10_000]))
+    fast = time.perf_counter() - start
+    errors = sum(isinstance(p, ValidationError) for p in parsed)
+
+    parser = PydanticOutputParser(pydantic_object=ReviewPydantic)
+    sample = outputs[:100_000]
+    start = time.perf_counter()
+    for text in sample:
+        try:
+            parser.parse(text)
+        except Exception:
+            pass
+    slow = (time.perf_counter() - start) / len(sample) * len(outputs)
+    print(
+        f"1M outputs | PydanticOutputParser.parse ~{slow:.1f} s "
+        f"({len(outputs) / slow:,.0f}/s, measured on 100k) | "
+        f"validate_many {fast:.1f} s ({len(outputs) / fast:,.0f}/s) | "
+        f"{errors} invalid"
+    )
@@ -0,0 +1,251 @@
+"""
+* Long-term Semantic Memory
+    > 2_langchain_components.py lists Buffer, Window, Summarizer and Custom memory. Buffer memory resends
+      everything, Window/Summary memory (conversation_memory.py) forget details of old turns.
+    > Semantic memory works like RAG over the conversation itself: every past turn (and every fact the user
+      told about themselves) is embedded and stored in a local vector index. For a new question only the top-k
+      most similar memories are put into the prompt.
+
+* Pieces
+    > MemoryIndex: A growing float32 NumPy matrix of normalized vectors (capacity doubles when full) +
+      the texts. Search = one matrix-vector product + np.argpartition for the top-k → no external vector DB.
+    > Facts vs Turns: User sentences like "I am ..." / "My ... is ..." / "I like ..." are stored as facts as well,
+      so "what's my name?" finds "My name is Asha" and not a random turn.
+    > Async Embedding: The new turn is embedded on a background thread AFTER the reply is returned, so the
+      embedding call never adds latency to the turn that produced it.
+    > Short-term Window: The last few turns are still sent verbatim (ConversationMemory without summarizer).
+
+? Prompt layout
+    System: You are a helpful AI assistant + "Relevant memories: ..." (top-k)
+    last few turns
+    Human: new question
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from conversation_memory import ConversationMemory
+
+_FACT_PATTERN = re.compile(
+    r"\b(I am|I'm|my [\w ]+ is|I like|I love|I live|I work)\b[^.!?]*",
+    re.IGNORECASE,
+)
+
+
+def extract_facts(text: str) -> list[str]:
+    # cheap local heuristic, a structured-output LLM call would be the upgrade
+    facts = []
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        if sentence.rstrip().endswith("?"):
+            continue  # questions are not facts
+        facts += [m.group(0).strip() for m in _FACT_PATTERN.finditer(sentence)]
+    return facts
+
+
+class MemoryIndex:
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.texts: list[str] = []
+        self.kinds: list[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, vectors, texts, kind="turn"):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+        with self._lock:
+            size = len(self.texts)
+            if size + len(vectors) > len(self._vectors):
+                grown = np.zeros(
+                    (
+                        max(2 * len(self._vectors), size + len(vectors)),
+                        self._vectors.shape[1],
+                    ),
+                    dtype=np.float32,
+                )
+                grown[:size] = self._vectors[:size]
+                self._vectors = grown
+            self._vectors[size : size + len(vectors)] = vectors
+            self.texts.extend(texts)
+            self.kinds.extend([kind] * len(texts))
+
+    def search(self, query_vector, k=4):
+        with self._lock:
+            size = len(self.texts)
+            matrix = self._vectors[:size]
+            texts, kinds = self.texts[:size], self.kinds[:size]
+        if size == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = matrix @ (query / max(np.linalg.norm(query), 1e-12))
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(texts[i], kinds[i], float(scores[i])) for i in top]
+
+
+class SemanticMemoryChat:
+
+    def __init__(
+        self,
+        model,
+        embeddings,
+        system_prompt: str = "You are a helpful AI assistant",
+        k: int = 4,
+        recent_tokens: int = 300,
+    ):
+        self.model = model
+        self.embeddings = embeddings
+        self.system_prompt = system_prompt
+        self.k = k
+        self.recent = ConversationMemory(system_prompt, recent_tokens)
+        self.index = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = set()
+        self.last_prompt = []
+
+    def messages_for(self, user_input: str) -> list:
+        memories = []
+        if self.index is not None:
+            query = self.embeddings.embed_query(user_input)
+            memories = self.index.search(query, self.k)
+        system = self.system_prompt
+        if memories:
+            lines = "\n".join(
+                f"- ({kind}) {text}" for text, kind, _ in memories
+            )
+            system += f"\n\nRelevant memories:\n{lines}"
+        recent = self.recent.messages()[1:]
+        return [
+            SystemMessage(content=system),
+            *recent,
+            HumanMessage(user_input),
+        ]
+
+    def chat(self, user_input: str) -> str:
+        self.last_prompt = self.messages_for(user_input)
+        result = self.model.invoke(self.last_prompt)
+        self.recent.add("human", user_input)
+        self.recent.add("ai", result.content)
+        # embedding happens after the reply is ready, off the request path
+        future = self._executor.submit(
+            self.remember, user_input, result.content
+        )
+        self._pending.add(future)
+        future.add_done_callback(self._settled)
+        return result.content
+
+    def _settled(self, future):
+        # failures stay until wait() raises them
+        if future.cancelled() or future.exception() is None:
+            self._pending.discard(future)
+
+    def remember(self, user_input: str, reply: str):
+        turn = f"user: {user_input}\nai: {reply}"
+        facts = extract_facts(user_input)
+        vectors = self.embeddings.embed_documents([turn, *facts])
+        if self.index is None:
+            self.index = MemoryIndex(dim=len(vectors[0]))
+        self.index.add(vectors[:1], [turn], kind="turn")
+        if facts:
+            self.index.add(vectors[1:], facts, kind="fact")
+
+    def wait(self):
+        for future in list(self._pending):
+            self._pending.discard(future)
+            future.result()
+
+
+if __name__ == "__main__":
+    import hashlib
+    import statistics
+    import time
+
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.messages import AIMessage
+
+    from conversation_memory import approx_tokens
+
+    # local lexical embeddings: hashed bag of words (stand-in for MiniLM)
+    class HashingEmbeddings(Embeddings):
+        def __init__(self, dim=256):
+            self.dim = dim
+
+        def _embed(self, text):
+            vector = np.zeros(self.dim, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+                vector[int.from_bytes(digest, "little") % self.dim] += 1.0
+            return vector.tolist()
+
+        def embed_documents(self, texts):
+            time.sleep(0.002)  # pretend the embedding call has latency
+            return [self._embed(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    class TokenLatencyModel(SimpleChatModel):
+        @property
+        def _llm_type(self):
+            return "token-latency-model"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            tokens = sum(approx_tokens(str(m.content)) for m in messages)
+            time.sleep(0.005 + tokens * 2e-6)
+            return "Here is a detailed answer about the topic you asked. " * 3
+
+    turns = 300
+    inputs = (
+        ["My name is Asha and I live in Pune"]
+        + [f"Tell me fact number {i} about cricket" for i in range(turns - 2)]
+        + ["What is my name and where do I live?"]
+    )
+
+    model = TokenLatencyModel()
+    chat_history = [SystemMessage(content="You are a helpful AI assistant")]
+
+    def full_history(text):
+        chat_history.append(HumanMessage(content=text))
+        prompt = list(chat_history)
+        chat_history.append(AIMessage(content=model.invoke(prompt).content))
+        return prompt
+
+    semantic = SemanticMemoryChat(model, HashingEmbeddings(), k=4)
+
+    def semantic_turn(text):
+        semantic.chat(text)
+        return semantic.last_prompt
+
+    for name, turn in [
+        ("full history", full_history),
+        ("semantic", semantic_turn),
+    ]:
+        latencies, sizes = [], []
+        for text in inputs:
+            start = time.perf_counter()
+            prompt = turn(text)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(sum(approx_tokens(str(m.content)) for m in prompt))
+        print(
+            f"{name:12s} | mean prompt {statistics.mean(sizes):7.0f} tok, "
+            f"last prompt {sizes[-1]:6d} tok | mean latency "
+            f"{statistics.mean(latencies) * 1e3:5.1f} ms, last "
+            f"{latencies[-1] * 1e3:5.1f} ms"
+        )
+    semantic.wait()
+    # a finished embedding is dropped without wait() (one worker: FIFO)
+    semantic.chat(inputs[0])
+    semantic._executor.submit(int).result()
+    assert not semantic._pending
+    print(semantic.messages_for(inputs[-1])[0].content)
@@ -0,0 +1,313 @@
+"""
+* Problem: Structured output is all-or-nothing
+    > JsonOutputParser / PydanticOutputParser in 4_structure_output.py parse the completion only after the
+      LLM has finished. For a long review analysis the caller waits for the whole JSON even though
+      "sentiment" was generated in the first second.
+    > JsonOutputParser can stream, but it re-parses the WHOLE accumulated text (parse_partial_json) on every
+      chunk → O(n²) CPU over a long completion, and it does not validate anything until the end.
+
+* Incremental Parser
+    > A small state machine reads the token stream once (O(n)). It tracks string/escape state and nesting
+      depth, so it knows exactly when the value of a top-level key is closed.
+    > A closed value is decoded with json.loads() on just that slice and emitted as (field, value).
+    > Pydantic: Each field has a TypeAdapter built once from the model's annotation; the value is validated as
+      soon as it closes (e.g. sentiment must be "pos"/"neg") → a wrong field fails early, the caller can
+      cancel generation instead of paying for the rest of it.
+    > At the end the whole object is validated with model_validate() (required fields, defaults).
+
+! Tip
+    > Put the fields you want early (sentiment, name) first in the schema: models usually generate keys
+      in schema order.
+
+? Usage
+    parser = IncrementalPydanticParser(ReviewPydantic)
+    for chunk in model.stream(prompt):
+        for field, value in parser.feed(chunk.content):
+            print(field, value)    # sentiment arrives before the summary is finished
+    review = parser.result()
+"""
+
+import json
+import re
+from typing import Annotated
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+_STRING_END = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["{}\[\],]')
+
+
+class FieldValidationError(ValueError):
+
+    def __init__(self, field, value, error):
+        super().__init__(f"field {field!r} failed validation: {error}")
+        self.field = field
+        self.value = value
+        self.error = error
+
+
+class IncrementalJsonParser:
+
+    def __init__(self):
+        self.buffer = ""
+        self.values = {}
+        self._pos = 0  # next char to scan
+        self._depth = 0
+        self._in_string = False
+        self._started = False
+        self._done = False
+        self._key = None
+        self._key_start = None
+        self._after_key = None
+        self._value_start = None
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        self.buffer += chunk
+        completed = []
+        buf, pos, n = self.buffer, self._pos, len(self.buffer)
+        if not self._started:
+            start = buf.find("{", pos)
+            if start < 0:
+                self._pos = n  # skip ```json fences and chatter
+                return completed
+            self._started, self._depth, pos = True, 1, start + 1
+            self._key_start = None
+
+        while pos < n and not self._done:
+            if self._in_string:
+                match = _STRING_END.search(buf, pos)
+                if match is None:
+                    pos = n
+                    break
+                if match.group() == "\\":
+                    if match.start() + 1 >= n:
+                        pos = match.start()  # wait for the escaped char
+                        break
+                    pos = match.start() + 2
+                    continue
+                pos = match.end()
+                self._in_string = False
+                if self._depth == 1 and self._key is None:
+                    self._key = json.loads(buf[self._key_start : pos])
+                    self._after_key = pos
+                elif self._depth == 1:
+                    completed.append(self._close_value(buf, pos))
+                continue
+
+            match = _STRUCTURAL.search(buf, pos)
+            if match is None:
+                pos = n
+                break
+            char, at = match.group(), match.start()
+            pos = at + 1
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = at
+                elif self._depth == 1 and self._value_start is None:
+                    self._value_start = at
+            elif char in "{[":
+                if self._depth == 1 and self._value_start is None:
+                    self._value_start = at
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    completed.append(self._close_value(buf, pos))
+                elif self._depth == 0:
+                    if self._key is not None:  # scalar before the brace
+                        completed.append(self._close_value(buf, at))
+                    self._done = True
+            elif char == "," and self._depth == 1 and self._key is not None:
+                completed.append(self._close_value(buf, at))
+        self._pos = pos
+        self._trim()
+        return completed
+
+    def _close_value(self, buf, end):
+        key = self._key
+        if self._value_start is None:
+            # scalar (number / true / false / null): text after the colon
+            raw = buf[self._after_key : end].split(":", 1)[1]
+        else:
+            raw = buf[self._value_start : end]
+        value = json.loads(raw)
+        self.values[key] = value
+        self._key = self._key_start = self._after_key = None
+        self._value_start = None
+        return key, value
+
+    def _trim(self):
+        # drop the text of closed fields so the buffer stays O(open value)
+        marks = [self._key_start, self._after_key, self._value_start]
+        keep = min([m for m in marks if m is not None] + [self._pos])
+        if keep:
+            self.buffer = self.buffer[keep:]
+            self._pos -= keep
+            if self._key_start is not None:
+                self._key_start -= keep
+            if self._after_key is not None:
+                self._after_key -= keep
+            if self._value_start is not None:
+                self._value_start -= keep
+
+    @property
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            raise ValueError("JSON object is not complete yet")
+        return self.values
+
+
+class IncrementalPydanticParser:
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        # one adapter per field, built once and reused for every stream
+        self._adapters = _field_adapters(model)
+        self._json = IncrementalJsonParser()
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        completed = []
+        for field, value in self._json.feed(chunk):
+            adapter = self._adapters.get(field)
+            if adapter is not None:
+                try:
+                    value = adapter.validate_python(value)
+                except ValidationError as e:
+                    raise FieldValidationError(field, value, e) from None
+            completed.append((field, value))
+        return completed
+
+    def result(self) -> BaseModel:
+        return self.model.model_validate(self._json.result())
+
+
+_ADAPTER_CACHE = {}
+
+
+def _field_adapters(model):
+    if model not in _ADAPTER_CACHE:
+        _ADAPTER_CACHE[model] = {
+            (info.alias or name): TypeAdapter(_constrained(info))
+            for name, info in model.model_fields.items()
+        }
+    return _ADAPTER_CACHE[model]
+
+
+def _constrained(info):
+    # Field(gt=18, max_length=...) lives in info.metadata, not the annotation
+    if not info.metadata:
+        return info.annotation
+    return Annotated[(info.annotation, *info.metadata)]
+
+
+def stream_fields(chunks, parser):
+    # adapt a model.stream(...) iterator into (field, value) events
+    for chunk in chunks:
+        text = chunk if isinstance(chunk, str) else chunk.content
+        yield from parser.feed(text)
+
+
+if __name__ == "__main__":
+    import time
+    from typing import Literal, Optional
+
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.outputs import Generation
+    from pydantic import Field
+
+    class ReviewPydantic(BaseModel):
+        sentiment: Literal["pos", "neg"] = Field(description="sentiment")
+        key_themes: list[str] = Field(description="key themes")
+        summary: str = Field(description="A brief summary of the review")
+        pros: Optional[list[str]] = Field(default=None)
+        cons: Optional[list[str]] = Field(default=None)
+        name: Optional[str] = Field(default=None)
+
+    completion = (
+        "```json\n"
+        + json.dumps(
+            {
+                "sentiment": "pos",
+                "key_themes": ["performance", "camera", "battery", "price"],
+                "summary": "A powerful phone with a great camera. " * 40,
+                "pros": [
+                    "Insanely powerful processor",
+                    "Stunning 200MP camera",
+                ],
+                "cons": ["Heavy", "Bloatware", "Expensive"],
+                "name": "Nitish Singh",
+            },
+            indent=2,
+        )
+        + "\n```"
+    )
+    tokens = re.findall(r"\s*\S{1,4}", completion)  # ~4 chars per token
+
+    def token_stream(delay):
+        for token in tokens:
+            time.sleep(delay)
+            yield token
+
+    # --------------------------------------
+    # time-to-first-field vs waiting for the full completion
+    # --------------------------------------
+    delay = 0.002
+    start = time.perf_counter()
+    parser = IncrementalPydanticParser(ReviewPydantic)
+    first = None
+    for field, value in stream_fields(token_stream(delay), parser):
+        if first is None:
+            first = time.perf_counter() - start
+            print(f"first field {field}={value!r} after {first * 1e3:.1f} ms")
+    total = time.perf_counter() - start
+    print(f"full object after {total * 1e3:.1f} ms -> {parser.result().name}")
+
+    # a bad early field fails immediately instead of after generation
+    bad = IncrementalPydanticParser(ReviewPydantic)
+    try:
+        for token in re.findall(r"\s*\S{1,4}", '{"sentiment": "meh", "x": 1}'):
+            bad.feed(token)
+    except FieldValidationError as e:
+        print(f"early failure on field {e.field!r}")
+
+    # Field constraints are checked per field too, not only in result()
+    class Person(BaseModel):
+        name: str
+        age: int = Field(gt=18)
+
+    young = IncrementalPydanticParser(Person)
+    try:
+        young.feed('{"name": "a", "age": 5}')
+        raise AssertionError("age=5 passed gt=18")
+    except FieldValidationError as e:
+        assert e.field == "age", e.field
+        print(f"early failure on constrained field {e.field!r}")
+
+    # --------------------------------------
+    # parser CPU cost per token
+    # --------------------------------------
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parser = IncrementalPydanticParser(ReviewPydantic)
+        for token in tokens:
+            parser.feed(token)
+    incremental = (time.perf_counter() - start) / (rounds * len(tokens))
+
+    # what JsonOutputParser does while streaming: re-parse the whole text
+    json_parser = JsonOutputParser()
+    start = time.perf_counter()
+    for _ in range(rounds // 10):
+        text = ""
+        for token in tokens:
+            text += token
+            json_parser.parse_result([Generation(text=text)], partial=True)
+    reparse = (time.perf_counter() - start) / (rounds // 10 * len(tokens))
+    print(
+        f"{len(tokens)} tokens | incremental {incremental * 1e6:.2f} us/token"
+        f" | re-parse per chunk {reparse * 1e6:.2f} us/token"
+    )
@@ -0,0 +1,592 @@
+"""
+* Problem: Nobody knows where the time goes
+    > A chain like prompt | model | parser | RunnableParallel(...) or the hiring graph gives one number: the
+      total time. Is it the model, the parser, a retry, waiting for a free slot, or a cache that never hits?
+
+* Tracer
+    > Tracer is a callback handler: chain.invoke(x, config={"callbacks": [tracer]}). LangChain already calls
+      on_chain_start / on_chain_end for every Runnable of the chain (with run_id + parent_run_id), and
+      on_chat_model_start / on_llm_end for every model call.
+    > Low Overhead: a callback only appends (run_id, parent, name, tags, perf_counter()) to a list.
+      Nothing is built, matched or formatted while the chain runs, everything happens at export time.
+      run_inline=True keeps async chains from hopping to a thread for every event.
+    > Sampling: Attaching ANY callback handler (even an empty one) makes LangChain dispatch every event,
+      which costs ~6% on a chain that does nothing. tracer.config() attaches the tracer to every
+      `sample_every`-th invocation only (head sampling): whole invocations are traced or not, the hot path
+      statistics stay the same, the overhead divides by sample_every.
+    ! Budget: tracing every call costs a few % on a no-op chain (LangChain's event dispatch, not the appends),
+      the <2% overhead budget holds only with sampling, sample_every >= 10. On a chain with a real model call
+      the same µs per event disappear in the model latency.
+    > Recorded per span: wall time, self time (wall - children), tokens in/out (usage_metadata of the model
+      answer), cache hits (LangChain marks a cached answer with total_cost=0), retries (with_retry tags every
+      attempt "retry:attempt:N"), errors.
+    > Graph Nodes: CompiledGraph.arun(..., tracer=tracer) (langgraph_notes/hiring_agent/graph.py) records the
+      run + every node with its queue wait (waiting for max_parallel) and retries.
+    > tracer.record(name, start, end, parent=..., **attrs) adds spans from any other code.
+
+* Export
+    > "trace.json": Chrome trace events → open in https://ui.perfetto.dev or https://www.speedscope.app
+    > "trace.folded": folded stacks ("chain;model 1234" = self time in µs) → flamegraph.pl, inferno, speedscope
+    > Summary: python tracing.py trace.json → per stage: calls, wall, self, p50/p99, queue, tokens, cache hits,
+      retries + the slowest stages by self time.
+
+? Usage
+    tracer = Tracer(sample_every=10)
+    chain.invoke({"topic": "AI"}, config=tracer.config())          # traced 1 in 10
+    chain.invoke({"topic": "AI"}, config={"callbacks": [tracer]})  # always traced
+    tracer.export("trace.json")
+    print(summarize(load_spans("trace.json")))
+"""
+
+import json
+import statistics
+import itertools
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+RETRY_TAG = "retry:attempt:"
+
+
+@dataclass
+class TraceSpan:
+    id: str
+    parent: str | None
+    name: str
+    start: float
+    end: float
+    queued: float = 0.0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    cache_hit: bool = False
+    retries: int = 0
+    error: str | None = None
+
+    @property
+    def wall(self) -> float:
+        return self.end - self.start
+
+
+def _name(serialized, kwargs, default):
+    name = kwargs.get("name")
+    if name:
+        return name
+    if serialized:
+        return serialized.get("name") or serialized.get("id", [default])[-1]
+    return default
+
+
+def _usage(response) -> dict:
+    # token counts + cache hit of an LLMResult
+    attrs = {}
+    generation = response.generations[0][0] if response.generations else None
+    usage = getattr(
+        getattr(generation, "message", None), "usage_metadata", None
+    )
+    if usage:
+        attrs["tokens_in"] = usage.get("input_tokens", 0)
+        attrs["tokens_out"] = usage.get("output_tokens", 0)
+        attrs["cache_hit"] = usage.get("total_cost", None) == 0
+    elif response.llm_output and "token_usage" in response.llm_output:
+        usage = response.llm_output["token_usage"]
+        attrs["tokens_in"] = usage.get("prompt_tokens", 0)
+        attrs["tokens_out"] = usage.get("completion_tokens", 0)
+    return attrs
+
+
+class Tracer(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self, sample_every: int = 1):
+        self.sample_every = sample_every
+        self._invocations = itertools.count(1)  # next() is atomic: batch()
+        self._ids = itertools.count()  # never equal to a LangChain run_id
+        self._starts = []
+        self._ends = []
+
+    def config(self, config: dict | None = None) -> dict:
+        config = dict(config or {})
+        if next(self._invocations) % self.sample_every == 0:
+            config["callbacks"] = [*config.get("callbacks", []), self]
+        return config
+
+    # --------------------------------------
+    # hot path: one list append per event
+    # --------------------------------------
+    def on_chain_start(
+        self,
+        serialized,
+        inputs,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        **kw,
+    ):
+        self._starts.append(
+            (
+                run_id,
+                parent_run_id,
+                _name(serialized, kw, "chain"),
+                tags,
+                time.perf_counter(),
+            )
+        )
+
+    def on_chat_model_start(
+        self,
+        serialized,
+        messages,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        **kw,
+    ):
+        self._starts.append(
+            (
+                run_id,
+                parent_run_id,
+                _name(serialized, kw, "chat_model"),
+                tags,
+                time.perf_counter(),
+            )
+        )
+
+    def on_llm_start(
+        self,
+        serialized,
+        prompts,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        **kw,
+    ):
+        self._starts.append(
+            (
+                run_id,
+                parent_run_id,
+                _name(serialized, kw, "llm"),
+                tags,
+                time.perf_counter(),
+            )
+        )
+
+    def on_retriever_start(
+        self, serialized, query, *, run_id, parent_run_id=None, tags=None, **kw
+    ):
+        self._starts.append(
+            (
+                run_id,
+                parent_run_id,
+                _name(serialized, kw, "retriever"),
+                tags,
+                time.perf_counter(),
+            )
+        )
+
+    def on_tool_start(
+        self,
+        serialized,
+        input_str,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        **kw,
+    ):
+        self._starts.append(
+            (
+                run_id,
+                parent_run_id,
+                _name(serialized, kw, "tool"),
+                tags,
+                time.perf_counter(),
+            )
+        )
+
+    def on_chain_end(self, outputs, *, run_id, **kw):
+        self._ends.append((run_id, time.perf_counter(), None))
+
+    def on_llm_end(self, response, *, run_id, **kw):
+        # read now: a later cache hit rewrites the cached message in place
+        self._ends.append((run_id, time.perf_counter(), _usage(response)))
+
+    def on_retriever_end(self, documents, *, run_id, **kw):
+        self._ends.append((run_id, time.perf_counter(), None))
+
+    def on_tool_end(self, output, *, run_id, **kw):
+        self._ends.append((run_id, time.perf_counter(), None))
+
+    def _on_error(self, error, *, run_id, **kw):
+        self._ends.append((run_id, time.perf_counter(), error))
+
+    on_chain_error = on_llm_error = _on_error
+    on_retriever_error = on_tool_error = _on_error
+
+    # --------------------------------------
+    # everything else happens after the run
+    # --------------------------------------
+    def record(self, name, start, end, parent=None, **attrs):
+        span_id = next(self._ids)
+        self._starts.append((span_id, parent, name, None, start))
+        self._ends.append((span_id, end, attrs))
+        return span_id
+
+    def clear(self):
+        self._starts.clear()
+        self._ends.clear()
+
+    def spans(self) -> list[TraceSpan]:
+        ends = {run_id: (end, extra) for run_id, end, extra in self._ends}
+        spans = []
+        last_attempt = {}  # (parent, name) -> span of the latest attempt
+        for run_id, parent, name, tags, start in self._starts:
+            if run_id not in ends:
+                continue  # still running
+            end, extra = ends[run_id]
+            span = TraceSpan(
+                str(run_id),
+                None if parent is None else str(parent),
+                name,
+                start,
+                end,
+            )
+            for tag in tags or ():
+                if tag.startswith(RETRY_TAG):
+                    # attempt N = N-1 retries so far, only the last one counts
+                    attempts = int(tag[len(RETRY_TAG) :]) - 1
+                    key = (span.parent, name)
+                    latest = last_attempt.get(key)
+                    if latest is None or latest.retries < attempts:
+                        if latest is not None:
+                            latest.retries = 0
+                        span.retries = attempts
+                        last_attempt[key] = span
+            if isinstance(extra, BaseException):
+                span.error = type(extra).__name__
+            elif extra:
+                for key, value in extra.items():
+                    setattr(span, key, value)
+            spans.append(span)
+        return spans
+
+    def export(self, path: str):
+        spans = self.spans()
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                json.dump(chrome_trace(spans), f)
+            else:
+                f.writelines(
+                    f"{stack} {round(us)}\n"
+                    for stack, us in folded_stacks(spans).items()
+                )
+
+
+def self_times(spans: list[TraceSpan]) -> dict[str, float]:
+    # wall time minus the wall time of the children (parallel children can
+    # add up to more than the parent → 0)
+    children = defaultdict(float)
+    for span in spans:
+        if span.parent is not None:
+            children[span.parent] += span.wall
+    return {s.id: max(0.0, s.wall - children[s.id]) for s in spans}
+
+
+def folded_stacks(spans: list[TraceSpan]) -> dict[str, float]:
+    by_id = {span.id: span for span in spans}
+    own = self_times(spans)
+    stacks = defaultdict(float)
+    for span in spans:
+        frames, node = [], span
+        while node is not None:
+            frames.append(node.name.replace(";", ":").replace(" ", "_"))
+            node = by_id.get(node.parent)
+        stacks[";".join(reversed(frames))] += own[span.id] * 1e6
+    return stacks
+
+
+def chrome_trace(spans: list[TraceSpan]) -> dict:
+    if not spans:
+        return {"traceEvents": []}
+    origin = min(span.start for span in spans)
+    by_id = {span.id: span for span in spans}
+    roots, events = {}, []
+    for span in spans:
+        root = span
+        while root.parent in by_id:
+            root = by_id[root.parent]
+        tid = roots.setdefault(root.id, len(roots))
+        args = {"id": span.id, "parent": span.parent}
+        for key in ("queued", "tokens_in", "tokens_out", "cache_hit"):
+            if getattr(span, key):
+                args[key] = getattr(span, key)
+        if span.retries:
+            args["retries"] = span.retries
+        if span.error:
+            args["error"] = span.error
+        events.append(
+            {
+                "name": span.name,
+                "ph": "X",
+                "pid": 1,
+                "tid": tid,
+                "ts": (span.start - origin) * 1e6,
+                "dur": span.wall * 1e6,
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def load_spans(path: str) -> list[TraceSpan]:
+    with open(path) as f:
+        if path.endswith(".json"):
+            return [
+                TraceSpan(
+                    name=event["name"],
+                    start=event["ts"] / 1e6,
+                    end=(event["ts"] + event["dur"]) / 1e6,
+                    **event["args"],
+                )
+                for event in json.load(f)["traceEvents"]
+            ]
+        # folded stacks only know self time per stack: one span per line
+        spans = []
+        for i, line in enumerate(f):
+            stack, us = line.rsplit(" ", 1)
+            name = stack.rsplit(";", 1)[-1]
+            spans.append(TraceSpan(str(i), None, name, 0.0, int(us) / 1e6))
+        return spans
+
+
+def summarize(spans: list[TraceSpan], top: int = 5) -> str:
+    own = self_times(spans)
+    stages = defaultdict(list)
+    for span in spans:
+        stages[span.name].append(span)
+    total = sum(own.values()) or 1e-9
+    rows = []
+    for name, group in stages.items():
+        walls = sorted(s.wall for s in group)
+        rows.append(
+            (
+                sum(own[s.id] for s in group),
+                name,
+                len(group),
+                sum(walls),
+                walls[len(walls) // 2],
+                walls[min(len(walls) - 1, int(0.99 * len(walls)))],
+                sum(s.queued for s in group),
+                sum(s.tokens_in for s in group),
+                sum(s.tokens_out for s in group),
+                sum(s.cache_hit for s in group),
+                sum(s.retries for s in group),
+                sum(s.error is not None for s in group),
+            )
+        )
+    rows.sort(reverse=True)
+    lines = [
+        f"{'stage':28s} {'calls':>6s} {'wall ms':>9s} {'self ms':>9s} "
+        f"{'p50 ms':>8s} {'p99 ms':>8s} {'queue ms':>9s} {'tok in':>7s} "
+        f"{'tok out':>7s} {'cache':>5s} {'retry':>5s} {'err':>4s}"
+    ]
+    for own_s, name, calls, wall, p50, p99, queued, *counts in rows:
+        tokens_in, tokens_out, hits, retries, errors = counts
+        lines.append(
+            f"{name[:28]:28s} {calls:6d} {wall * 1e3:9.1f} {own_s * 1e3:9.1f} "
+            f"{p50 * 1e3:8.2f} {p99 * 1e3:8.2f} {queued * 1e3:9.1f} "
+            f"{tokens_in:7d} {tokens_out:7d} {hits:5d} {retries:5d} "
+            f"{errors:4d}"
+        )
+    slowest = ", ".join(
+        f"{name} ({own_s / total:.0%})" for own_s, name, *_ in rows[:top]
+    )
+    lines.append(f"\nslowest stages by self time: {slowest}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # CLI: python tracing.py trace.json [top]
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(summarize(load_spans(sys.argv[1]), top))
+
+elif __name__ == "__main__":
+    import asyncio
+    import os
+    import tempfile
+
+    from langchain_core.caches import InMemoryCache
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.runnables import (
+        RunnableLambda,
+        RunnableParallel,
+        RunnablePassthrough,
+    )
+
+    # --------------------------------------
+    # overhead on a no-op chain
+    # --------------------------------------
+    noop = (
+        RunnableLambda(lambda x: x)
+        | RunnableLambda(lambda x: x)
+        | RunnableLambda(lambda x: x)
+    )
+
+    class EmptyHandler(BaseCallbackHandler):
+        run_inline = True
+
+    tracer, sampled = Tracer(), Tracer(sample_every=10)
+    variants = {
+        "untraced": lambda: {},
+        "empty handler": lambda: {"callbacks": [EmptyHandler()]},
+        "tracer, every call": lambda: {"callbacks": [tracer]},
+        "tracer, 1 in 10": sampled.config,
+    }
+    times = {name: [] for name in variants}
+    names = list(variants)
+    for rnd in range(60):
+        # interleaved rounds in rotating order, best round per variant
+        # (noise only ever adds time, like timeit)
+        for name in names[rnd % 4 :] + names[: rnd % 4]:
+            config = variants[name]
+            start = time.perf_counter()
+            for i in range(100):
+                noop.invoke(i, config())
+            times[name].append((time.perf_counter() - start) / 100)
+        tracer.clear()
+    base = min(times["untraced"])
+    print("no-op chain (3 lambdas), best of 60 rounds x 100 invokes")
+    for name, values in times.items():
+        per_call = min(values)
+        print(
+            f"    {name:20s} {per_call * 1e6:6.1f} us/invoke  "
+            f"overhead {per_call / base - 1:+6.1%}"
+        )
+    print("    → the <2% overhead budget needs sampling (sample_every >= 10)")
+
+    # config() is called from batch() threads: every 10th call is sampled
+    from concurrent.futures import ThreadPoolExecutor
+
+    counted = Tracer(sample_every=10)
+    with ThreadPoolExecutor(8) as pool:
+        configs = list(pool.map(lambda _: counted.config(), range(10_000)))
+    assert sum(bool(c.get("callbacks")) for c in configs) == 1000
+
+    # --------------------------------------
+    # a traced run of the joke chain from runnables.py
+    # --------------------------------------
+    class TokenLatencyModel(BaseChatModel):
+        # local stand-in: 10 ms + 0.2 ms per output token, reports usage
+        @property
+        def _llm_type(self):
+            return "token-latency-model"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kw):
+            prompt = messages[-1].content
+            words = 20 + len(prompt) % 30
+            time.sleep(0.01 + 0.0002 * words)
+            message = AIMessage(
+                content=" ".join(["word"] * words),
+                usage_metadata={
+                    "input_tokens": len(prompt.split()),
+                    "output_tokens": words,
+                    "total_tokens": len(prompt.split()) + words,
+                },
+            )
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    attempts = {"n": 0}
+
+    def flaky_word_count(text):
+        # every 4th call fails once → with_retry
+        attempts["n"] += 1
+        if attempts["n"] % 4 == 0:
+            raise ConnectionError("word count service timeout")
+        return len(text.split())
+
+    model = TokenLatencyModel(cache=InMemoryCache())
+    parser = StrOutputParser()
+    joke = PromptTemplate.from_template("Write a joke about {topic}")
+    explain = PromptTemplate.from_template(
+        "Explain the following joke - {text}"
+    )
+    chain = (
+        joke
+        | model
+        | parser
+        | RunnableParallel(
+            joke=RunnablePassthrough(),
+            word_count=RunnableLambda(flaky_word_count).with_retry(
+                stop_after_attempt=3, wait_exponential_jitter=False
+            ),
+            explanation=explain | model | parser,
+        )
+    )
+    tracer = Tracer()
+    topics = ["AI", "cricket", "python", "databases", "cats"]
+    for topic in topics * 3:  # repeated topics hit the model cache
+        chain.invoke({"topic": topic}, config={"callbacks": [tracer]})
+
+    # the hiring graph in the same trace
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(
+        0, os.path.join(here, "..", "..", "langgraph_notes", "hiring_agent")
+    )
+    from graph import ToolLimits
+    from stand_in_tools import LATENCY, HiringTools
+    from workflow import DEFAULT_LIMITS, GOAL, build_hiring_graph
+
+    tools = HiringTools(
+        ToolLimits(DEFAULT_LIMITS),
+        latency={tool: seconds / 10 for tool, seconds in LATENCY.items()},
+    )
+    app = build_hiring_graph(tools).compile()
+    asyncio.run(app.arun(GOAL, max_parallel=3, tracer=tracer))
+
+    async def graph_overhead(rounds=40, runs=10):
+        # node spans are recorded once per run, after it finished
+        fast = HiringTools(
+            latency={tool: 0 for tool in LATENCY}, calendar_failure_every=0
+        )
+        noop_graph = build_hiring_graph(fast).compile()
+        graph_tracer, times = Tracer(), {False: [], True: []}
+        for rnd in range(rounds):
+            # alternate the order: the 2nd run of a round is not favoured
+            for traced in (False, True)[:: 1 if rnd % 2 else -1]:
+                start = time.perf_counter()
+                for _ in range(runs):
+                    await noop_graph.arun(
+                        GOAL, tracer=graph_tracer if traced else None
+                    )
+                times[traced].append(time.perf_counter() - start)
+        plain, traced = min(times[False]), min(times[True])
+        print(
+            f"hiring graph, zero tool latency | untraced "
+            f"{plain / runs * 1e3:5.2f} ms/run | traced "
+            f"{traced / runs * 1e3:5.2f} ms/run | overhead "
+            f"{traced / plain - 1:+.1%}"
+        )
+
+    asyncio.run(graph_overhead())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("trace.json", "trace.folded"):
+            tracer.export(os.path.join(tmp, name))
+        size = os.path.getsize(os.path.join(tmp, "trace.json"))
+        print(
+            f"\n{len(tracer.spans())} spans → trace.json ({size / 1024:.0f} KB),"
+            f" trace.folded\n"
+        )
+        with open(os.path.join(tmp, "trace.folded")) as f:
+            print("".join(sorted(f, key=lambda l: -int(l.split()[-1]))[:3]))
+        print("$ python tracing.py trace.json\n")
+        print(summarize(load_spans(os.path.join(tmp, "trace.json"))))
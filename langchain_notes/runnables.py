@@ -94,6 +94,8 @@ prompt1 = PromptTemplate(
     template="Write a joke about {topic}", input_variables=["topic"]
 )
 model = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite")
+# offline stand-in with latency, streaming and 429s: performance/fake_models.py
+# (every chain pattern of the notes benchmarked: performance/benchmark_suite.py)
 parser = StrOutputParser()
 prompt2 = PromptTemplate(
     template="Explain the following joke - {text}", input_variables=["text"]
@@ -103,6 +105,7 @@ chain = RunnableSequence(prompt1, model, parser, prompt2, model, parser)
 # another syntax of RunnableSequence
 # chain = prompt1 | model | parser | prompt2 | model | parser
 print(chain.invoke({"topic": "AI"}))
+# for pushing thousands of topics through this chain see performance/batch_pipeline.py
 
 
 # --------------------------------------
@@ -150,6 +153,7 @@ branch_chain = RunnableBranch(
 )
 
 final_chain = RunnableSequence(report_gen_chain, branch_chain)
+# for O(1) routing with many branches see performance/branch_router.py
 
 print(final_chain.invoke({"topic": "Russia vs Ukraine"}))
 # for chunk in final_chain.stream({"topic": "Russia vs Ukraine"}):
@@ -175,6 +179,7 @@ parallel_chain = RunnableParallel(
     {"joke": RunnablePassthrough(), "word_count": RunnableLambda(word_count)}
 )
 final_chain = RunnableSequence(joke_gen_chain, parallel_chain)
+# per-step timings, tokens and a flamegraph of this chain: see performance/tracing.py
 result = final_chain.invoke({"topic": "AI"})
 
 final_result = """{} \n word count - {}""".format(
@@ -79,6 +79,7 @@ It plans, take action, adapts to changes, and seeks help only when necessary.
     Step 3: Select the best plan with the help of:
         . Human-in-the-loop input (e.g., "Which of these options do you prefer?")
         · A pre-programmed policy (e.g., "Favor low-cost channels first")
+    (plans scored concurrently, best plan starts speculatively: hiring_agent/planner.py)
 
 ? 4) Reasoning
     Reasoning is the cognitive process through which an agentic ai system interprets information,
@@ -90,6 +91,7 @@ It plans, take action, adapts to changes, and seeks help only when necessary.
         3. Resource estimation - Estimate time, dependencies, risks
     Reasoning During Execution:
         1. Decision-making - Choosing between options (3 candidates match -> schedule 2 best, reject 1)
+           (screening thousands of resumes before this decision: hiring_agent/screening.py)
         2. HITL handling - Knowing when to pause and ask for help (Unsure about salary range)
         3. Error handling - Interpreting tool/API failures and recovering
 
@@ -144,11 +146,14 @@ It plans, take action, adapts to changes, and seeks help only when necessary.
 .Retry Logic         - Handles failed tool calls or reasoning attempts with backoff.
 .Looping & Iteration - Repeats steps (e.g., keep checking job apps until 10 are received).
 .Delegation          - Decides whether to hand off work to tools, LLM, or human.
+  (runnable version with parallel scheduling: hiring_agent/workflow.py)
+  (many goals at once, one worker pool and batched LLM calls: hiring_agent/runtime.py)
 
 ? Tools:
 External Actions      - Perform API calls [e.g., post a job, send an email, trigger onboarding]
 Knowledge Base Access - Retrieve factual or domain-specific information uning RAG or search tools to
                         ground responses.
+  (cached, coalesced and batched tool calls: hiring_agent/tool_layer.py)
 
 ? Memory:
 Short-Term Memory     - Maintains the active session's context - retain error messages, tool call, and
@@ -158,7 +163,9 @@ State Tracking        - Monitors progress: what's completed, what's pending (e.g
 
 ? Supervisor:
 Approval Requests (HITL) - Agent checks with human before high-risk actions (e.g., sending offers).
+  (paused runs stored in the checkpoint db, resumed by any worker: hiring_agent/hitl.py)
 Guardrails Enforcement   - Blocks unsafe or non-compliant behavior.
+  (rules compiled into one indexed lookup per tool call: hiring_agent/policy.py)
 Edge Case Escalation     - Alerts humans when uncertainty/conflict arises.
 """
 
@@ -0,0 +1,342 @@
+"""
+* Problem: Full snapshots of a growing state
+    > The goal state of 2_what.py (main_goal, constraints, progress: applications_received,
+      interviews_scheduled, ...) lives for weeks. Next to it the agent keeps history: every tool call,
+      every application, every mail.
+    > A checkpointer that writes the FULL state after every step writes O(state) bytes per step, and the
+      state grows with every step → write cost grows linearly, total cost quadratically.
+
+* Delta Checkpointing
+    > A step is stored as the operations that changed the state, not as the state:
+        ("set", ["progress", "applications_received"], 9)      # overwrite a (nested) key
+        ("append", ["history"], [{"event": "mail sent"}])       # list grown with operator.add
+        ("del", ["pending_approval"], None)
+      For the hiring graph these ops are just the node's update + the reducer of each key (ops_from_update),
+      so a step costs O(update), no diff of the whole state. Keys with any other reducer than list +
+      (max, dict merge, counters) are logged as "set" of the merged value, so replay gives the live state.
+    > Append-only Log: one SQLite row per step (thread_id, step, ops as JSON).
+    > Compaction: every `snapshot_every` steps the full state is written once as a snapshot and the deltas
+      before it are deleted → the log never holds more than `snapshot_every` deltas per thread.
+    > Resume: latest snapshot + replay of the deltas after it → O(deltas since the snapshot), not O(steps).
+    > SQLite runs in WAL mode with synchronous=NORMAL: one fsync per checkpoint of the WAL, not of the db.
+
+? Usage
+    checkpointer = DeltaCheckpointer("hiring.db", snapshot_every=500)
+    checkpointer.put("hire-backend-1", state, [("set", ["progress", "interviews_scheduled"], 2)])
+    state = checkpointer.load("hire-backend-1")       # after a restart
+    run = await app.arun(GOAL, checkpointer=checkpointer, thread_id="hire-backend-1")
+"""
+
+import json
+import operator
+import sqlite3
+import threading
+
+
+def ops_from_update(
+    update: dict, state: dict, reducers: dict | None = None
+) -> list:
+    # `state` is the state after the update was merged
+    ops = []
+    for key, value in (update or {}).items():
+        reducer = (reducers or {}).get(key)
+        if reducer is None:
+            ops.append(("set", [key], value))
+        elif (
+            reducer is operator.add
+            and isinstance(value, list)
+            and isinstance(state[key], list)
+        ):
+            ops.append(("append", [key], value))
+        else:
+            # max, dict merge, counters, ...: replay can not re-run the
+            # reducer, so the merged value is logged
+            ops.append(("set", [key], state[key]))
+    return ops
+
+
+def apply_ops(state: dict, ops) -> dict:
+    for op, path, value in ops:
+        target = state
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        key = path[-1]
+        if op == "set":
+            target[key] = value
+        elif op == "append":
+            target.setdefault(key, []).extend(value)
+        elif op == "del":
+            target.pop(key, None)
+        else:
+            raise ValueError(f"unknown checkpoint op {op!r}")
+    return state
+
+
+class DeltaCheckpointer:
+
+    def __init__(self, path: str = ":memory:", snapshot_every: int = 500):
+        self.snapshot_every = snapshot_every
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS deltas (
+                thread_id TEXT, step INTEGER, ops TEXT,
+                PRIMARY KEY (thread_id, step));
+            CREATE TABLE IF NOT EXISTS snapshots (
+                thread_id TEXT PRIMARY KEY, step INTEGER, state TEXT);
+            """)
+        self._steps: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, thread_id: str, state: dict, ops) -> int:
+        # `state` is the state AFTER the ops, only read at compaction time
+        with self._lock:
+            step = self._last_step(thread_id) + 1
+            self._db.execute(
+                "INSERT INTO deltas VALUES (?, ?, ?)",
+                (thread_id, step, json.dumps(ops)),
+            )
+            if step % self.snapshot_every == 0:
+                self._compact(thread_id, step, state)
+            self._db.commit()
+            self._steps[thread_id] = step
+            return step
+
+    def _compact(self, thread_id, step, state):
+        self._db.execute(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+            (thread_id, step, json.dumps(state)),
+        )
+        self._db.execute(
+            "DELETE FROM deltas WHERE thread_id = ? AND step <= ?",
+            (thread_id, step),
+        )
+
+    def load(self, thread_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT step, state FROM snapshots WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+            step, state = (row[0], json.loads(row[1])) if row else (0, None)
+            deltas = self._db.execute(
+                "SELECT step, ops FROM deltas WHERE thread_id = ? AND step > ?"
+                " ORDER BY step",
+                (thread_id, step),
+            ).fetchall()
+            if state is None and not deltas:
+                return None
+            state = state or {}
+            for step, ops in deltas:
+                apply_ops(state, json.loads(ops))
+            self._steps[thread_id] = step
+        return state
+
+    def _last_step(self, thread_id):
+        step = self._steps.get(thread_id)
+        if step is None:
+            row = self._db.execute(
+                "SELECT MAX(step) FROM deltas WHERE thread_id = ?"
+                " UNION ALL SELECT step FROM snapshots WHERE thread_id = ?",
+                (thread_id, thread_id),
+            ).fetchall()
+            step = max([r[0] for r in row if r[0] is not None], default=0)
+            self._steps[thread_id] = step
+        return step
+
+    def release(self, thread_id: str):
+        # paused thread: keep nothing in memory, the step is re-read on put
+        self._steps.pop(thread_id, None)
+
+    def close(self):
+        self._db.close()
+
+
+class SnapshotCheckpointer:
+    # baseline: the whole state as one row per step
+
+    def __init__(self, path: str = ":memory:"):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT, step INTEGER, state TEXT,"
+            " PRIMARY KEY (thread_id, step))"
+        )
+        self._steps: dict[str, int] = {}
+
+    def put(self, thread_id: str, state: dict, ops=None) -> int:
+        step = self._steps.get(thread_id, 0) + 1
+        self._db.execute(
+            "INSERT INTO checkpoints VALUES (?, ?, ?)",
+            (thread_id, step, json.dumps(state)),
+        )
+        self._db.commit()
+        self._steps[thread_id] = step
+        return step
+
+    def load(self, thread_id: str) -> dict | None:
+        row = self._db.execute(
+            "SELECT state FROM checkpoints WHERE thread_id = ?"
+            " ORDER BY step DESC LIMIT 1",
+            (thread_id,),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self._db.close()
+
+
+if __name__ == "__main__":
+    import copy
+    import os
+    import shutil
+    import statistics
+    import tempfile
+    import time
+
+    from workflow import GOAL
+
+    def hiring_steps(n):
+        # weeks of agent work: one history event per step, new applications
+        # every few steps, progress counters updated
+        for step in range(1, n + 1):
+            ops = [
+                (
+                    "append",
+                    ["history"],
+                    [{"step": step, "event": f"tool call {step % 7}"}],
+                ),
+                ("set", ["progress", "last_step"], step),
+            ]
+            if step % 5 == 0:
+                ops.append(
+                    ("append", ["applications"], [f"application-{step}"])
+                )
+                ops.append(
+                    ("set", ["progress", "applications_received"], step // 5)
+                )
+            if step % 200 == 0:
+                ops.append(
+                    ("set", ["progress", "interviews_scheduled"], step // 200)
+                )
+            yield ops
+
+    directory = tempfile.mkdtemp()
+    steps = 10_000
+    start_state = copy.deepcopy(GOAL) | {
+        "progress": {"JD_created": True, "posted_on": ["LinkedIn"]},
+        "history": [],
+        "applications": [],
+    }
+    for name, filename, checkpointer_class in [
+        ("full snapshot", "full.db", SnapshotCheckpointer),
+        ("delta + compaction", "delta.db", DeltaCheckpointer),
+    ]:
+        checkpointer = checkpointer_class(os.path.join(directory, filename))
+        state = copy.deepcopy(start_state)
+        latencies = []
+        for ops in hiring_steps(steps):
+            apply_ops(state, ops)
+            start = time.perf_counter()
+            checkpointer.put("hire-backend-1", state, ops)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        resumed = checkpointer.load("hire-backend-1")
+        resume = time.perf_counter() - start
+        assert resumed == state
+        checkpointer.close()
+        size = sum(
+            os.path.getsize(os.path.join(directory, f))
+            for f in os.listdir(directory)
+            if f.startswith(filename)
+        )
+        print(
+            f"{name:20s} | write mean {statistics.mean(latencies) * 1e3:6.3f}"
+            f" ms, first 100 {statistics.mean(latencies[:100]) * 1e3:6.3f} "
+            f"ms, last 100 {statistics.mean(latencies[-100:]) * 1e3:6.3f} ms"
+            f" | total {sum(latencies):5.1f} s | resume {resume * 1e3:6.1f} "
+            f"ms | db {size / 2**20:6.1f} MB"
+        )
+
+    # --------------------------------------
+    # crash in the middle of the hiring graph, then resume
+    # --------------------------------------
+    import asyncio
+
+    from graph import NodeError
+    from stand_in_tools import HiringTools
+    from workflow import build_hiring_graph
+
+    async def crash_and_resume():
+        checkpointer = DeltaCheckpointer(os.path.join(directory, "graph.db"))
+        tools = HiringTools()
+
+        async def mail_down(to, body):
+            raise ConnectionError("mail API down")
+
+        tools.send_mail = mail_down
+        app = build_hiring_graph(tools).compile()
+        try:
+            await app.arun(GOAL, checkpointer=checkpointer, thread_id="t1")
+        except NodeError as e:
+            print(f"\nfirst run: {e} after {sum(tools.calls.values())} calls")
+        tools = HiringTools()
+        app = build_hiring_graph(tools).compile()
+        run = await app.arun(GOAL, checkpointer=checkpointer, thread_id="t1")
+        print(
+            f"resumed run: {sorted(run.spans)} re-ran, "
+            f"{sum(tools.calls.values())} calls, offer to {run.state['offer']}"
+        )
+
+    asyncio.run(crash_and_resume())
+
+    # --------------------------------------
+    # replay == live run for reducers other than list +
+    # --------------------------------------
+    from graph import StateGraph
+
+    async def replay_check():
+        graph = StateGraph(
+            reducers={
+                "best": max,
+                "seen": lambda old, new: {**old, **new},
+                "calls": operator.add,  # int counter
+                "log": operator.add,  # string
+            }
+        )
+
+        def step(i):
+            async def node(state):
+                return {
+                    "best": i * 7 % 5,
+                    "seen": {f"n{i}": i},
+                    "calls": 1,
+                    "log": f"{i};",
+                }
+
+            return node
+
+        for i in range(6):
+            graph.add_node(f"n{i}", step(i))
+            if i:
+                graph.add_edge(f"n{i - 1}", f"n{i}")
+        checkpointer = DeltaCheckpointer(os.path.join(directory, "replay.db"))
+        run = await graph.compile().arun(
+            {"best": 0, "seen": {}, "calls": 0, "log": ""},
+            checkpointer=checkpointer,
+            thread_id="r1",
+        )
+        replayed = checkpointer.load("r1")
+        assert replayed == run.state, (replayed, run.state)
+        print(
+            f"replay of max / dict merge / int + / str + reducers: "
+            f"best {replayed['best']}, calls {replayed['calls']}, "
+            f"log {replayed['log']!r} == live state"
+        )
+        checkpointer.close()
+
+    asyncio.run(replay_check())
+    shutil.rmtree(directory)
@@ -0,0 +1,357 @@
+"""
+* Orchestrator jobs from 2_what.py, made executable
+    > Task Sequencing: add_edge("create_jd", "post_linkedin") → a node runs after ALL the nodes it depends on.
+    > Conditional Routing: add_node(..., when=lambda state: ...) → the node is skipped (its dependents still
+      run) when the condition is false, e.g. no offer if nobody passed the interview.
+    > Retry Logic: add_node(..., retries=2) → a failing node is retried with exponential backoff.
+    > Looping: add_node(..., until=lambda state: state["applications_received"] >= 10) → the node runs again
+      until the condition holds ("keep checking job apps until 10 are received").
+
+* Scheduler
+    > Every node is an async function state -> dict of updates. Updates are merged into the state with a
+      reducer per key (default: overwrite, e.g. operator.add for lists like posted_on).
+    > Dataflow, no rounds: a node starts the moment its last dependency finishes. LangGraph runs a graph in
+      supersteps (a step waits for its slowest node); here independent branches never wait for each other.
+    > Concurrency Caps: ToolLimits gives every tool its own asyncio.Semaphore (e.g. 2 calls to the calendar
+      API, 8 resume parser calls), max_parallel caps the number of nodes running at once (1 = sequential).
+    > Tracing: arun(..., tracer=Tracer()) adds the run and every node (wall time, queue wait for max_parallel,
+      retries) to the trace of langchain_notes/performance/tracing.py.
+    > Critical Path: Every node records a span (start, end). The critical path walks back from the node that
+      finished last, always to the dependency that finished last → the chain of nodes that decided the total
+      time. Making any other node faster does not make the run faster.
+    > Checkpoints: arun(..., checkpointer=DeltaCheckpointer(...), thread_id=...) stores every node's update as
+      a delta (checkpoint.py); a restarted run loads the state and skips the nodes that already completed.
+    > Interrupts (HITL): a node calls interrupt(state, "post_jd", "Can I post this JD?"). Without an answer in
+      the state the node pauses, everything depending on it is blocked, independent branches still finish
+      and arun returns with run.interrupts. arun(..., resume={"post_jd": True}) continues (hitl.py).
+
+? Usage
+    graph = StateGraph(reducers={"posted_on": operator.add})
+    graph.add_node("create_jd", create_jd)
+    graph.add_node("post_linkedin", post_linkedin, retries=2)
+    graph.add_edge("create_jd", "post_linkedin")
+    app = graph.compile()
+    run = asyncio.run(app.arun({"main_goal": "Hire a backend engineer"}))
+    print(run.timeline())
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from checkpoint import ops_from_update
+
+NodeFn = Callable[[dict], Awaitable[dict | None]]
+COMPLETED = "__completed__"
+ANSWERS = "__answers__"
+
+
+class GraphError(ValueError):
+    pass
+
+
+class Interrupt(Exception):
+    # raised inside a node: the run pauses until `key` is answered
+
+    def __init__(self, key: str, question: str, payload=None):
+        super().__init__(question)
+        self.key = key
+        self.question = question
+        self.payload = payload
+        self.node: str | None = None
+
+
+def interrupt(state: dict, key: str, question: str, payload=None):
+    answers = state.get(ANSWERS, {})
+    if key in answers:
+        return answers[key]
+    raise Interrupt(key, question, payload)
+
+
+class NodeError(RuntimeError):
+
+    def __init__(self, node, error):
+        super().__init__(f"node {node!r} failed: {error!r}")
+        self.node = node
+        self.error = error
+
+
+@dataclass
+class Node:
+    name: str
+    fn: NodeFn
+    retries: int = 0
+    backoff: float = 0.05
+    when: Callable[[dict], bool] | None = None
+    until: Callable[[dict], bool] | None = None
+    max_loops: int = 100
+
+
+@dataclass
+class Span:
+    node: str
+    start: float
+    end: float
+    attempts: int = 1
+    loops: int = 1
+    skipped: bool = False
+    queued: float = 0.0
+
+
+@dataclass
+class RunResult:
+    state: dict
+    spans: dict[str, Span]
+    elapsed: float
+    critical_path: list[str] = field(default_factory=list)
+    interrupts: list[Interrupt] = field(default_factory=list)
+
+    @property
+    def paused(self) -> bool:
+        return bool(self.interrupts)
+
+    def timeline(self, width: int = 50) -> str:
+        lines = []
+        scale = width / max(self.elapsed, 1e-9)
+        for span in sorted(self.spans.values(), key=lambda s: s.start):
+            begin = int(span.start * scale)
+            bar = "-" if span.skipped else "#"
+            bar *= max(1, int((span.end - span.start) * scale))
+            mark = "*" if span.node in self.critical_path else " "
+            lines.append(
+                f"{mark} {span.node:22s} |{' ' * begin}{bar:{width - begin}s}"
+                f"| {(span.end - span.start) * 1e3:6.0f} ms"
+            )
+        return "\n".join(lines)
+
+
+class ToolLimits:
+    # per-tool concurrency caps: `async with limits("calendar"): ...`
+
+    def __init__(self, limits: dict[str, int] | None = None, default=None):
+        self.limits = dict(limits or {})
+        self.default = default
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def __call__(self, tool: str):
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            limit = self.limits.get(tool, self.default)
+            semaphore = asyncio.Semaphore(limit) if limit else _NoLimit()
+            self._semaphores[tool] = semaphore
+        return semaphore
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StateGraph:
+
+    def __init__(self, reducers: dict[str, Callable] | None = None):
+        self.reducers = dict(reducers or {})
+        self.nodes: dict[str, Node] = {}
+        self.deps: dict[str, set[str]] = {}
+
+    def add_node(self, name: str, fn: NodeFn, **options):
+        if name in self.nodes:
+            raise GraphError(f"node {name!r} already exists")
+        self.nodes[name] = Node(name, fn, **options)
+        self.deps[name] = set()
+
+    def add_edge(self, source: str | list[str], target: str):
+        for src in [source] if isinstance(source, str) else source:
+            self.deps[target].add(src)
+
+    def compile(self) -> "CompiledGraph":
+        for target, sources in self.deps.items():
+            unknown = sources - self.nodes.keys()
+            if unknown:
+                raise GraphError(f"{target!r} depends on unknown {unknown}")
+        return CompiledGraph(
+            self.nodes, _topological_order(self.deps), self.deps, self.reducers
+        )
+
+
+class CompiledGraph:
+
+    def __init__(self, nodes, order, deps, reducers):
+        self.nodes = nodes
+        self.order = order
+        self.deps = {name: frozenset(d) for name, d in deps.items()}
+        self.reducers = reducers
+        self.dependents = {name: [] for name in order}
+        for name in order:
+            for dep in self.deps[name]:
+                self.dependents[dep].append(name)
+
+    async def ainvoke(
+        self, state: dict, max_parallel: int | None = None, **kw
+    ):
+        return (await self.arun(state, max_parallel, **kw)).state
+
+    async def arun(
+        self,
+        state: dict,
+        max_parallel: int | None = None,
+        checkpointer=None,
+        thread_id: str | None = None,
+        resume: dict | None = None,
+        tracer=None,
+        gate=None,
+    ) -> RunResult:
+        state = dict(state)
+        completed = set()
+        if checkpointer is not None:
+            # resume: nodes listed in __completed__ are not run again
+            saved = checkpointer.load(thread_id)
+            if saved is None and resume:
+                # answers for a run that was never started (or is gone)
+                raise GraphError(f"no checkpoint to resume {thread_id!r}")
+            if saved is None:
+                ops = [("set", [key], value) for key, value in state.items()]
+                checkpointer.put(thread_id, state, ops)
+            else:
+                state = saved
+                completed = set(state.get(COMPLETED, []))
+        if resume:
+            ops = [("set", [ANSWERS, k], v) for k, v in resume.items()]
+            state[ANSWERS] = {**state.get(ANSWERS, {}), **resume}
+            if checkpointer is not None:
+                checkpointer.put(thread_id, state, ops)
+        spans: dict[str, Span] = {}
+        interrupts: list[Interrupt] = []
+        blocked = set()
+        if gate is None:
+            # a shared gate (runtime.py WorkerPool) limits many runs at once
+            gate = (
+                asyncio.Semaphore(max_parallel) if max_parallel else _NoLimit()
+            )
+        done = {name: asyncio.Event() for name in self.order}
+        origin = time.perf_counter()
+
+        def save(name, update, finished):
+            if checkpointer is not None:
+                ops = ops_from_update(update, state, self.reducers)
+                if finished:
+                    ops.append(("append", [COMPLETED], [name]))
+                    state.setdefault(COMPLETED, []).append(name)
+                checkpointer.put(thread_id, state, ops)
+
+        async def run(name):
+            await asyncio.gather(*(done[d].wait() for d in self.deps[name]))
+            if name in completed:
+                done[name].set()
+                return
+            if blocked & self.deps[name]:
+                # waits for an answer further up
+                blocked.add(name)
+                done[name].set()
+                return
+            ready = time.perf_counter()
+            async with gate:
+                start = time.perf_counter() - origin
+                node = self.nodes[name]
+                try:
+                    span = await self._run_node(node, state, start, save)
+                except Interrupt as pause:
+                    pause.node = name
+                    interrupts.append(pause)
+                    blocked.add(name)
+                    done[name].set()
+                    return
+                span.end = time.perf_counter() - origin
+                span.queued = origin + start - ready
+                spans[name] = span
+            done[name].set()
+
+        tasks = [asyncio.ensure_future(run(name)) for name in self.order]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        elapsed = time.perf_counter() - origin
+        if tracer is not None:
+            # performance/tracing.py: one span per node under the run
+            root = tracer.record("graph", origin, origin + elapsed)
+            for span in spans.values():
+                tracer.record(
+                    span.node,
+                    origin + span.start,
+                    origin + span.end,
+                    parent=root,
+                    queued=span.queued,
+                    retries=span.attempts - span.loops,
+                )
+        return RunResult(
+            state, spans, elapsed, self.critical_path(spans), interrupts
+        )
+
+    async def _run_node(self, node: Node, state, start, save) -> Span:
+        span = Span(node.name, start, start, attempts=0, loops=0)
+        if node.when is not None and not node.when(state):
+            span.skipped = True
+            save(node.name, None, finished=True)
+            return span
+        while True:
+            update = await self._attempt(node, state, span)
+            self.merge(state, update)
+            span.loops += 1
+            finished = node.until is None or node.until(state)
+            save(node.name, update, finished)
+            if finished:
+                return span
+            if span.loops >= node.max_loops:
+                raise NodeError(node.name, "max_loops reached")
+
+    async def _attempt(self, node, state, span):
+        for attempt in range(node.retries + 1):
+            span.attempts += 1
+            try:
+                return await node.fn(state)
+            except Interrupt:
+                raise
+            except Exception as e:
+                if attempt == node.retries:
+                    raise NodeError(node.name, e) from e
+                await asyncio.sleep(node.backoff * 2**attempt)
+
+    def merge(self, state: dict, update: dict | None):
+        for key, value in (update or {}).items():
+            reducer = self.reducers.get(key)
+            if reducer is not None and key in state:
+                state[key] = reducer(state[key], value)
+            else:
+                state[key] = value
+
+    def critical_path(self, spans: dict[str, Span]) -> list[str]:
+        if not spans:
+            return []
+        node = max(spans.values(), key=lambda s: s.end).node
+        path = [node]
+        # nodes restored from a checkpoint have no span
+        while deps := [d for d in self.deps[node] if d in spans]:
+            node = max(deps, key=lambda d: spans[d].end)
+            path.append(node)
+        return path[::-1]
+
+
+def _topological_order(deps: dict[str, set[str]]) -> list[str]:
+    order, remaining = [], {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise GraphError(f"cycle between {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+            order.append(name)
+        for d in remaining.values():
+            d.difference_update(ready)
+    return order
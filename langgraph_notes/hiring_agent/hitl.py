@@ -0,0 +1,436 @@
+"""
+* Problem: Waiting for a human
+    > 2_what.py: "Can I post this JD?", approval before rejecting candidates or sending an offer. The human
+      answers in minutes, or days.
+    > Naive: the agent waits inside its worker (input(), event.wait()) → one parked thread per waiting agent,
+      holding its stack, the whole run state and everything the run had open. 10k waiting goals = 10k threads
+      doing nothing.
+
+* Suspend / Resume
+    > The node calls interrupt(state, "post_jd", "Can I post this JD?") (graph.py). The run returns with
+      run.interrupts, every node that finished is already in the checkpoint store (delta checkpoints,
+      checkpoint.py).
+    > The question goes into an `approvals` table of the same SQLite file and the run leaves nothing behind in
+      the process: no task, no thread, no state (checkpointer.release drops the cached step counter of every
+      paused, finished or failed run). A paused run costs disk, not memory.
+    > approve(thread_id, {"post_jd": True}) writes the answer into the question's row, nothing is kept in
+      memory. Workers poll the db for answered rows and claim a thread (a lease, so two workers - or two
+      processes opening the same db - never resume it twice, and a claim of a crashed worker expires). A second
+      answer to a claimed thread (a double click) keeps the lease: the thread is not claimable again until
+      the worker is done.
+    > The worker loads the state (snapshot + deltas), adds the answer and runs the graph again: completed nodes
+      are skipped, the paused node runs again and interrupt() now returns the answer. The row is deleted only
+      after the resumed run is checkpointed, and only if it still holds the answer the worker claimed (every
+      answer bumps a version) → a crash at any point loses no approval, and an answer that came in during
+      the resume is resumed next. A thread without a checkpoint can not be resumed (GraphError).
+    > A resumed run that fails is marked in its row (inbox.failed()) and reported to on_error; the worker
+      goes on with the next thread.
+
+? Usage
+    runtime = HITLRuntime(build_hiring_graph(tools, hitl=True).compile(), "hiring.db")
+    run = await runtime.start("hire-backend-1", GOAL)        # paused: run.interrupts[0].question
+    runtime.approve("hire-backend-1", {"post_jd": True})     # later, from the approval UI
+    await runtime.serve()                                    # workers poll for and resume approved runs
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+from checkpoint import DeltaCheckpointer
+from graph import CompiledGraph, Interrupt, RunResult
+
+
+class ApprovalInbox:
+    # open questions of paused runs, shown to the human
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # answer IS NULL: still open, claimed: a worker is resuming it,
+        # error: the resumed run failed, kept for a human to look at,
+        # version: bumped by every answer
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS approvals ("
+            "thread_id TEXT, key TEXT, node TEXT, question TEXT,"
+            " payload TEXT, created REAL, answer TEXT, claimed REAL,"
+            " error TEXT, version INTEGER DEFAULT 0,"
+            " PRIMARY KEY (thread_id, key))"
+        )
+
+    def add(self, thread_id: str, interrupts: list[Interrupt]):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO approvals VALUES"
+            " (?, ?, ?, ?, ?, ?, NULL, NULL, NULL, 0)",
+            [
+                (
+                    thread_id,
+                    pause.key,
+                    pause.node,
+                    pause.question,
+                    json.dumps(pause.payload),
+                    time.time(),
+                )
+                for pause in interrupts
+            ],
+        )
+        self._db.commit()
+
+    def pending(self, limit: int = 100) -> list[dict]:
+        rows = self._db.execute(
+            "SELECT thread_id, key, node, question, payload FROM approvals"
+            " WHERE answer IS NULL ORDER BY created LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [
+            {
+                "thread_id": thread_id,
+                "key": key,
+                "node": node,
+                "question": question,
+                "payload": json.loads(payload),
+            }
+            for thread_id, key, node, question, payload in rows
+        ]
+
+    def answer(self, thread_id: str, answers: dict):
+        self._db.executemany(
+            # a running claim is kept: the worker resuming the thread now
+            # leaves the newer answer for the next claim (done())
+            "INSERT INTO approvals (thread_id, key, created, answer, version)"
+            " VALUES (?, ?, ?, ?, 1) ON CONFLICT (thread_id, key)"
+            " DO UPDATE SET answer = excluded.answer, error = NULL,"
+            " version = version + 1",
+            [
+                (thread_id, key, time.time(), json.dumps(value))
+                for key, value in answers.items()
+            ],
+        )
+        self._db.commit()
+
+    def claim(self, lease: float) -> tuple[str, dict, dict] | None:
+        # one answered thread that no live worker is resuming
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT thread_id FROM approvals AS a"
+                " WHERE answer IS NOT NULL AND error IS NULL"
+                " AND NOT EXISTS (SELECT 1 FROM approvals AS b"
+                " WHERE b.thread_id = a.thread_id AND b.claimed >= ?)"
+                " LIMIT 1",
+                (now - lease,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE approvals SET claimed = ?"
+                " WHERE thread_id = ? AND answer IS NOT NULL",
+                (now, row[0]),
+            )
+            answers = self._db.execute(
+                "SELECT key, answer, version FROM approvals"
+                " WHERE thread_id = ? AND answer IS NOT NULL",
+                (row[0],),
+            ).fetchall()
+        return (
+            row[0],
+            {key: json.loads(value) for key, value, _ in answers},
+            {key: version for key, _, version in answers},
+        )
+
+    def done(self, thread_id: str, versions: dict):
+        # only the answers that were resumed, a newer one stays (unclaimed)
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM approvals WHERE thread_id = ? AND key = ?"
+                " AND version = ?",
+                [(thread_id, key, v) for key, v in versions.items()],
+            )
+            self._db.execute(
+                "UPDATE approvals SET claimed = NULL WHERE thread_id = ?",
+                (thread_id,),
+            )
+
+    def fail(self, thread_id: str, keys, error: Exception):
+        self._db.executemany(
+            "UPDATE approvals SET error = ? WHERE thread_id = ? AND key = ?",
+            [(repr(error), thread_id, key) for key in keys],
+        )
+        self._db.commit()
+
+    def failed(self) -> list[tuple[str, str, str]]:
+        return self._db.execute(
+            "SELECT thread_id, key, error FROM approvals"
+            " WHERE error IS NOT NULL"
+        ).fetchall()
+
+    def answered(self) -> int:
+        # answered, not yet resumed (failed resumes excluded)
+        return self._db.execute(
+            "SELECT COUNT(*) FROM approvals"
+            " WHERE answer IS NOT NULL AND error IS NULL"
+        ).fetchone()[0]
+
+    def __len__(self):
+        return self._db.execute(
+            "SELECT COUNT(*) FROM approvals WHERE answer IS NULL"
+        ).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class HITLRuntime:
+
+    def __init__(
+        self,
+        app: CompiledGraph,
+        path: str,
+        workers: int = 4,
+        snapshot_every: int = 500,
+        on_result: Callable[[str, RunResult], None] | None = None,
+        on_error: Callable[[str, Exception], None] | None = None,
+        poll_interval: float = 0.01,
+        lease: float = 300.0,
+    ):
+        self.app = app
+        self.checkpointer = DeltaCheckpointer(path, snapshot_every)
+        self.inbox = ApprovalInbox(path)
+        self.workers = workers
+        self.on_result = on_result
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self.lease = lease
+
+    async def start(self, thread_id: str, state: dict) -> RunResult:
+        return await self._run(thread_id, state)
+
+    async def _run(self, thread_id, state, resume=None) -> RunResult:
+        try:
+            run = await self.app.arun(
+                state,
+                checkpointer=self.checkpointer,
+                thread_id=thread_id,
+                resume=resume,
+            )
+        finally:
+            # paused, finished or failed: nothing of the run stays in memory
+            self.checkpointer.release(thread_id)
+        if run.paused:
+            self.inbox.add(thread_id, run.interrupts)
+        return run
+
+    def approve(self, thread_id: str, answers: dict):
+        self.inbox.answer(thread_id, answers)
+
+    async def serve(self):
+        # until cancelled; join() waits until every answer is resumed
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+
+    async def join(self):
+        while self.inbox.answered():
+            await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self):
+        while True:
+            claimed = self.inbox.claim(self.lease)
+            if claimed is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            thread_id, answers, versions = claimed
+            try:
+                run = await self._run(thread_id, {}, resume=answers)
+            except Exception as e:
+                # one failing run must not stop the worker (or serve())
+                self.inbox.fail(thread_id, answers, e)
+                if self.on_error is not None:
+                    self.on_error(thread_id, e)
+                continue
+            self.inbox.done(thread_id, versions)
+            if self.on_result is not None:
+                self.on_result(thread_id, run)
+
+    def close(self):
+        self.checkpointer.close()
+        self.inbox.close()
+
+
+if __name__ == "__main__":
+    import gc
+    import os
+    import shutil
+    import statistics
+    import tempfile
+    import tracemalloc
+
+    from stand_in_tools import LATENCY, HiringTools
+    from workflow import GOAL, build_hiring_graph
+
+    def rss_mb():
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS"):
+                    return int(line.split()[1]) / 1024
+
+    # tool latency off: measure the runtime, not the stand-in APIs
+    tools = HiringTools(
+        latency={tool: 0 for tool in LATENCY}, calendar_failure_every=0
+    )
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hitl.db")
+
+    async def main():
+        app = build_hiring_graph(tools, hitl=True).compile()
+
+        # --------------------------------------
+        # naive: a parked thread per waiting agent
+        # --------------------------------------
+        parked, events = 1000, []
+        sample = (await app.arun(GOAL)).state  # state at "Can I post this JD?"
+        gc.collect()
+        before = rss_mb()
+
+        def wait_for_human(state, event):
+            event.wait()
+
+        for i in range(parked):
+            event = threading.Event()
+            events.append(event)
+            state = json.loads(json.dumps(sample))
+            threading.Thread(
+                target=wait_for_human, args=(state, event)
+            ).start()
+        print(
+            f"parked threads   | {parked:6d} waiting runs | "
+            f"{threading.active_count() - 1:6d} threads | "
+            f"{(rss_mb() - before) * 1024 / parked:6.1f} KB RSS per run"
+        )
+        for event in events:
+            event.set()
+
+        # --------------------------------------
+        # suspend: 10k paused runs
+        # --------------------------------------
+        # memory kept by paused runs: Python objects still alive after
+        # the run returned (tracemalloc) and process RSS after warm-up
+        runtime = HITLRuntime(app, path)
+        gc.collect()
+        tracemalloc.start()
+        heap, rss, start = (
+            tracemalloc.get_traced_memory()[0],
+            0,
+            time.perf_counter(),
+        )
+        total, chunk = 10_000, 500
+        for first in range(0, total, chunk):
+            runs = await asyncio.gather(
+                *(
+                    runtime.start(f"goal-{i}", GOAL)
+                    for i in range(first, first + chunk)
+                )
+            )
+            assert all(run.paused for run in runs)
+            if first + chunk == 2500:
+                rss = rss_mb()
+            if first + chunk in (2500, 5000, 10_000):
+                gc.collect()
+                paused = first + chunk
+                kept = tracemalloc.get_traced_memory()[0] - heap
+                print(
+                    f"suspended        | {paused:6d} paused runs  | "
+                    f"{threading.active_count() - 1:6d} threads | "
+                    f"{len(asyncio.all_tasks()) - 1:3d} tasks | "
+                    f"heap kept {kept / 2**20:4.1f} MB | RSS since 2500 "
+                    f"+{rss_mb() - rss:4.1f} MB"
+                )
+        tracemalloc.stop()
+        started = time.perf_counter() - start
+        db_bytes = sum(
+            os.path.getsize(os.path.join(directory, f))
+            for f in os.listdir(directory)
+        )
+        print(
+            f"{total} runs started and paused in {started:.1f} s, inbox: "
+            f"{len(runtime.inbox)} open questions, e.g. "
+            f"{runtime.inbox.pending(1)[0]['question']!r}, on disk "
+            f"{db_bytes / total:.0f} B/run"
+        )
+        # an answer outlives the process: the JD of goal-9999 is declined,
+        # then the process "dies" before any worker has resumed it
+        runtime.approve("goal-9999", {"post_jd": False})
+        runtime.close()
+
+        # --------------------------------------
+        # approvals arrive, a NEW runtime (= another worker) resumes
+        # --------------------------------------
+        approved_at, latencies, results = {}, [], {}
+
+        def on_result(thread_id, run):
+            if thread_id in approved_at:
+                latencies.append(time.perf_counter() - approved_at[thread_id])
+            results[thread_id] = run
+
+        app = build_hiring_graph(tools, hitl=True).compile()
+        runtime = HITLRuntime(
+            app,
+            path,
+            workers=4,
+            on_result=on_result,
+            on_error=lambda thread_id, e: print(f"{thread_id} failed: {e}"),
+        )
+        workers = asyncio.ensure_future(runtime.serve())
+        # an answer for a thread without a checkpoint: the resumed run
+        # fails, the worker reports it and goes on
+        runtime.approve("no-such-goal", {"post_jd": True})
+        resumed = 1000
+        for i in range(resumed):
+            approved_at[f"goal-{i}"] = time.perf_counter()
+            runtime.approve(f"goal-{i}", {"post_jd": True})
+            await asyncio.sleep(0.005)  # a human clicks every 5 ms
+        await runtime.join()
+        declined = results["goal-9999"].state
+        assert declined["status"] == "JD declined", declined["status"]
+        assert declined["posted_on"] == [] and not runtime.inbox.answered()
+        assert [row[0] for row in runtime.inbox.failed()] == ["no-such-goal"]
+        assert not runtime.checkpointer._steps  # finished runs released too
+        latencies.sort()
+        paused_at = {r.interrupts[0].key for r in results.values() if r.paused}
+        print(
+            f"resume after approval | {resumed} runs | p50 "
+            f"{statistics.median(latencies) * 1e3:5.1f} ms, p99 "
+            f"{latencies[int(0.99 * resumed)] * 1e3:5.1f} ms (rest of the "
+            f"graph until the next question: {paused_at})\n"
+            f"declined before the restart, resumed after it: goal-9999 "
+            f"{declined['status']!r}, posted on {declined['posted_on']}"
+        )
+        # a double click while a worker resumes the thread: no second
+        # claim, the newer answer is claimed once the first one is done
+        inbox = runtime.inbox
+        inbox.answer("double-click", {"offer": True})
+        thread_id, _, versions = inbox.claim(lease=300)
+        inbox.answer("double-click", {"offer": False, "post_jd": True})
+        assert inbox.claim(lease=300) is None
+        inbox.done(thread_id, versions)
+        _, answers, versions = inbox.claim(lease=300)
+        assert answers == {"offer": False, "post_jd": True}, answers
+        inbox.done(thread_id, versions)
+
+        approved_at["goal-0"] = time.perf_counter()
+        runtime.approve("goal-0", {"offer": True})
+        await runtime.join()
+        state = results["goal-0"].state
+        print(
+            f"goal-0 after the offer approval: {state['status']} to "
+            f"{state['offer']}, employee {state['employee_id']}, still open: "
+            f"{len(runtime.inbox)}"
+        )
+        workers.cancel()
+        runtime.close()
+
+    asyncio.run(main())
+    shutil.rmtree(directory)
@@ -0,0 +1,487 @@
+"""
+* Planning from 2_what.py, one step after another
+    Step 1: generate candidate plans (Plan A: job boards, Plan B: referrals / agencies)
+    Step 2: evaluate each plan (efficiency, tool availability, cost, risk, alignment with constraints)
+    Step 3: select the best plan → only now the first action starts
+    > Done literally: one LLM call per plan + one LLM critique per plan, all in sequence. The agent sits idle
+      for seconds before it does anything.
+
+* Speculative Parallel Planning
+    > One LLM call returns all N candidate plans as JSON (one round trip instead of N).
+    > Cheap Heuristics First: every plan is scored by local functions (efficiency, cost, risk, alignment)
+      + an async tool availability check (cached per tool), all plans at the same time (as_completed).
+      The LLM critique only looks at the `critique_top` best plans, concurrently.
+    > Speculation: the moment a plan is the best scored so far, its first SAFE steps start (steps without
+      side effects: drafting the JD, reading profiles). Safe is decided HERE, by an allowlist of read-only
+      tools (READ_ONLY_TOOLS); the "safe" flag the LLM writes into its plan can only narrow it → posting a job
+      or sending a mail is never speculative, whatever the plan says.
+        - a better plan finishes scoring → the running speculation is cancelled, the new leader starts
+        - the critique overturns the leader → same, counted in `wasted_steps`
+        - the leader wins → its finished steps are reused, the rest of the plan continues from there
+    > Time To First Action: time from the goal until the first step of the chosen plan started.
+
+? Usage
+    planner = SpeculativePlanner(tools.llm, execute, available=check_tool)
+    result = asyncio.run(planner.run(GOAL))
+    print(result.plan.name, result.first_action, result.wasted_steps)
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Awaitable, Callable
+
+PLAN_PROMPT = """Goal: {goal}
+Constraints: {constraints}
+Write {n} different plans to reach the goal as a JSON list. Every plan:
+{{"name": str, "channels": [str], "premium": bool, "remote_ok": bool,
+  "expected_days": int, "steps": [{{"action": str, "tool": str, "safe": bool}}]}}
+"safe" is true only for steps without side effects (drafting, reading)."""
+
+CRITIQUE_PROMPT = """Goal: {goal}
+Constraints: {constraints}
+Plan: {plan}
+How good is this plan? Answer with one number between 0 and 1."""
+
+# tools without side effects: the only ones a speculative step may use
+READ_ONLY_TOOLS = frozenset(
+    {"llm", "linkedin", "resume_parser", "applications"}
+)
+
+# "Favor low-cost channels first" as a pre-programmed policy
+WEIGHTS = {
+    "efficiency": 1.0,
+    "availability": 2.0,
+    "cost": 1.5,
+    "risk": 1.0,
+    "alignment": 2.0,
+}
+
+
+@dataclass
+class Step:
+    action: str
+    tool: str
+    safe: bool = False
+
+
+@dataclass
+class Plan:
+    name: str
+    steps: list[Step]
+    channels: list[str] = field(default_factory=list)
+    premium: bool = False
+    remote_ok: bool = True
+    expected_days: int = 14
+
+    def describe(self) -> str:
+        return f"{self.name}: " + " -> ".join(s.action for s in self.steps)
+
+
+@dataclass
+class PlanResult:
+    plan: Plan
+    scores: dict[str, dict]
+    results: list
+    first_action: float
+    elapsed: float
+    wasted_steps: int = 0
+    switches: int = 0
+
+
+def _known(cls, item: dict) -> dict:
+    # the LLM adds keys of its own ("rationale", "owner", ...)
+    names = {f.name for f in fields(cls)}
+    return {k: v for k, v in item.items() if k in names}
+
+
+def parse_plans(text: str) -> list[Plan]:
+    plans = []
+    for item in json.loads(text):
+        steps = [Step(**_known(Step, step)) for step in item.get("steps", [])]
+        plans.append(Plan(**_known(Plan, item) | {"steps": steps}))
+    return plans
+
+
+def heuristics(plan: Plan, constraints: dict) -> dict[str, float]:
+    return {
+        "efficiency": 1 / (1 + plan.expected_days / 7),
+        "cost": 0.3 if plan.premium else 1.0,
+        # one channel: high risk of getting no applicants
+        "risk": 1 - 0.5 ** len(plan.channels),
+        "alignment": (
+            1.0 if plan.remote_ok or not constraints.get("remote") else 0.2
+        ),
+    }
+
+
+def weighted(scores: dict[str, float], weights=WEIGHTS) -> float:
+    total = sum(weights[k] for k in scores)
+    return sum(weights[k] * v for k, v in scores.items()) / total
+
+
+class _Speculation:
+    # runs the safe prefix of a plan until it is cancelled or confirmed
+
+    def __init__(self, plan: Plan, execute, origin: float, read_only):
+        self.plan = plan
+        self.read_only = read_only
+        self.results = []
+        self.started: float | None = None
+        self._execute = execute
+        self._origin = origin
+        self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        for step in self.plan.steps:
+            # the LLM's "safe" is a hint, the allowlist decides
+            if not (step.safe and step.tool in self.read_only):
+                return
+            if self.started is None:
+                self.started = time.perf_counter() - self._origin
+            self.results.append(await self._execute(step))
+
+    def cancel(self) -> int:
+        # steps finished or running for nothing
+        running = self.started is not None and not self.task.done()
+        self.task.cancel()
+        return len(self.results) + running
+
+
+class SpeculativePlanner:
+
+    def __init__(
+        self,
+        llm: Callable[[str], Awaitable[str]],
+        execute: Callable[[Step], Awaitable[Any]],
+        available: Callable[[str], Awaitable[bool]] | None = None,
+        n_plans: int = 4,
+        critique_top: int = 2,
+        critique_weight: float = 0.5,
+        weights: dict[str, float] | None = None,
+        read_only_tools=READ_ONLY_TOOLS,
+    ):
+        self.llm = llm
+        self.execute = execute
+        self.available = available
+        self.n_plans = n_plans
+        self.critique_top = critique_top
+        self.critique_weight = critique_weight
+        self.weights = weights or WEIGHTS
+        self.read_only_tools = frozenset(read_only_tools)
+
+    async def _tool_available(self, tool: str, checks: dict) -> bool:
+        if self.available is None:
+            return True
+        # one check per tool and run, shared by all plans using it
+        if tool not in checks:
+            checks[tool] = asyncio.ensure_future(self.available(tool))
+        return await checks[tool]
+
+    async def score(
+        self, plan: Plan, constraints: dict, checks: dict | None = None
+    ) -> dict:
+        scores = heuristics(plan, constraints)
+        tools = {step.tool for step in plan.steps}
+        checks = {} if checks is None else checks
+        ok = await asyncio.gather(
+            *(self._tool_available(tool, checks) for tool in tools)
+        )
+        # a plan without steps reaches nothing
+        scores["availability"] = sum(ok) / len(ok) if ok else 0.0
+        scores["heuristic"] = weighted(scores, self.weights)
+        return scores
+
+    async def critique(self, plan: Plan, goal: dict) -> float | None:
+        text = await self.llm(
+            CRITIQUE_PROMPT.format(
+                goal=goal["main_goal"],
+                constraints=json.dumps(goal.get("constraints", {})),
+                plan=plan.describe(),
+            )
+        )
+        try:
+            return min(1.0, max(0.0, float(text.strip())))
+        except ValueError:
+            return None
+
+    async def run(self, goal: dict) -> PlanResult:
+        origin = time.perf_counter()
+        constraints = goal.get("constraints", {})
+        plans = parse_plans(
+            await self.llm(
+                PLAN_PROMPT.format(
+                    goal=goal["main_goal"],
+                    constraints=json.dumps(constraints),
+                    n=self.n_plans,
+                )
+            )
+        )
+        by_name = {plan.name: plan for plan in plans}
+        scores: dict[str, dict] = {}
+        speculation, wasted, switches = None, 0, 0
+        cancelled = []
+        availability = {}  # this run's tool checks, not kept afterwards
+
+        def lead(plan):
+            nonlocal speculation, wasted, switches
+            if speculation is not None and speculation.plan is plan:
+                return
+            if speculation is not None:
+                wasted += speculation.cancel()
+                cancelled.append(speculation.task)
+                switches += 1
+            speculation = _Speculation(
+                plan, self.execute, origin, self.read_only_tools
+            )
+
+        async def scored(plan):
+            return plan, await self.score(plan, constraints, availability)
+
+        # Step 2 with heuristics: the best plan so far starts right away
+        for next_scored in asyncio.as_completed(map(scored, plans)):
+            plan, plan_scores = await next_scored
+            scores[plan.name] = plan_scores
+            best = max(scores, key=lambda n: scores[n]["heuristic"])
+            lead(by_name[best])
+
+        # LLM critique of the best few, the leader keeps running meanwhile
+        ranked = sorted(scores, key=lambda n: -scores[n]["heuristic"])
+        top = ranked[: self.critique_top]
+        critiques = await asyncio.gather(
+            *(self.critique(by_name[name], goal) for name in top)
+        )
+        for plan_scores in scores.values():
+            plan_scores["total"] = plan_scores["heuristic"]
+        for name, critique in zip(top, critiques):
+            if critique is not None:
+                plan_scores = scores[name]
+                plan_scores["critique"] = critique
+                plan_scores["total"] = (
+                    1 - self.critique_weight
+                ) * plan_scores["heuristic"] + self.critique_weight * critique
+
+        # Step 3: commit to the winner, reuse what speculation already did
+        winner = by_name[max(scores, key=lambda n: scores[n]["total"])]
+        lead(winner)
+        await speculation.task
+        results = list(speculation.results)
+        first_action = speculation.started
+        for step in winner.steps[len(results) :]:
+            if first_action is None:
+                first_action = time.perf_counter() - origin
+            results.append(await self.execute(step))
+        # collect the cancelled speculations (a failed step is not "never
+        # retrieved")
+        await asyncio.gather(*cancelled, return_exceptions=True)
+        return PlanResult(
+            winner,
+            scores,
+            results,
+            first_action,
+            time.perf_counter() - origin,
+            wasted,
+            switches,
+        )
+
+
+if __name__ == "__main__":
+    from stand_in_tools import HiringTools
+    from workflow import GOAL
+
+    PLANS = [
+        {
+            "name": "Plan A: job boards",
+            "channels": ["LinkedIn", "Indeed", "AngelList"],
+            "premium": False,
+            "remote_ok": True,
+            "expected_days": 14,
+            "steps": [
+                {"action": "draft JD", "tool": "llm", "safe": True},
+                {
+                    "action": "draft screening rubric",
+                    "tool": "llm",
+                    "safe": True,
+                },
+                {"action": "post on LinkedIn", "tool": "job_board"},
+                {"action": "post on Indeed", "tool": "job_board"},
+                {"action": "post on AngelList", "tool": "job_board"},
+            ],
+        },
+        {
+            "name": "Plan B: referrals and agencies",
+            "channels": ["referrals", "agency"],
+            "premium": True,
+            "remote_ok": True,
+            "expected_days": 10,
+            "steps": [
+                {"action": "draft referral mail", "tool": "llm", "safe": True},
+                {
+                    "action": "read past hires on LinkedIn",
+                    "tool": "linkedin",
+                    "safe": True,
+                },
+                {"action": "mail employees", "tool": "mail"},
+                {"action": "brief hiring agency", "tool": "mail"},
+            ],
+        },
+        {
+            "name": "Plan C: promoted LinkedIn post",
+            "channels": ["LinkedIn"],
+            "premium": True,
+            "remote_ok": True,
+            "expected_days": 7,
+            "steps": [
+                {"action": "draft JD", "tool": "llm", "safe": True},
+                {"action": "buy LinkedIn promotion", "tool": "job_board"},
+            ],
+        },
+        {
+            "name": "Plan D: GitHub Jobs + office walk-ins",
+            "channels": ["GitHub Jobs", "walk-ins"],
+            "premium": False,
+            "remote_ok": False,
+            "expected_days": 21,
+            "steps": [
+                {"action": "draft JD", "tool": "llm", "safe": True},
+                {"action": "post on GitHub Jobs", "tool": "github_jobs"},
+            ],
+        },
+    ]
+
+    class PlanningLLM:
+        # stand-in: latency grows with the length of the answer
+
+        def __init__(self, critiques: dict[str, float]):
+            self.critiques = critiques
+            self.calls = 0
+            self.generated = 0
+
+        async def __call__(self, prompt: str) -> str:
+            self.calls += 1
+            if prompt.startswith("Goal:") and "Plan:" in prompt:
+                await asyncio.sleep(0.3)
+                plan = prompt.split("Plan: ")[1].split(":")[0]
+                return str(self.critiques[plan])
+            n = int(prompt.split("Write ")[1].split()[0])
+            await asyncio.sleep(0.3 + 0.1 * n)
+            plans = PLANS[self.generated : self.generated + n]
+            self.generated = (self.generated + n) % len(PLANS)
+            return json.dumps(plans)
+
+    def executor(tools):
+        async def execute(step: Step):
+            if step.tool == "llm":
+                return await tools.llm(step.action)
+            if step.tool == "job_board":
+                return await tools.post_job(step.action.split()[-1], "JD")
+            if step.tool == "linkedin":
+                return await tools.linkedin_profile("past hires")
+            return await tools.send_mail("team", step.action)
+
+        return execute
+
+    async def available(tool):
+        # health check of the tool's API
+        await asyncio.sleep({"llm": 0.02, "mail": 0.04}.get(tool, 0.08))
+        return tool != "github_jobs"
+
+    async def sequential(llm, execute, goal, n=4):
+        # 2_what.py literally: plan by plan, evaluate one after another
+        origin = time.perf_counter()
+        scorer = SpeculativePlanner(llm, execute, available)
+        plans = []
+        for _ in range(n):
+            prompt = PLAN_PROMPT.format(
+                goal=goal["main_goal"],
+                constraints=json.dumps(goal["constraints"]),
+                n=1,
+            )
+            plans += parse_plans(await llm(prompt))
+        totals = {}
+        for plan in plans:
+            scores = heuristics(plan, goal["constraints"])
+            checks = []
+            for tool in {step.tool for step in plan.steps}:
+                checks.append(await available(tool))
+            scores["availability"] = sum(checks) / len(checks) if checks else 0
+            critique = await scorer.critique(plan, goal)
+            totals[plan.name] = (
+                0.5 * weighted(scores) + 0.5 * critique,
+                plan,
+            )
+        winner = max(totals.values(), key=lambda t: t[0])[1]
+        first_action = time.perf_counter() - origin
+        for step in winner.steps:
+            await execute(step)
+        return winner, first_action, time.perf_counter() - origin
+
+    async def main():
+        # extra keys from the LLM are ignored, a plan without steps scores
+        [plan] = parse_plans(
+            '[{"name": "Plan E", "rationale": "cheap", "steps": []}]'
+        )
+        scores = await SpeculativePlanner(None, None, available).score(
+            plan, GOAL["constraints"]
+        )
+        assert plan.steps == [] and scores["availability"] == 0.0
+
+        # a plan calling post_job "safe" does not make it speculative
+        ran = []
+
+        async def record(step):
+            ran.append(step.tool)
+
+        risky = Plan(
+            "Plan F",
+            [Step("draft JD", "llm", True), Step("post", "job_board", True)],
+        )
+        speculation = _Speculation(
+            risky, record, time.perf_counter(), READ_ONLY_TOOLS
+        )
+        await speculation.task
+        assert ran == ["llm"], ran
+
+        scenarios = {
+            "critique agrees": {
+                "Plan A": 0.8,
+                "Plan B": 0.6,
+                "Plan C": 0.5,
+                "Plan D": 0.2,
+            },
+            "critique overturns": {
+                "Plan A": 0.3,
+                "Plan B": 0.95,
+                "Plan C": 0.5,
+                "Plan D": 0.2,
+            },
+        }
+        for scenario, critiques in scenarios.items():
+            print(f"--- {scenario} ---")
+            llm = PlanningLLM(critiques)
+            plan, first, total = await sequential(
+                llm, executor(HiringTools()), GOAL
+            )
+            print(
+                f"sequential  | first action {first:5.2f} s | plan done "
+                f"{total:5.2f} s | {llm.calls} LLM calls | {plan.name}"
+            )
+            llm = PlanningLLM(critiques)
+            planner = SpeculativePlanner(
+                llm, executor(HiringTools()), available
+            )
+            result = await planner.run(GOAL)
+            print(
+                f"speculative | first action {result.first_action:5.2f} s | "
+                f"plan done {result.elapsed:5.2f} s | {llm.calls} LLM calls | "
+                f"{result.plan.name} | switches {result.switches}, "
+                f"wasted steps {result.wasted_steps}"
+            )
+            for name, scores in result.scores.items():
+                print(
+                    f"    {name:38s} heuristic {scores['heuristic']:.2f} "
+                    f"critique {scores.get('critique', float('nan')):.2f}"
+                )
+
+    asyncio.run(main())
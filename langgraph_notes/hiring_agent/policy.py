@@ -0,0 +1,417 @@
+"""
+* Supervisor guardrails from 2_what.py
+    > "never schedule interviews on weekends", "do not send offer without explicit user approval",
+      "never use platforms that require paid ads unless approved".
+    > Checked before EVERY tool call. Done naively (a Python loop over all rules, each rule testing its
+      conditions) the cost grows with the number of rules: 1k rules = 1k rule checks per agent step.
+
+* Declarative Rules
+    {"id": "no-weekend-interviews", "tool": "find_slot", "when": {"day": {"in": ["Sat", "Sun"]}},
+     "decision": "deny", "reason": "never schedule interviews on weekends"}
+    > tool: a tool name or "*" (every tool). when: {argument: condition}, all conditions must hold.
+    > condition: a value (==), {"in": [...]}, {"not_in": [...]}, {"gt"/"ge"/"lt"/"le": number} (combinable).
+    > decision: "deny" > "needs_approval" > "allow". The strongest matching rule wins, then the earlier rule.
+      No matching rule → Policy(default="allow").
+
+* Compiled Policy (policy.compile())
+    > Rules become bits of a Python int, ordered by precedence → the lowest set bit is the decision.
+    > Index per tool: every argument used by a rule of that tool has
+        - exact: value → bitmask of the rules this value satisfies (rules not constraining the argument always
+          set), default mask for values no rule mentions (only "not_in" rules are satisfied by those)
+        - ranges: the sorted boundaries of all numeric conditions cut the number line into slots, one
+          precomputed mask per slot → bisect + lookup
+    > decide(tool, args) = one dict lookup per constrained argument + AND of the masks. The number of rules
+      only changes the width of the int, not the number of steps.
+    > enforce(state, tool, args) for graph nodes: deny → PolicyViolation, needs_approval → interrupt(state, ...)
+      (graph.py): the run pauses until a human answers (hitl.py).
+
+? Usage
+    policy = Policy(GUARDRAILS).compile()
+    policy.decide("find_slot", {"candidate": "indeed-23", "day": "Sat"})   # Decision("deny", ...)
+    policy.enforce(state, "send_mail", {"kind": "offer", "to": best})      # in a node
+"""
+
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from graph import interrupt
+
+PRECEDENCE = {"deny": 0, "needs_approval": 1, "allow": 2}
+RANGE_OPS = {
+    "gt": lambda value, bound: value > bound,
+    "ge": lambda value, bound: value >= bound,
+    "lt": lambda value, bound: value < bound,
+    "le": lambda value, bound: value <= bound,
+}
+
+GUARDRAILS = [
+    {
+        "id": "no-weekend-interviews",
+        "tool": "find_slot",
+        "when": {"day": {"in": ["Sat", "Sun"]}},
+        "decision": "deny",
+        "reason": "never schedule interviews on weekends",
+    },
+    {
+        "id": "offer-needs-approval",
+        "tool": "send_mail",
+        "when": {"kind": "offer", "approved": {"not_in": [True]}},
+        "decision": "needs_approval",
+        "reason": "do not send offer without explicit user approval",
+    },
+    {
+        "id": "paid-ads-need-approval",
+        "tool": "post_job",
+        "when": {"paid": True, "approved": {"not_in": [True]}},
+        "decision": "needs_approval",
+        "reason": "never use platforms that require paid ads unless approved",
+    },
+]
+
+
+class PolicyViolation(PermissionError):
+
+    def __init__(self, decision: "Decision"):
+        super().__init__(f"{decision.rule}: {decision.reason}")
+        self.decision = decision
+
+
+@dataclass(frozen=True)
+class Decision:
+    decision: str
+    rule: str | None = None
+    reason: str = ""
+
+    @property
+    def allowed(self) -> bool:
+        return self.decision == "allow"
+
+
+@dataclass
+class Rule:
+    id: str
+    tool: str
+    when: dict = field(default_factory=dict)
+    decision: str = "deny"
+    reason: str = ""
+
+    def __post_init__(self):
+        if self.decision not in PRECEDENCE:
+            raise ValueError(f"{self.id}: unknown decision {self.decision!r}")
+        self.tests = {attr: _test(cond) for attr, cond in self.when.items()}
+
+    def matches(self, tool: str, args: dict) -> bool:
+        if self.tool != "*" and self.tool != tool:
+            return False
+        return all(test(args.get(a)) for a, test in self.tests.items())
+
+
+def _is_range(cond) -> bool:
+    return isinstance(cond, dict) and cond.keys() <= RANGE_OPS.keys()
+
+
+def _test(cond) -> Callable[[Any], bool]:
+    if _is_range(cond):
+        ops = [(RANGE_OPS[op], bound) for op, bound in cond.items()]
+
+        def in_range(value):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return False
+            return all(op(value, bound) for op, bound in ops)
+
+        return in_range
+    if isinstance(cond, dict) and "in" in cond:
+        allowed = set(cond["in"])
+        return lambda value: _hashable(value) and value in allowed
+    if isinstance(cond, dict) and "not_in" in cond:
+        excluded = set(cond["not_in"])
+        return lambda value: not (_hashable(value) and value in excluded)
+    return lambda value: value == cond
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class Policy:
+    # the rules as written + the naive check (one rule after another)
+
+    def __init__(self, rules=(), default: str = "allow"):
+        self.default = Decision(default)
+        self.rules: list[Rule] = []
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: dict | Rule):
+        rule = rule if isinstance(rule, Rule) else Rule(**rule)
+        self.rules.append(rule)
+        # stable: the earlier rule wins between equal decisions
+        self.rules.sort(key=lambda r: PRECEDENCE[r.decision])
+
+    def decide(self, tool: str, args: dict) -> Decision:
+        for rule in self.rules:
+            if rule.matches(tool, args):
+                return Decision(rule.decision, rule.id, rule.reason)
+        return self.default
+
+    def compile(self) -> "CompiledPolicy":
+        return CompiledPolicy(self.rules, self.default)
+
+
+class _Attribute:
+    __slots__ = ("name", "exact", "default", "points", "slots", "no_number")
+
+    def __init__(self, name, rules, bits):
+        self.name = name
+        discrete = [
+            i
+            for i in bits
+            if name in rules[i].when and not _is_range(rules[i].when[name])
+        ]
+        ranged = [
+            i
+            for i in bits
+            if name in rules[i].when and _is_range(rules[i].when[name])
+        ]
+        free = sum(1 << i for i in bits) & ~sum(1 << i for i in discrete)
+        free &= ~sum(1 << i for i in ranged)
+        # discrete conditions: range rules count as satisfied here
+        values = set()
+        for i in discrete:
+            cond = rules[i].when[name]
+            listed = (
+                cond.get("in", cond.get("not_in"))
+                if isinstance(cond, dict)
+                else [cond]
+            )
+            values.update(v for v in listed if _hashable(v))
+        base = free | sum(1 << i for i in ranged)
+        unlisted = object()
+        self.default = base | _mask(rules, discrete, name, unlisted)
+        self.exact = {
+            v: base | _mask(rules, discrete, name, v) for v in values
+        }
+        # numeric conditions: discrete rules count as satisfied here
+        self.points, self.slots = [], []
+        self.no_number = free | sum(1 << i for i in discrete)
+        if ranged:
+            self.points = sorted(
+                {b for i in ranged for b in rules[i].when[name].values()}
+            )
+            for rep in _representatives(self.points):
+                self.slots.append(
+                    self.no_number | _mask(rules, ranged, name, rep)
+                )
+
+    def mask(self, value) -> int:
+        try:
+            mask = self.exact.get(value, self.default)
+        except TypeError:  # unhashable argument
+            mask = self.default
+        if self.points:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                i = bisect.bisect_left(self.points, value)
+                at_point = i < len(self.points) and self.points[i] == value
+                mask &= self.slots[2 * i + at_point]
+            else:
+                mask &= self.no_number
+        return mask
+
+
+def _mask(rules, indexes, name, value) -> int:
+    return sum(1 << i for i in indexes if rules[i].tests[name](value))
+
+
+def _representatives(points):
+    # one value per slot: below p0, p0, between p0 and p1, p1, ..., above
+    reps = [points[0] - 1]
+    for i, point in enumerate(points):
+        reps.append(point)
+        upper = points[i + 1] if i + 1 < len(points) else point + 2
+        reps.append((point + upper) / 2)
+    return reps
+
+
+class CompiledPolicy:
+
+    def __init__(self, rules: list[Rule], default: Decision):
+        self.rules = rules
+        self.default = default
+        self.decisions = [Decision(r.decision, r.id, r.reason) for r in rules]
+        wildcard = [i for i, r in enumerate(rules) if r.tool == "*"]
+        tools = {r.tool for r in rules} - {"*"}
+        self._index = {
+            tool: self._build(
+                sorted(
+                    wildcard
+                    + [i for i, r in enumerate(rules) if r.tool == tool]
+                )
+            )
+            for tool in tools
+        }
+        self._wildcard = self._build(wildcard)
+
+    def _build(self, bits):
+        names = sorted({name for i in bits for name in self.rules[i].when})
+        return (
+            sum(1 << i for i in bits),
+            [_Attribute(name, self.rules, bits) for name in names],
+        )
+
+    def decide(self, tool: str, args: dict) -> Decision:
+        candidates, attributes = self._index.get(tool, self._wildcard)
+        for attribute in attributes:
+            candidates &= attribute.mask(args.get(attribute.name))
+            if not candidates:
+                break
+        if not candidates:
+            return self.default
+        return self.decisions[(candidates & -candidates).bit_length() - 1]
+
+    def enforce(self, state: dict, tool: str, args: dict) -> Decision:
+        decision = self.decide(tool, args)
+        if decision.decision == "deny":
+            raise PolicyViolation(decision)
+        if decision.decision == "needs_approval" and not interrupt(
+            state, f"{decision.rule}:{tool}", decision.reason, args
+        ):
+            raise PolicyViolation(decision)
+        return decision
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from graph import Interrupt
+
+    # --------------------------------------
+    # the guardrails of 2_what.py
+    # --------------------------------------
+    guardrails = Policy(GUARDRAILS).compile()
+    for tool, args in [
+        ("find_slot", {"candidate": "indeed-23", "day": "Sat"}),
+        ("find_slot", {"candidate": "indeed-23", "day": "Wed"}),
+        ("send_mail", {"kind": "offer", "to": "indeed-23"}),
+        ("send_mail", {"kind": "offer", "to": "indeed-23", "approved": True}),
+        ("post_job", {"board": "LinkedIn Premium", "paid": True}),
+        ("post_job", {"board": "Naukri", "paid": False}),
+    ]:
+        decision = guardrails.decide(tool, args)
+        print(
+            f"{tool:10s} {str(args):55s} → {decision.decision:15s} {decision.rule or ''}"
+        )
+
+    try:
+        guardrails.enforce({}, "send_mail", {"kind": "offer", "to": "x"})
+    except Interrupt as pause:
+        print(f"enforce() in a node → the run pauses: {pause.question!r}")
+
+    # --------------------------------------
+    # 1k rules: naive loop vs compiled index
+    # --------------------------------------
+    rng = random.Random(0)
+    TOOLS = [
+        "post_job",
+        "send_mail",
+        "find_slot",
+        "interview",
+        "create_hrm_record",
+        "linkedin_profile",
+        "parse_resume",
+        "poll_applications",
+        "llm",
+        "buy_promotion",
+        "call_agency",
+        "export_data",
+        "delete_record",
+        "update_salary",
+        "share_profile",
+        "book_room",
+        "order_laptop",
+        "grant_access",
+        "send_sms",
+        "schedule_reminder",
+    ]
+    DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    COUNTRIES = ["IN", "US", "DE", "LK", "BR", "SG", "GB", "CA"]
+    BOARDS = ["LinkedIn", "Indeed", "Naukri", "AngelList", "Monster", "Dice"]
+
+    def random_condition(attr):
+        if attr == "day":
+            return {"in": rng.sample(DAYS, rng.randint(1, 2))}
+        if attr == "country":
+            if rng.random() < 0.1:
+                return {"not_in": rng.sample(COUNTRIES, 6)}
+            return rng.choice(COUNTRIES)
+        if attr == "board":
+            return rng.choice(BOARDS)
+        if attr == "salary":
+            low = rng.randrange(20_000, 200_000, 5_000)
+            return rng.choice(
+                [{"gt": low + 50_000}, {"ge": low, "lt": low + 20_000}]
+            )
+        if attr == "hour":
+            return rng.choice(
+                [{"lt": rng.randint(6, 9)}, {"ge": rng.randint(18, 22)}]
+            )
+        return rng.choice([True, {"not_in": [True]}])  # paid / approved
+
+    rules = list(GUARDRAILS)
+    for i in range(1000 - len(rules)):
+        attrs = rng.sample(
+            ["day", "country", "board", "salary", "hour", "paid", "approved"],
+            rng.randint(2, 3),
+        )
+        rules.append(
+            {
+                "id": f"rule-{i}",
+                "tool": "*" if rng.random() < 0.02 else rng.choice(TOOLS),
+                "when": {attr: random_condition(attr) for attr in attrs},
+                "decision": rng.choice(["deny", "needs_approval", "allow"]),
+            }
+        )
+
+    def random_action():
+        args = {
+            "day": rng.choice(DAYS),
+            "country": rng.choice(COUNTRIES),
+            "board": rng.choice(BOARDS),
+            "salary": rng.randrange(10_000, 250_000, 2_500),
+            "hour": rng.randint(0, 23),
+            "paid": rng.random() < 0.3,
+            "approved": rng.random() < 0.5,
+        }
+        keep = rng.sample(list(args), rng.randint(4, len(args)))
+        return rng.choice(TOOLS + ["unknown_tool"]), {k: args[k] for k in keep}
+
+    naive = Policy(rules)
+    start = time.perf_counter()
+    compiled = naive.compile()
+    compile_time = time.perf_counter() - start
+    actions = [random_action() for _ in range(20_000)]
+
+    results = {}
+    for name, policy in [("naive loop", naive), ("compiled", compiled)]:
+        start = time.perf_counter()
+        results[name] = [policy.decide(tool, args) for tool, args in actions]
+        results[name + " rate"] = len(actions) / (time.perf_counter() - start)
+    assert results["naive loop"] == results["compiled"]
+    verdicts = {d: 0 for d in PRECEDENCE}
+    for decision in results["compiled"]:
+        verdicts[decision.decision] += 1
+    print(
+        f"\n1000 rules, {len(TOOLS)} tools | compiled in {compile_time * 1e3:.0f} ms"
+        f" | decisions {verdicts}"
+    )
+    for name in ("naive loop", "compiled"):
+        print(f"{name:10s} | {results[name + ' rate']:10,.0f} decisions/s")
+    print(
+        f"speedup {results['compiled rate'] / results['naive loop rate']:.0f}x, "
+        f"same decisions for all {len(actions)} actions"
+    )
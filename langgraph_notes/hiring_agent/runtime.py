@@ -0,0 +1,360 @@
+"""
+* Problem: One agent per goal
+    > 2_what.py: Brain (LLM) + Orchestrator + Tools for ONE goal ("Hire a backend engineer"). With many goals
+      at once every agent sends its own LLM requests, one prompt per request, first come first served:
+        - the provider (or the local GPU) processes 1 prompt per request while it could take 16 for a little
+          more time → low utilization, long queues
+        - a burst of 100 low-priority goals delays the one urgent hire behind all of them
+
+* Agent Runtime
+    > WorkerPool: all agent graphs share `workers` slots; a node of any graph runs only with a slot
+      (CompiledGraph.arun(..., gate=pool.gate(goal, weight))).
+    > SharedLLM: every agent's llm(prompt) goes into ONE queue. A request to the provider takes up to
+      `max_batch` waiting prompts of all agents (max_batch=1 if the provider has no batch endpoint), at most
+      `max_in_flight` requests run at once. A short window (window_ms) lets a half-empty batch fill up.
+    > Fair Priorities (stride scheduling): both queues are FairQueues. Every goal has a weight (high 4,
+      normal 2, low 1) and a "pass"; the next item comes from the goal with the smallest pass, which then
+      advances by 1/weight → a high goal gets 4x the slots of a low goal, and no goal starves: an idle goal
+      re-joins at the current pass, it can not save up credit.
+
+? Usage
+    runtime = AgentRuntime(make_app, SharedLLM(send_batch, max_batch=16), workers=64)
+    results = await asyncio.gather(*(runtime.run_goal(f"goal-{i}", GOAL, "normal") for i in range(100)))
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections import Counter, deque
+from typing import Awaitable, Callable
+
+from graph import CompiledGraph, RunResult
+
+PRIORITIES = {"high": 4, "normal": 2, "low": 1}
+
+
+class FairQueue:
+
+    def __init__(self):
+        self._items: dict[str, deque] = {}
+        self._weights: dict[str, float] = {}
+        self._pass: dict[str, float] = {}
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._now = 0.0
+        self._len = 0
+
+    def put(self, goal: str, weight: float, item):
+        queue = self._items.get(goal)
+        if queue is None:
+            queue = self._items[goal] = deque()
+            # no credit for the time the goal was idle
+            self._pass[goal] = max(self._pass.get(goal, 0.0), self._now)
+            heapq.heappush(
+                self._heap, (self._pass[goal], next(self._seq), goal)
+            )
+        self._weights[goal] = weight
+        queue.append(item)
+        self._len += 1
+
+    def pop(self):
+        pass_, _, goal = heapq.heappop(self._heap)
+        self._now = pass_
+        queue = self._items[goal]
+        item = queue.popleft()
+        self._len -= 1
+        self._pass[goal] = pass_ + 1 / self._weights[goal]
+        if queue:
+            heapq.heappush(
+                self._heap, (self._pass[goal], next(self._seq), goal)
+            )
+        else:
+            del self._items[goal]
+        return item
+
+    def forget(self, goal: str):
+        if goal not in self._items:
+            self._pass.pop(goal, None)
+            self._weights.pop(goal, None)
+
+    def __len__(self):
+        return self._len
+
+
+class WorkerPool:
+
+    def __init__(self, workers: int):
+        self.free = workers
+        self.waiting = FairQueue()
+
+    def gate(self, goal: str, weight: float) -> "_Slot":
+        return _Slot(self, goal, weight)
+
+    async def acquire(self, goal: str, weight: float):
+        if self.free and not len(self.waiting):
+            self.free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.put(goal, weight, future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over already
+            raise
+
+    def release(self):
+        while len(self.waiting):
+            future = self.waiting.pop()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.free += 1
+
+
+class _Slot:
+    __slots__ = ("pool", "goal", "weight")
+
+    def __init__(self, pool, goal, weight):
+        self.pool, self.goal, self.weight = pool, goal, weight
+
+    async def __aenter__(self):
+        await self.pool.acquire(self.goal, self.weight)
+
+    async def __aexit__(self, *exc):
+        self.pool.release()
+        return False
+
+
+class SharedLLM:
+
+    def __init__(
+        self,
+        send_batch: Callable[[list[str]], Awaitable[list[str]]],
+        max_batch: int = 16,
+        max_in_flight: int = 2,
+        window_ms: float = 2.0,
+    ):
+        self.send_batch = send_batch
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.window = window_ms / 1000
+        self.queue = FairQueue()
+        self.in_flight = 0
+        self.stats = Counter()
+        self._timer = None
+        self._sending = set()
+
+    async def __call__(self, goal: str, weight: float, prompt: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put(goal, weight, (prompt, future))
+        if self.in_flight < self.max_in_flight:
+            if len(self.queue) >= self.max_batch or not self.window:
+                self._flush()
+            elif self._timer is None:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.in_flight < self.max_in_flight and len(self.queue):
+            size = min(self.max_batch, len(self.queue))
+            batch = [self.queue.pop() for _ in range(size)]
+            self.in_flight += 1
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch):
+        self.stats["requests"] += 1
+        self.stats["prompts"] += len(batch)
+        try:
+            answers = await self.send_batch([prompt for prompt, _ in batch])
+            if len(answers) != len(batch):
+                raise RuntimeError(
+                    f"provider returned {len(answers)} answers "
+                    f"for {len(batch)} prompts"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), answer in zip(batch, answers):
+                if not future.done():
+                    future.set_result(answer)
+        finally:
+            self.in_flight -= 1
+            # whatever queued up meanwhile goes out right away
+            self._flush()
+
+
+class AgentRuntime:
+
+    def __init__(
+        self,
+        make_app: Callable[[Callable[[str], Awaitable[str]]], CompiledGraph],
+        llm: SharedLLM,
+        workers: int | None = 64,
+    ):
+        self.make_app = make_app
+        self.llm = llm
+        self.pool = WorkerPool(workers) if workers else None
+
+    async def run_goal(
+        self, goal: str, state: dict, priority: str = "normal"
+    ) -> RunResult:
+        weight = PRIORITIES[priority]
+
+        async def llm(prompt):
+            return await self.llm(goal, weight, prompt)
+
+        app = self.make_app(llm)
+        gate = self.pool.gate(goal, weight) if self.pool else None
+        try:
+            return await app.arun(state, gate=gate)
+        finally:
+            self.llm.queue.forget(goal)
+            if self.pool:
+                self.pool.waiting.forget(goal)
+
+
+if __name__ == "__main__":
+    import json
+    import random
+    import statistics
+    import time
+
+    from graph import ToolLimits
+    from stand_in_tools import LATENCY, HiringTools
+    from workflow import GOAL, build_hiring_graph
+
+    class FakeLLMServer:
+        # local stand-in for the provider: `slots` batches at a time,
+        # a batch of n prompts takes 80 ms + 4 ms per prompt
+
+        def __init__(self, slots=2, base=0.08, per_prompt=0.004):
+            self.slots = asyncio.Semaphore(slots)
+            self.n_slots, self.base, self.per_prompt = slots, base, per_prompt
+            self.busy = 0.0
+
+        async def handle(self, reader, writer):
+            while line := await reader.readline():
+                prompts = json.loads(line)["prompts"]
+                async with self.slots:
+                    seconds = self.base + self.per_prompt * len(prompts)
+                    await asyncio.sleep(seconds)
+                    self.busy += seconds
+                answers = [f"[llm] {p[:40]}" for p in prompts]
+                writer.write(json.dumps({"answers": answers}).encode() + b"\n")
+                await writer.drain()
+            writer.close()
+
+    class Client:
+        # one connection per request in flight
+
+        def __init__(self, port):
+            self.port = port
+            self.idle = []
+
+        async def send_batch(self, prompts):
+            if self.idle:
+                reader, writer = self.idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", self.port
+                )
+            writer.write(json.dumps({"prompts": prompts}).encode() + b"\n")
+            await writer.drain()
+            answers = json.loads(await reader.readline())["answers"]
+            self.idle.append((reader, writer))
+            return answers
+
+    # a burst of goals: 10% high, 30% normal, 60% low priority
+    rng = random.Random(0)
+    GOALS = [rng.choices(list(PRIORITIES), [1, 3, 6])[0] for _ in range(120)]
+    limits = ToolLimits({"job_board": 8, "calendar": 8})
+
+    def make_app(llm):
+        tools = HiringTools(
+            limits,
+            latency={tool: seconds / 10 for tool, seconds in LATENCY.items()},
+            calendar_failure_every=0,
+        )
+        tools.llm = llm
+        return build_hiring_graph(tools).compile()
+
+    async def load_test(name, llm_options, workers, priorities=True):
+        server = FakeLLMServer()
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        client = Client(listener.sockets[0].getsockname()[1])
+        llm = SharedLLM(client.send_batch, **llm_options)
+        runtime = AgentRuntime(make_app, llm, workers)
+        finished = {priority: [] for priority in PRIORITIES}
+        start = time.perf_counter()
+
+        async def goal(i, priority):
+            await runtime.run_goal(
+                f"goal-{i}", GOAL, priority if priorities else "normal"
+            )
+            finished[priority].append(time.perf_counter() - start)
+
+        await asyncio.gather(*(goal(i, p) for i, p in enumerate(GOALS)))
+        elapsed = time.perf_counter() - start
+        for _, writer in client.idle:
+            writer.close()
+            await writer.wait_closed()
+        listener.close()
+        await listener.wait_closed()
+        utilization = server.busy / (elapsed * server.n_slots)
+        print(
+            f"{name:35s} | {elapsed:5.1f} s | "
+            f"{len(GOALS) / elapsed * 3600:7,.0f} agents/hour | "
+            f"LLM busy {utilization:4.0%}, "
+            f"{llm.stats['prompts'] / elapsed:4.0f} prompts/s, "
+            f"{llm.stats['prompts'] / llm.stats['requests']:4.1f} prompts/req"
+        )
+        print(
+            "    done after (mean / max): "
+            + ", ".join(
+                f"{p} {statistics.mean(t):4.1f} / {max(t):4.1f} s"
+                for p, t in finished.items()
+                if t
+            )
+        )
+
+    async def main():
+        # a provider that drops answers fails every prompt of the batch
+        async def short(prompts):
+            return prompts[:-1]
+
+        llm = SharedLLM(short, max_batch=4)
+        answers = await asyncio.gather(
+            *(llm("goal", 1, f"p{i}") for i in range(4)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(a, RuntimeError) for a in answers), answers
+
+        print(
+            f"{len(GOALS)} hiring goals at once "
+            f"({dict(Counter(GOALS))}), 4 LLM calls each\n"
+        )
+        # one agent per goal: every llm() is its own request, FIFO
+        await load_test(
+            "one agent per goal, direct calls",
+            {"max_batch": 1, "max_in_flight": 10_000, "window_ms": 0},
+            workers=None,
+        )
+        shared = {"max_batch": 16, "max_in_flight": 2, "window_ms": 2}
+        await load_test(
+            "shared pool, batched, no priorities",
+            shared,
+            workers=64,
+            priorities=False,
+        )
+        await load_test("shared pool, batched + fair", shared, workers=64)
+
+    asyncio.run(main())
@@ -0,0 +1,419 @@
+"""
+* Shortlisting at scale
+    > 1_why.py / 2_what.py: "Resume Parser", "3 candidates match -> schedule 2 best". With thousands of
+      applications, one LLM call per resume is slow and expensive, and most resumes are clear misfits.
+
+* Screening Pipeline (cheapest first)
+    1) Parse (process pool): PDFs → text in a ProcessPoolExecutor (PDF parsing is pure-Python CPU work, the GIL
+       would serialize it on threads). pypdf is used when installed (PyPDFLoader in rag_components uses it),
+       otherwise a small extractor for simple text PDFs. Cheap regex hints are pulled out on the way:
+       years of experience, remote / onsite.
+    2) Hard Filter: constraints that a regex can check (experience range ± tolerance, remote) drop clear
+       misfits without any model.
+    3) Embedding Pre-filter: the JD constraints become one query ("2-4 years Python Django Cloud remote"),
+       every remaining resume is embedded locally and ranked by cosine → only the top `top_fraction` goes on.
+    4) Batched Structured Output: the survivors are packed `batch_size` per call into one
+       with_structured_output({"items": [...]}) request with a doc_id per resume, with the lenient batch schema
+       and the per-item validation of langchain_notes/performance/bulk_extraction.py (batch_schema,
+       split_batch): a bad item only fails its own resume. Resumes missing from a batch answer are retried alone.
+
+? Usage
+    pipeline = ScreeningPipeline(model, embeddings, GOAL["constraints"], top_fraction=0.1, batch_size=10)
+    result = pipeline.run(pdf_paths)
+    result.ranked[:3]      # best candidates with extracted fields
+"""
+
+import math
+import os
+import re
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "..",
+        "langchain_notes",
+        "performance",
+    )
+)
+from bulk_extraction import batch_schema, split_batch  # noqa: E402
+
+_YEARS = re.compile(r"(\d+)\+?\s*(?:years|yrs)", re.IGNORECASE)
+_REMOTE = re.compile(r"\bremote\b", re.IGNORECASE)
+_ONSITE = re.compile(r"\b(on-?site|in office|relocate)\b", re.IGNORECASE)
+_TEXT_OP = re.compile(rb"\((.*?)(?<!\\)\)\s*Tj")
+_STREAM = re.compile(rb"stream\r?\n(.*?)\nendstream", re.S)
+
+
+class ResumeFields(BaseModel):
+    name: str = Field(description="full name of the candidate")
+    years_experience: int = Field(description="years of backend experience")
+    stack: list[str] = Field(description="languages, frameworks, clouds")
+    remote: bool = Field(description="open to remote work")
+    fit: float = Field(description="0-1 match with the job constraints")
+
+
+ResumeItem, ResumeBatch = batch_schema(ResumeFields)
+
+
+def pdf_text(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _simple_pdf_text(path)
+    return "\n".join(
+        page.extract_text() or "" for page in PdfReader(path).pages
+    )
+
+
+def _simple_pdf_text(path: str) -> str:
+    # text-only PDFs: (...) Tj operators in plain or FlateDecode streams
+    with open(path, "rb") as f:
+        data = f.read()
+    parts = []
+    for stream in _STREAM.findall(data):
+        try:  # decompressobj ignores a trailing \r before endstream
+            stream = zlib.decompressobj().decompress(stream)
+        except zlib.error:
+            pass
+        parts += [
+            m.replace(rb"\(", b"(").replace(rb"\)", b")")
+            for m in _TEXT_OP.findall(stream)
+        ]
+    return b"\n".join(parts).decode("latin-1")
+
+
+def parse_resume_file(path: str) -> dict:
+    # runs in a worker process
+    text = pdf_text(path)
+    years = [int(y) for y in _YEARS.findall(text)]
+    return {
+        "path": path,
+        "text": text,
+        "years": max(years) if years else None,
+        "remote": bool(_REMOTE.search(text)) and not _ONSITE.search(text),
+    }
+
+
+def constraint_query(constraints: dict) -> str:
+    remote = "remote" if constraints.get("remote") else ""
+    return f"{constraints['experience']} experience {' '.join(constraints['stack'])} {remote}"
+
+
+def passes_hard_filter(
+    resume: dict, constraints: dict, tolerance: int = 1
+) -> bool:
+    low, high = (
+        int(x) for x in constraints["experience"].split()[0].split("-")
+    )
+    if resume["years"] is not None and not (
+        low - tolerance <= resume["years"] <= high + tolerance
+    ):
+        return False
+    return resume["remote"] or not constraints.get("remote")
+
+
+@dataclass
+class ScreeningResult:
+    ranked: list[dict]
+    stats: dict = field(default_factory=dict)
+
+
+class ScreeningPipeline:
+
+    def __init__(
+        self,
+        model,
+        embeddings,
+        constraints: dict,
+        top_fraction: float = 0.1,
+        batch_size: int = 10,
+        parse_workers: int | None = None,
+        llm_concurrency: int = 8,
+    ):
+        self.batch_model = model.with_structured_output(ResumeBatch)
+        self.single_model = model.with_structured_output(ResumeFields)
+        self.embeddings = embeddings
+        self.constraints = constraints
+        self.top_fraction = top_fraction
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers
+        self.llm_concurrency = llm_concurrency
+
+    def run(self, paths: list[str]) -> ScreeningResult:
+        stats = {"resumes": len(paths)}
+        with ProcessPoolExecutor(self.parse_workers) as pool:
+            resumes = list(pool.map(parse_resume_file, paths, chunksize=32))
+
+        resumes = [
+            r for r in resumes if passes_hard_filter(r, self.constraints)
+        ]
+        stats["after_hard_filter"] = len(resumes)
+
+        if resumes:
+            query = np.asarray(
+                self.embeddings.embed_query(
+                    constraint_query(self.constraints)
+                ),
+                dtype=np.float32,
+            )
+            vectors = np.asarray(
+                self.embeddings.embed_documents([r["text"] for r in resumes]),
+                dtype=np.float32,
+            )
+            vectors /= np.maximum(
+                np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+            )
+            similarity = vectors @ (query / max(np.linalg.norm(query), 1e-12))
+            keep = max(1, math.ceil(self.top_fraction * len(paths)))
+            order = np.argsort(-similarity)[:keep]
+            resumes = [
+                resumes[i] | {"similarity": float(similarity[i])}
+                for i in order
+            ]
+        stats["sent_to_llm"] = len(resumes)
+
+        extracted, calls = self._extract(resumes)
+        stats["llm_calls"] = calls
+        stats["llm_calls_saved"] = len(paths) - calls
+        ranked = sorted(
+            (
+                r | {"fields": f}
+                for r, f in zip(resumes, extracted)
+                if f is not None
+            ),
+            key=lambda r: r["fields"].fit,
+            reverse=True,
+        )
+        return ScreeningResult(ranked, stats)
+
+    def _extract(self, resumes):
+        results = [None] * len(resumes)
+        retry = []
+
+        def extract_batch(start):
+            group = resumes[start : start + self.batch_size]
+            prompt = self._prompt(group, start)
+            try:
+                items = split_batch(
+                    self.batch_model.invoke(prompt), ResumeFields
+                )
+            except Exception:
+                items = {}
+            for doc_id in range(start, start + len(group)):
+                item = items.get(doc_id)
+                if item is None:
+                    retry.append(doc_id)
+                else:
+                    results[doc_id] = item
+
+        def extract_single(doc_id):
+            try:
+                results[doc_id] = self.single_model.invoke(
+                    self._prompt([resumes[doc_id]], doc_id)
+                )
+            except Exception:
+                results[doc_id] = None
+
+        with ThreadPoolExecutor(self.llm_concurrency) as pool:
+            list(
+                pool.map(
+                    extract_batch, range(0, len(resumes), self.batch_size)
+                )
+            )
+            list(pool.map(extract_single, retry))
+        batches = math.ceil(len(resumes) / self.batch_size)
+        return results, batches + len(retry)
+
+    def _prompt(self, group, first_id):
+        docs = "\n".join(
+            f'<resume doc_id="{first_id + i}">\n{r["text"]}\n</resume>'
+            for i, r in enumerate(group)
+        )
+        return (
+            f"Job constraints: {self.constraints}\n"
+            "Extract the fields of EVERY resume below and rate its fit.\n\n"
+            + docs
+        )
+
+
+if __name__ == "__main__":
+    import random
+    import shutil
+    import tempfile
+    import threading
+    import time
+
+    from fake_models import FakeEmbeddings, Latency
+    from langchain_core.runnables import RunnableLambda
+
+    from workflow import GOAL
+
+    def write_pdf(path, lines):
+        # minimal one-page PDF with a Flate-compressed text stream
+        text = (
+            b"BT /F1 11 Tf 50 780 Td "
+            + b" ".join(
+                b"("
+                + line.encode("latin-1")
+                .replace(b"(", rb"\(")
+                .replace(b")", rb"\)")
+                + b") Tj 0 -14 Td"
+                for line in lines
+            )
+            + b" ET"
+        )
+        stream = zlib.compress(text)
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+            b" /Resources << /Font << /F1 5 0 R >> >> >>",
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+            + stream
+            + b"\nendstream",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        ]
+        out, offsets = bytearray(b"%PDF-1.4\n"), []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+        out += (
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+        with open(path, "wb") as f:
+            f.write(out)
+
+    class FakeStructuredModel:
+        # 50 ms per request + 5 ms per resume, reads the answer off the text
+        def __init__(self):
+            self.calls = 0
+            self.lock = threading.Lock()
+
+        def with_structured_output(self, schema):
+            return RunnableLambda(lambda prompt: self._respond(schema, prompt))
+
+        def _respond(self, schema, prompt):
+            docs = re.findall(
+                r'<resume doc_id="(\d+)">\n(.*?)\n</resume>', prompt, re.S
+            )
+            with self.lock:
+                self.calls += 1
+            time.sleep(0.05 + 0.005 * len(docs))
+            items = []
+            for doc_id, text in docs:
+                stack = [s for s in SKILLS if s.lower() in text.lower()]
+                years = int((_YEARS.search(text) or [0, 0])[1])
+                fit = len(set(stack) & set(GOAL["constraints"]["stack"])) / 3
+                items.append(
+                    {
+                        "doc_id": int(doc_id),
+                        "name": text.splitlines()[0],
+                        "years_experience": years,
+                        "stack": stack,
+                        "remote": "remote" in text.lower(),
+                        "fit": round(
+                            fit * (1.0 if 2 <= years <= 4 else 0.5), 2
+                        ),
+                    }
+                )
+            if schema is ResumeBatch:
+                return ResumeBatch.model_validate({"items": items})
+            return ResumeFields(
+                **{k: v for k, v in items[0].items() if k != "doc_id"}
+            )
+
+    SKILLS = [
+        "Python",
+        "Django",
+        "Cloud",
+        "Java",
+        "Spring",
+        "Go",
+        "React",
+        "AWS",
+        "Kotlin",
+        "PHP",
+    ]
+    random.seed(0)
+    directory = tempfile.mkdtemp()
+    paths, qualified = [], set()
+    for i in range(2000):
+        years = random.randint(0, 12)
+        stack = random.sample(SKILLS, 3)
+        remote = random.random() < 0.6
+        lines = [
+            f"Candidate {i}",
+            f"Backend engineer with {years} years of experience.",
+            f"Skills: {', '.join(stack)}",
+            (
+                "Open to remote work."
+                if remote
+                else "Prefers to work on-site in office."
+            ),
+            "Built REST APIs, CI pipelines and internal tools. "
+            * random.randint(1, 4),
+        ]
+        path = os.path.join(directory, f"resume_{i}.pdf")
+        write_pdf(path, lines)
+        paths.append(path)
+        if (
+            2 <= years <= 4
+            and remote
+            and len(set(stack) & {"Python", "Django", "Cloud"}) >= 2
+        ):
+            qualified.add(path)
+
+    # baseline: every resume parsed in-process and sent to the LLM alone
+    model = FakeStructuredModel()
+    single = model.with_structured_output(ResumeFields)
+    start = time.perf_counter()
+    texts = [pdf_text(p) for p in paths]
+    with ThreadPoolExecutor(8) as pool:
+        list(
+            pool.map(
+                lambda t: single.invoke(
+                    f'<resume doc_id="0">\n{t}\n</resume>'
+                ),
+                texts,
+            )
+        )
+    baseline = time.perf_counter() - start
+    print(
+        f"one LLM call per resume  | {len(paths) / baseline * 60:8,.0f} resumes/min | "
+        f"{model.calls} LLM calls"
+    )
+
+    model = FakeStructuredModel()
+    pipeline = ScreeningPipeline(
+        model,
+        FakeEmbeddings(
+            dim=512, latency=Latency("constant"), per_text=0, binary=True
+        ),
+        GOAL["constraints"],
+    )
+    start = time.perf_counter()
+    result = pipeline.run(paths)
+    elapsed = time.perf_counter() - start
+    found = {r["path"] for r in result.ranked}
+    print(
+        f"screening pipeline       | {len(paths) / elapsed * 60:8,.0f} resumes/min | "
+        f"{result.stats['llm_calls']} LLM calls ({result.stats['llm_calls_saved']} saved) | "
+        f"{result.stats}"
+    )
+    print(
+        f"qualified resumes reaching the LLM: {len(found & qualified)}/{len(qualified)} | "
+        f"best: {[r['fields'].name for r in result.ranked[:3]]} | {os.cpu_count()} CPU(s)"
+    )
+    shutil.rmtree(directory)
@@ -0,0 +1,131 @@
+"""
+* Local stand-ins for the tools listed in 2_what.py
+    > calendar API, LinkedIn API, resume parser, mail API, HRM access, job boards and the LLM ("brain").
+    > Every tool is an async method that sleeps for a typical latency of the real API and returns
+      deterministic data, so the hiring graph can be run and benchmarked without keys or network.
+    > Every call goes through ToolLimits (per-tool concurrency cap) and is counted in `calls`, the most calls
+      of one tool running at the same time are in `peak` (to check the caps).
+    > The resume parser and the LinkedIn API also have batch endpoints (parse_resumes, linkedin_profiles).
+    > The calendar API fails every `calendar_failure_every`-th call, to exercise the retry logic.
+"""
+
+import asyncio
+import hashlib
+from collections import Counter
+
+from graph import ToolLimits
+
+LATENCY = {
+    "llm": 0.30,
+    "job_board": 0.20,
+    "applications": 0.05,
+    "resume_parser": 0.05,
+    "linkedin": 0.08,
+    "calendar": 0.10,
+    "interview": 0.25,
+    "mail": 0.06,
+    "hrm": 0.12,
+}
+
+STACKS = ["Python", "Django", "Cloud", "Java", "Go", "React", "AWS"]
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode()).digest()[:4], "big")
+
+
+def _resume(application_id):
+    h = _digest(application_id)
+    return {
+        "id": application_id,
+        "experience": h % 7,
+        "stack": [STACKS[(h >> s) % len(STACKS)] for s in (3, 7, 11)],
+        "remote": bool(h & 1),
+    }
+
+
+def _profile(candidate):
+    return {"candidate": candidate, "endorsements": _digest(candidate) % 50}
+
+
+class HiringTools:
+
+    def __init__(
+        self,
+        limits: ToolLimits | None = None,
+        latency: dict | None = None,
+        calendar_failure_every: int = 5,
+    ):
+        self.limits = limits or ToolLimits()
+        self.latency = {**LATENCY, **(latency or {})}
+        self.calendar_failure_every = calendar_failure_every
+        self.calls = Counter()
+        self.running = Counter()
+        self.peak = Counter()
+
+    async def _use(self, tool: str, seconds: float | None = None):
+        async with self.limits(tool):
+            self.calls[tool] += 1
+            self.running[tool] += 1
+            self.peak[tool] = max(self.peak[tool], self.running[tool])
+            try:
+                await asyncio.sleep(
+                    self.latency[tool] if seconds is None else seconds
+                )
+            finally:
+                self.running[tool] -= 1
+            return self.calls[tool]
+
+    async def llm(self, prompt: str) -> str:
+        await self._use("llm")
+        return f"[llm] {prompt[:60]}"
+
+    async def post_job(self, board: str, jd: str) -> str:
+        await self._use("job_board")
+        return f"https://{board.lower()}.example/jobs/{_digest(jd) % 10_000}"
+
+    async def poll_applications(self, board: str, since: int) -> list[str]:
+        # every poll returns a few new applications per board
+        await self._use("applications")
+        new = 1 + _digest(f"{board}{since}") % 3
+        return [f"{board.lower()}-{since + i}" for i in range(new)]
+
+    async def parse_resume(self, application_id: str) -> dict:
+        await self._use("resume_parser")
+        return _resume(application_id)
+
+    async def parse_resumes(self, application_ids: list[str]) -> list[dict]:
+        # batch endpoint: one request, a little extra time per resume
+        seconds = self.latency["resume_parser"] + 0.002 * len(application_ids)
+        await self._use("resume_parser", seconds)
+        return [_resume(a) for a in application_ids]
+
+    async def linkedin_profile(self, candidate: str) -> dict:
+        await self._use("linkedin")
+        return _profile(candidate)
+
+    async def linkedin_profiles(self, candidates: list[str]) -> list[dict]:
+        seconds = self.latency["linkedin"] + 0.002 * len(candidates)
+        await self._use("linkedin", seconds)
+        return [_profile(c) for c in candidates]
+
+    async def find_slot(self, candidate: str) -> str:
+        call = await self._use("calendar")
+        if (
+            self.calendar_failure_every
+            and call % self.calendar_failure_every == 0
+        ):
+            raise ConnectionError("calendar API timeout")
+        return f"Wed {2 + _digest(candidate) % 4} PM"
+
+    async def interview(self, candidate: str, questions: str) -> float:
+        await self._use("interview")
+        return (_digest(candidate + questions) % 100) / 100
+
+    async def send_mail(self, to: str, body: str) -> str:
+        await self._use("mail")
+        return f"sent to {to}"
+
+    async def create_hrm_record(self, candidate: str) -> str:
+        await self._use("hrm")
+        return f"EMP-{_digest(candidate) % 100_000:05d}"
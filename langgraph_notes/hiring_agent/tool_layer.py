@@ -0,0 +1,322 @@
+"""
+* Problem: Agents that loop call the same tools again and again
+    > "keep checking job apps until 10 are received" (2_what.py): every round the agent polls the job boards,
+      re-parses the resumes it already saw and looks up the same LinkedIn profiles. Several sub-tasks running
+      at the same time ask for the same profile at the same moment.
+    > Every one of those is a real API call (latency, rate limits, money).
+
+* Tool Execution Layer
+    > TTL Cache (reads only): A tool is registered with ttl=seconds if it is an idempotent read (parse a
+      resume: hours, poll applications: a few seconds). Results are cached by (tool, arguments) until they
+      expire. Tools without ttl (send mail, post job, create HRM record) are never cached.
+      Expired entries are dropped as new results come in (a heap ordered by expiry), the cache does not grow
+      with every argument ever seen.
+    > Single Flight: If a call with the same key is already running, the new caller awaits the SAME task
+      instead of starting a second call (errors are shared too, and not cached). The call is a task of its
+      own that every caller awaits shielded → a cancelled caller never cancels the others. Only for
+      idempotent tools (default: the ones with a ttl): two send_mail calls with the same arguments are two mails.
+    > Batch Endpoints: A tool can declare batch=async fn(list of args) -> list of results. Calls arriving within
+      window_ms (or until max_batch) are collected and sent as ONE request, every caller gets its own item.
+    > stats: calls (asked by the agent), cache_hits, coalesced, upstream (real calls made), batched (items
+      that went through a batch request).
+
+? Usage
+    layer = ToolLayer()
+    layer.register("parse_resume", tools.parse_resume, ttl=3600, batch=tools.parse_resumes)
+    layer.register("send_mail", tools.send_mail)          # side effect: never cached or coalesced
+    resume = await layer.call("parse_resume", "linkedin-3")
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class ToolSpec:
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    ttl: float | None = None
+    batch: Callable[[list], Awaitable[list]] | None = None
+    max_batch: int = 50
+    window: float = 0.005
+    idempotent: bool = False
+    pending: list = field(default_factory=list)
+    flush_handle: Any = None
+
+
+class ToolLayer:
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.tools: dict[str, ToolSpec] = {}
+        self.stats = Counter()
+        self._cache: dict[tuple, tuple[float, Any]] = {}
+        self._expiry: list[tuple[float, int, tuple]] = []  # heap
+        self._seq = itertools.count()
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+
+    def register(
+        self,
+        name: str,
+        fn,
+        ttl: float | None = None,
+        batch=None,
+        max_batch: int = 50,
+        window_ms: float = 5.0,
+        idempotent: bool | None = None,
+    ):
+        if idempotent is None:
+            idempotent = ttl is not None
+        self.tools[name] = ToolSpec(
+            name, fn, ttl, batch, max_batch, window_ms / 1000, idempotent
+        )
+
+    def invalidate(self, name: str, *args):
+        if args:
+            self._cache.pop((name, args), None)
+        else:
+            for key in [k for k in self._cache if k[0] == name]:
+                del self._cache[key]
+
+    async def call(self, name: str, *args):
+        spec = self.tools[name]
+        key = (name, args)
+        self.stats["calls"] += 1
+        if spec.ttl is not None:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > self.clock():
+                self.stats["cache_hits"] += 1
+                return hit[1]
+        if not spec.idempotent:
+            if spec.batch is not None:
+                return await self._enqueue(spec, args)
+            self.stats["upstream"] += 1
+            return await spec.fn(*args)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            # a task of its own: a cancelled caller never cancels the others
+            task = asyncio.ensure_future(self._upstream(spec, key, args))
+            task.add_done_callback(_retrieve)
+            self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _upstream(self, spec: ToolSpec, key, args):
+        try:
+            if spec.batch is not None:
+                value = await self._enqueue(spec, args)
+            else:
+                self.stats["upstream"] += 1
+                value = await spec.fn(*args)
+        finally:
+            del self._in_flight[key]
+        if spec.ttl is not None:
+            self._store(key, value, spec.ttl)
+        return value
+
+    def _store(self, key, value, ttl):
+        now = self.clock()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, _, old = heapq.heappop(self._expiry)
+            hit = self._cache.get(old)
+            if hit is not None and hit[0] == expires:  # not refreshed since
+                del self._cache[old]
+        self._cache[key] = (now + ttl, value)
+        heapq.heappush(self._expiry, (now + ttl, next(self._seq), key))
+
+    async def _enqueue(self, spec: ToolSpec, args):
+        # batch endpoints take one argument per item
+        future = asyncio.get_running_loop().create_future()
+        spec.pending.append((args[0] if len(args) == 1 else args, future))
+        if len(spec.pending) >= spec.max_batch:
+            self._flush(spec)
+        elif spec.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            spec.flush_handle = loop.call_later(spec.window, self._flush, spec)
+        return await future
+
+    def _flush(self, spec: ToolSpec):
+        if spec.flush_handle is not None:
+            spec.flush_handle.cancel()
+            spec.flush_handle = None
+        pending, spec.pending = spec.pending, []
+        if pending:
+            asyncio.ensure_future(self._run_batch(spec, pending))
+
+    async def _run_batch(self, spec: ToolSpec, pending):
+        self.stats["upstream"] += 1
+        self.stats["batched"] += len(pending)
+        try:
+            results = await spec.batch([item for item, _ in pending])
+            if len(results) != len(pending):
+                raise RuntimeError(
+                    f"{spec.name}: batch returned {len(results)} results "
+                    f"for {len(pending)} items"
+                )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():  # the caller was cancelled
+                future.set_result(result)
+
+
+def _retrieve(task: asyncio.Task):
+    # every caller may be gone: no "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+def hiring_tool_layer(tools, poll_ttl: float = 2.0) -> ToolLayer:
+    # the read-only tools of HiringTools cached, the side effects not
+    layer = ToolLayer()
+    layer.register("poll_applications", tools.poll_applications, ttl=poll_ttl)
+    layer.register(
+        "parse_resume", tools.parse_resume, ttl=3600, batch=tools.parse_resumes
+    )
+    layer.register(
+        "linkedin_profile",
+        tools.linkedin_profile,
+        ttl=3600,
+        batch=tools.linkedin_profiles,
+    )
+    layer.register("find_slot", tools.find_slot, ttl=60)
+    layer.register("send_mail", tools.send_mail)
+    layer.register("create_hrm_record", tools.create_hrm_record)
+    return layer
+
+
+if __name__ == "__main__":
+    from graph import ToolLimits
+    from stand_in_tools import HiringTools
+    from workflow import BOARDS, DEFAULT_LIMITS
+
+    # the same API caps for both runs (LinkedIn: 4 concurrent requests)
+    LIMITS = DEFAULT_LIMITS | {"linkedin": 4}
+
+    async def direct(tools, name, *args):
+        return await getattr(tools, name)(*args)
+
+    async def agent_run(call, rounds=10, reviewers=3):
+        # "keep checking job apps until enough are received": every round
+        # polls all boards (twice: the planner and the tracker both look),
+        # then 3 reviewers look at every application seen so far
+        seen = {board: [] for board in BOARDS}
+        for _ in range(rounds):
+            for _ in range(2):
+                polls = await asyncio.gather(
+                    *(
+                        call("poll_applications", board, len(seen[board]))
+                        for board in BOARDS
+                    )
+                )
+            for board, new in zip(BOARDS, polls):
+                seen[board] += new
+            applications = [a for apps in seen.values() for a in apps]
+
+            async def review(application):
+                resume = await call("parse_resume", application)
+                profile = await call("linkedin_profile", application)
+                return resume["experience"] + profile["endorsements"]
+
+            await asyncio.gather(
+                *(review(a) for a in applications for _ in range(reviewers))
+            )
+        return sum(len(apps) for apps in seen.values())
+
+    async def checks():
+        now = [0.0]
+        tools = HiringTools(ToolLimits(LIMITS))
+        layer = hiring_tool_layer(tools)
+        layer.clock = lambda: now[0]
+
+        # batching: every caller gets its own item back
+        ids = [f"linkedin-{i}" for i in range(20)]
+        resumes = await asyncio.gather(
+            *(layer.call("parse_resume", a) for a in ids)
+        )
+        assert resumes == [await tools.parse_resume(a) for a in ids]
+        assert layer.stats["batched"] == 20
+
+        # cache: a hit until the ttl is over, expired entries are dropped
+        before = tools.calls["applications"]
+        first = await layer.call("poll_applications", "Naukri", 0)
+        assert await layer.call("poll_applications", "Naukri", 0) == first
+        assert tools.calls["applications"] == before + 1
+        now[0] += 3
+        await layer.call("poll_applications", "Naukri", 1)
+        assert ("poll_applications", ("Naukri", 0)) not in layer._cache
+
+        # single flight for reads, never for side effects
+        before = tools.calls["linkedin"]
+        profiles = await asyncio.gather(
+            *(layer.call("linkedin_profile", "linkedin-99") for _ in range(5))
+        )
+        assert all(p == profiles[0] for p in profiles)
+        assert tools.calls["linkedin"] == before + 1
+        await asyncio.gather(
+            *(layer.call("send_mail", "a@x.com", "hi") for _ in range(3))
+        )
+        assert tools.calls["mail"] == 3
+
+        # the first caller is cancelled, the coalesced one still gets it
+        first = asyncio.ensure_future(layer.call("find_slot", "cand-1"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(layer.call("find_slot", "cand-1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert (await second).startswith("Wed"), second
+        assert first.cancelled()
+
+        # a batch endpoint that drops items fails every caller
+        async def short(items):
+            return items[:-1]
+
+        layer.register("short", None, batch=short)
+        results = await asyncio.gather(
+            *(layer.call("short", i) for i in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results), results
+
+    async def main():
+        await checks()
+        tools = HiringTools(ToolLimits(LIMITS))
+        start = time.perf_counter()
+        applications = await agent_run(
+            lambda name, *args: direct(tools, name, *args)
+        )
+        plain_time = time.perf_counter() - start
+        plain_calls = sum(tools.calls.values())
+
+        tools = HiringTools(ToolLimits(LIMITS))
+        layer = hiring_tool_layer(tools)
+        start = time.perf_counter()
+        await agent_run(layer.call)
+        layer_time = time.perf_counter() - start
+        layer_calls = sum(tools.calls.values())
+
+        print(f"agent run: 10 rounds, {applications} applications at the end")
+        print(
+            f"direct tool calls | {plain_calls:5d} upstream calls | "
+            f"{plain_time:5.2f} s"
+        )
+        print(
+            f"tool layer        | {layer_calls:5d} upstream calls | "
+            f"{layer_time:5.2f} s | {dict(layer.stats)}"
+        )
+        print(
+            f"saved per agent run: {plain_calls - layer_calls} tool calls "
+            f"({1 - layer_calls / plain_calls:.0%}), "
+            f"{plain_time - layer_time:.2f} s wall time"
+        )
+
+    asyncio.run(main())
@@ -0,0 +1,273 @@
+"""
+* Hiring Agent (HiringAgentWorkflow.svg) as an executable graph
+
+    create_jd ──┬── post_linkedin ──┐
+                ├── post_indeed ────┤
+                ├── post_naukri ────┼── collect_applications (loop until target) ── parse_resumes ── shortlist ─┐
+                ├── post_angellist ─┘                                                                          │
+                └── write_questions ─────────────────────────────────────────────────────── schedule_interviews ┘
+                                                                                                   │
+                                             onboard_mail ┐                                    interview
+                                                          ├── offer (only if somebody passed) ──┘
+                                             onboard_hrm ─┘
+
+    > Independent nodes run at the same time: the 4 job boards (capped at 2 concurrent posts), writing the
+      interview questions while applications come in, mail + HRM during onboarding.
+    > Fan-out inside a node: parse_resumes parses all applications concurrently (resume parser cap: 8).
+    > Retry: the calendar API is flaky → schedule_interviews has retries=2. It loops over the shortlist, one
+      candidate per loop: every slot is merged (and checkpointed) right away, a retry only redoes the call
+      that failed.
+    > HITL (hitl=True): "Can I post this JD?" before the job boards and an approval before the offer is sent,
+      both as interrupts → the run pauses, see hitl.py. A declined JD skips every hiring step after it,
+      writing the interview questions included.
+    > State: the goal state of 2_what.py (main_goal, constraints, status) + the progress keys; progress(state)
+      returns the same "progress" view as the JSON in 2_what.py.
+
+? Run
+    cd langgraph_notes/hiring_agent && python workflow.py
+"""
+
+import asyncio
+import operator
+
+from graph import StateGraph, ToolLimits, interrupt
+from stand_in_tools import HiringTools
+
+BOARDS = ["LinkedIn", "Indeed", "Naukri", "AngelList"]
+
+GOAL = {
+    "main_goal": "Hire a backend engineer",
+    "constraints": {
+        "experience": "2-4 years",
+        "remote": True,
+        "stack": ["Python", "Django", "Cloud"],
+    },
+    "status": "active",
+    "created_at": "2025-06-27",
+}
+
+DEFAULT_LIMITS = {
+    "job_board": 2,
+    "resume_parser": 8,
+    "calendar": 2,
+    "llm": 4,
+}
+
+
+def progress(state: dict) -> dict:
+    return {
+        "JD_created": "jd" in state,
+        "posted_on": [board for board, _ in state.get("posted_on", [])],
+        "applications_received": len(state.get("applications", [])),
+        "interviews_scheduled": len(state.get("interviews", {})),
+    }
+
+
+def score(resume: dict, constraints: dict) -> float:
+    low, high = (
+        int(x) for x in constraints["experience"].split()[0].split("-")
+    )
+    stack = set(constraints["stack"])
+    fit = len(stack & set(resume["stack"])) / len(stack)
+    experience = 1.0 if low <= resume["experience"] <= high else 0.3
+    remote = 1.0 if resume["remote"] or not constraints["remote"] else 0.5
+    return fit * experience * remote
+
+
+def build_hiring_graph(
+    tools: HiringTools,
+    target_applications: int = 24,
+    shortlist_size: int = 3,
+    hitl: bool = False,
+) -> StateGraph:
+    graph = StateGraph(
+        reducers={
+            "posted_on": operator.add,
+            "applications": operator.add,
+            "interviews": operator.or_,
+        }
+    )
+
+    def has_offer(state):
+        return "offer" in state
+
+    def jd_approved(state):
+        # hitl: a declined JD stops everything that needs the posting
+        return state.get("jd_approved", True)
+
+    async def create_jd(state):
+        jd = await tools.llm(f"Write a JD for: {state['main_goal']}")
+        return {"jd": jd, "posted_on": [], "applications": []}
+
+    def post_to(board):
+        async def post(state):
+            url = await tools.post_job(board, state["jd"])
+            return {"posted_on": [(board, url)]}
+
+        return post
+
+    async def approve_jd(state):
+        approved = interrupt(
+            state, "post_jd", "Can I post this JD?", state["jd"]
+        )
+        if not approved:
+            return {"jd_approved": False, "status": "JD declined"}
+        return {"jd_approved": True}
+
+    async def write_questions(state):
+        return {"questions": await tools.llm("Interview questions for the JD")}
+
+    async def collect_applications(state):
+        since = len(state["applications"])
+        batches = await asyncio.gather(
+            *(tools.poll_applications(b, since) for b, _ in state["posted_on"])
+        )
+        return {"applications": [a for batch in batches for a in batch]}
+
+    async def parse_resumes(state):
+        parsed = await asyncio.gather(
+            *(tools.parse_resume(a) for a in state["applications"])
+        )
+        return {"parsed": parsed}
+
+    async def shortlist(state):
+        ranked = sorted(
+            state["parsed"],
+            key=lambda r: score(r, state["constraints"]),
+            reverse=True,
+        )
+        best = [r["id"] for r in ranked[:shortlist_size]]
+        await tools.llm(f"Explain why {best} match the JD")
+        return {"shortlist": best}
+
+    def unscheduled(state):
+        slots = state.get("interviews", {})
+        return [c for c in state["shortlist"] if c not in slots]
+
+    async def schedule_interviews(state):
+        # one candidate per loop, a failed call retries only that candidate
+        pending = unscheduled(state)
+        if not pending:
+            return {"interviews": {}}
+        return {"interviews": {pending[0]: await tools.find_slot(pending[0])}}
+
+    async def interview(state):
+        scores = await asyncio.gather(
+            *(
+                tools.interview(c, state["questions"])
+                for c in state["interviews"]
+            )
+        )
+        passed = {c: s for c, s in zip(state["interviews"], scores) if s > 0.3}
+        return {"passed": passed}
+
+    async def offer(state):
+        best = max(state["passed"], key=state["passed"].get)
+        if hitl and not interrupt(
+            state, "offer", f"Send the offer to {best}?"
+        ):
+            return {"status": "offer declined"}
+        await tools.send_mail(best, await tools.llm("Draft an offer letter"))
+        return {"offer": best, "status": "offer sent"}
+
+    async def onboard_mail(state):
+        return {
+            "welcome_mail": await tools.send_mail(state["offer"], "Welcome")
+        }
+
+    async def onboard_hrm(state):
+        return {"employee_id": await tools.create_hrm_record(state["offer"])}
+
+    graph.add_node("create_jd", create_jd)
+    before_posting = "create_jd"
+    if hitl:
+        graph.add_node("approve_jd", approve_jd)
+        graph.add_edge("create_jd", "approve_jd")
+        before_posting = "approve_jd"
+    for board in BOARDS:
+        graph.add_node(
+            f"post_{board.lower()}",
+            post_to(board),
+            retries=1,
+            when=jd_approved,
+        )
+        graph.add_edge(before_posting, f"post_{board.lower()}")
+    graph.add_node("write_questions", write_questions, when=jd_approved)
+    graph.add_edge(before_posting, "write_questions")
+    graph.add_node(
+        "collect_applications",
+        collect_applications,
+        when=jd_approved,
+        until=lambda s: len(s["applications"]) >= target_applications,
+    )
+    graph.add_edge(
+        [f"post_{b.lower()}" for b in BOARDS], "collect_applications"
+    )
+    graph.add_node("parse_resumes", parse_resumes, when=jd_approved)
+    graph.add_edge("collect_applications", "parse_resumes")
+    graph.add_node("shortlist", shortlist, when=jd_approved)
+    graph.add_edge("parse_resumes", "shortlist")
+    graph.add_node(
+        "schedule_interviews",
+        schedule_interviews,
+        retries=2,
+        when=jd_approved,
+        until=lambda s: not unscheduled(s),
+    )
+    graph.add_edge(["shortlist", "write_questions"], "schedule_interviews")
+    graph.add_node("interview", interview, when=jd_approved)
+    graph.add_edge("schedule_interviews", "interview")
+    graph.add_node(
+        "offer", offer, when=lambda s: jd_approved(s) and bool(s["passed"])
+    )
+    graph.add_edge("interview", "offer")
+    graph.add_node("onboard_mail", onboard_mail, when=has_offer)
+    graph.add_node("onboard_hrm", onboard_hrm, when=has_offer)
+    graph.add_edge("offer", "onboard_mail")
+    graph.add_edge("offer", "onboard_hrm")
+    return graph
+
+
+if __name__ == "__main__":
+
+    async def main():
+        results = {}
+        for name, limits, max_parallel in [
+            ("sequential", ToolLimits(default=1), 1),
+            ("parallel", ToolLimits(DEFAULT_LIMITS), None),
+        ]:
+            tools = HiringTools(limits)
+            app = build_hiring_graph(tools).compile()
+            run = await app.arun(GOAL, max_parallel=max_parallel)
+            results[name] = run
+            # every node started after all of its dependencies ended
+            for node, span in run.spans.items():
+                for dep in app.deps[node]:
+                    assert span.start >= run.spans[dep].end, (node, dep)
+            # and no tool ran more calls at once than its cap
+            for tool, peak in tools.peak.items():
+                cap = limits.limits.get(tool, limits.default)
+                assert not cap or peak <= cap, (tool, peak, cap)
+            print(
+                f"{name:10s} | {run.elapsed:5.2f} s | tool calls "
+                f"{sum(tools.calls.values())} | offer to {run.state['offer']}"
+            )
+        run = results["parallel"]
+        print(f"\nprogress: {progress(run.state)}")
+        print(f"critical path: {' -> '.join(run.critical_path)}\n")
+        print(run.timeline())
+        speedup = results["sequential"].elapsed / run.elapsed
+        print(f"\nend-to-end speedup vs sequential: {speedup:.1f}x")
+        assert tools.peak["job_board"] == DEFAULT_LIMITS["job_board"]
+
+        # hitl: a declined JD is posted nowhere and nobody is interviewed
+        tools = HiringTools(ToolLimits(DEFAULT_LIMITS))
+        app = build_hiring_graph(tools, hitl=True).compile()
+        run = await app.arun(GOAL, resume={"post_jd": False})
+        assert not run.paused and run.state["status"] == "JD declined"
+        assert run.state["posted_on"] == [], run.state["posted_on"]
+        assert tools.calls["job_board"] == tools.calls["interview"] == 0
+        assert "questions" not in run.state and tools.calls["llm"] == 1
+        print(f"declined JD: {run.state['status']}, tool calls {tools.calls}")
+
+    asyncio.run(main())